@@ -1,7 +1,7 @@
 #!/usr/bin/env python
 
-import csv
 from .Interfaces import hAMRonizedResultIterator
+from .tabular import TabularReader, mapped_columns
 from hAMRonization.constants import GENE_PRESENCE
 
 required_metadata = ["analysis_software_version", "reference_database_version"]
@@ -38,6 +38,6 @@ class AbricateIterator(hAMRonizedResultIterator):
         Read each and return it
         """
         # skip any manually specified fields for later
-        reader = csv.DictReader(handle, delimiter="\t")
+        reader = TabularReader(handle, columns=mapped_columns(self.field_mapping))
         for result in reader:
             yield self.hAMRonize(result, self.metadata)
@@ -1,9 +1,9 @@
 #!/usr/bin/env python
 
-import csv
 import warnings
-import re
 from .Interfaces import hAMRonizedResultIterator
+from .tabular import TabularReader, mapped_columns
+from .mutations import protein_substitution, nucleotide_substitution
 from hAMRonization.constants import (
     NUCLEOTIDE_VARIANT,
     AMINO_ACID_VARIANT,
@@ -74,7 +74,10 @@ class AmrFinderPlusIterator(hAMRonizedResultIterator):
         Read each and return it
         """
         skipped_truncated = 0
-        reader = csv.DictReader(handle, delimiter="\t")
+        reader = TabularReader(handle, columns=[
+            *mapped_columns(self.prot_field_map, self.nuc_field_map),
+            "Type", "Method", "Subtype", "Element symbol", "Protein id",
+        ])
         for result in reader:
 
             # Replace NA value with None for consistency
@@ -103,14 +106,13 @@ class AmrFinderPlusIterator(hAMRonizedResultIterator):
             if result['Subtype'] == "POINT":
                 gene_symbol, mutation = result['Element symbol'].rsplit("_", 1)
                 result['Element symbol'] = gene_symbol
-                _, ref, pos, alt, _ = re.split(r"(\D+)(\d+)(\D+)", mutation)
                 # this means it is a protein mutation
                 if result['Method'] in ["POINTX", "POINTP"]:
-                    result['amino_acid_mutation'] = f"p.{ref}{pos}{alt}"
+                    result['amino_acid_mutation'] = protein_substitution(mutation)
                     result['genetic_variation_type'] = AMINO_ACID_VARIANT
                 elif result['Method'] == "POINTN":
-                    # e.g., 23S_G2032G ampC_C-11C -> c.2032G>G
-                    result['nucleotide_mutation'] = f"c.{pos}{ref}>{alt}"
+                    # e.g., 23S_G2032G -> c.2032G>G, ampC_C-11C -> c.-11C>C
+                    result['nucleotide_mutation'] = nucleotide_substitution(mutation, "c.")
                     result['genetic_variation_type'] = NUCLEOTIDE_VARIANT
 
             # Determine the field_map to use depending on the method used
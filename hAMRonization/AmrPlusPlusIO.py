@@ -1,7 +1,8 @@
 #!/usr/bin/env python
 
-import csv
 from .Interfaces import hAMRonizedResultIterator
+from .references import decompose, log_statistics
+from .tabular import TabularReader, mapped_columns
 from hAMRonization.constants import GENE_PRESENCE
 
 required_metadata = [
@@ -37,13 +38,8 @@ class AmrPlusPlusIterator(hAMRonizedResultIterator):
         Read each and return it
         """
         # skip any manually specified fields for later
-        reader = csv.DictReader(handle, delimiter="\t")
+        reader = TabularReader(handle, columns=[*mapped_columns(self.field_mapping), "Gene"])
         for result in reader:
-            hit_information = (
-                result["Gene"].replace("|RequiresSNPConfirmation", "").split("|")
-            )
-            result["_reference_accession"] = hit_information[0]
-            result["_drug_class"] = hit_information[2]
-            result["_gene_symbol"] = hit_information[-1]
-            result["_gene_name"] = hit_information[-2]
+            result.update(decompose("amrplusplus", result["Gene"]))
             yield self.hAMRonize(result, self.metadata)
+        log_statistics()
@@ -1,8 +1,9 @@
 #!/usr/bin/env python
 
-import csv
-import re
 from .Interfaces import hAMRonizedResultIterator
+from .references import decompose, log_statistics
+from .tabular import TabularReader, mapped_columns
+from .mutations import nucleotide_substitution
 from hAMRonization.constants import (
     NUCLEOTIDE_VARIANT,
     AMINO_ACID_VARIANT,
@@ -65,10 +66,13 @@ class AribaIterator(hAMRonizedResultIterator):
         Read each and return it
         """
         # skip any manually specified fields for later
-        reader = csv.DictReader(handle, delimiter="\t")
+        reader = TabularReader(handle, columns=[
+            *mapped_columns(self.field_mapping),
+            "known_var", "has_known_var", "var_seq_type", "known_var_change",
+            "ctg_start", "ref_nt", "ctg_nt",
+        ])
         for result in reader:
-            _gene_symbol = result["ref_name"].split(".")[0]
-            result["_gene_symbol"] = _gene_symbol
+            result.update(decompose("ariba", result["ref_name"]))
             # default valuej
             result["_genetic_variation_type"] = GENE_PRESENCE
             result["_nucleotide_mutation"] = None
@@ -76,11 +80,10 @@ class AribaIterator(hAMRonizedResultIterator):
 
             if str(result["known_var"]) == "1" and str(result["has_known_var"]) == "1":
                 if result["var_seq_type"] == "n":
-                    _, ref, pos, alt, _ = re.split(
-                        r"(\D+)(\d+)(\D+)", result["known_var_change"]
-                    )
                     result["_genetic_variation_type"] = NUCLEOTIDE_VARIANT
-                    result["_nucleotide_mutation"] = f"n.{pos}{ref}>{alt}"
+                    result["_nucleotide_mutation"] = nucleotide_substitution(
+                        result["known_var_change"]
+                    )
                     result["_amino_acid_mutation"] = None
                 elif result["var_seq_type"] == "p":
                     result["_genetic_variation_type"] = AMINO_ACID_VARIANT
@@ -90,3 +93,4 @@ class AribaIterator(hAMRonizedResultIterator):
                     result["_amino_acid_mutation"] = f"p.{result['known_var_change']}"
 
             yield self.hAMRonize(result, self.metadata)
+        log_statistics()
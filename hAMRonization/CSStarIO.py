@@ -1,8 +1,8 @@
 #!/usr/bin/env python
 
-import csv
 from collections import OrderedDict
 from .Interfaces import hAMRonizedResultIterator
+from .tabular import TabularReader
 from hAMRonization.constants import GENE_PRESENCE
 
 required_metadata = [
@@ -39,7 +39,7 @@ class CSStarIterator(hAMRonizedResultIterator):
         field_names = [
             x for x in self.field_mapping.keys() if not str(x).startswith("_")
         ]
-        reader = csv.DictReader(handle, fieldnames=field_names, delimiter="\t")
+        reader = TabularReader(handle, fieldnames=field_names)
         for result in reader:
             result[0] = (
                 result[0]
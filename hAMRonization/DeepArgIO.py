@@ -1,7 +1,8 @@
 #!/usr/bin/env python
 
-import csv
 from .Interfaces import hAMRonizedResultIterator
+from .references import decompose, log_statistics
+from .tabular import TabularReader, mapped_columns
 from hAMRonization.constants import GENE_PRESENCE
 
 required_metadata = [
@@ -10,8 +11,21 @@ required_metadata = [
     "input_file_name",
 ]
 
+parser_options = {
+    "aggregate": {
+        "choices": ["read", "gene"],
+        "default": None,
+        "help": "Report each read (the default) or one result per gene, with "
+        "its number of reads as coverage_depth and their mean identity as "
+        "sequence_identity",
+    },
+}
+
 
 class DeepArgIterator(hAMRonizedResultIterator):
+    # one result per "read" or per "gene" (see parser_options)
+    aggregate = "read"
+
     def __init__(self, source, metadata):
         metadata["analysis_software_name"] = "deeparg"
         metadata["reference_database_name"] = "deeparg_db"
@@ -36,6 +50,16 @@ class DeepArgIterator(hAMRonizedResultIterator):
             "_reference_accession": "reference_accession",
         }
 
+        # per gene results (with aggregate="gene")
+        self.gene_field_mapping = {
+            "#ARG": "gene_symbol",
+            "best-hit": "gene_name",
+            "_drug_class": "drug_class",
+            "_read_count": "coverage_depth",
+            "_mean_identity": "sequence_identity",
+            "_reference_accession": "reference_accession",
+        }
+
         super().__init__(source, self.field_mapping, self.metadata)
 
     def parse(self, handle):
@@ -43,7 +67,43 @@ class DeepArgIterator(hAMRonizedResultIterator):
         Read each and return it
         """
         # skip any manually specified fields for later
-        reader = csv.DictReader(handle, delimiter="\t")
+        reader = TabularReader(handle, columns=[*mapped_columns(self.field_mapping), "best-hit"])
+        if self.aggregate == "gene":
+            yield from self._aggregate_genes(reader)
+            return
         for result in reader:
-            result["_reference_accession"] = result["best-hit"].split("|")[0]
+            result.update(decompose("deeparg", result["best-hit"]))
             yield self.hAMRonize(result, self.metadata)
+        log_statistics()
+
+    def _aggregate_genes(self, reader):
+        """
+        One result per gene (#ARG and best-hit) of the reads, in the order
+        the genes are first hit, only keeping a running total per gene
+
+        A read is counted once per gene even when it has a row for each of
+        several predicted classes (DeepARG writes those consecutively).
+        """
+        # (#ARG, best-hit) -> [drug classes, reads, identity total, last read]
+        genes = {}
+        for result in reader:
+            key = (result["#ARG"], result["best-hit"])
+            gene = genes.get(key)
+            if gene is None:
+                gene = genes[key] = [{}, 0, 0.0, None]
+            gene[0][result["predicted_ARG-class"]] = None
+            if result["read_id"] != gene[3]:
+                gene[1] += 1
+                gene[2] += float(result["identity"])
+                gene[3] = result["read_id"]
+
+        for (arg, best_hit), (drug_classes, reads, identity, _) in genes.items():
+            result = {
+                "#ARG": arg,
+                "best-hit": best_hit,
+                "_drug_class": ", ".join(sorted(drug_classes)),
+                "_read_count": reads,
+                "_mean_identity": round(identity / reads, 2),
+                **decompose("deeparg", best_hit),
+            }
+            yield self.hAMRonize(result, self.metadata, self.gene_field_mapping)
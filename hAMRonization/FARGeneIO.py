@@ -2,8 +2,9 @@
 
 from collections import OrderedDict
 from .Interfaces import hAMRonizedResultIterator
+from .references import decompose, log_statistics
+from .hmmer import HmmerTableReader, THRESHOLD_OPTIONS
 from hAMRonization.constants import GENE_PRESENCE
-import re
 
 required_metadata = [
     "analysis_software_version",
@@ -11,8 +12,14 @@ required_metadata = [
     "input_file_name",
 ]
 
+parser_options = THRESHOLD_OPTIONS
+
 
 class FARGeneIOIterator(hAMRonizedResultIterator):
+    # thresholds of the hits to report (see parser_options)
+    max_evalue = None
+    min_score = None
+
     def __init__(self, source, metadata):
         metadata["analysis_software_name"] = "fargene"
         metadata["reference_database_name"] = "fargene_hmms"
@@ -61,12 +68,14 @@ class FARGeneIOIterator(hAMRonizedResultIterator):
         report_fieldnames = [
             x for x in self.field_mapping.keys() if not x.startswith("_")
         ]
-
-        for result in handle:
-            if not result.startswith("#"):
-                result = dict(zip(report_fieldnames, re.split(r'\s+', result)))
-                result["_gene_name"] = result['query name']
-                result['_gene_symbol'] = result['query name'].split('_')[0]
-                result['_drug_class'] = result['query name'].split('_')[0]
-
-                yield self.hAMRonize(result, self.metadata)
+        reader = HmmerTableReader(
+            handle,
+            report_fieldnames,
+            "domtblout",
+            max_evalue=self.max_evalue,
+            min_score=self.min_score,
+        )
+        for result in reader:
+            result.update(decompose("fargene", result["query name"]))
+            yield self.hAMRonize(result, self.metadata)
+        log_statistics()
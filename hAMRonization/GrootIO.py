@@ -1,8 +1,9 @@
 #!/usr/bin/env python
 
-import csv
 from collections import OrderedDict
 from .Interfaces import hAMRonizedResultIterator
+from .references import decompose, log_statistics
+from .tabular import TabularReader
 from hAMRonization.constants import GENE_PRESENCE
 
 required_metadata = [
@@ -41,10 +42,8 @@ class GrootIterator(hAMRonizedResultIterator):
         field_names = [
             x for x in self.field_mapping.keys() if not str(x).startswith("_")
         ]
-        reader = csv.DictReader(handle, delimiter="\t", fieldnames=field_names)
+        reader = TabularReader(handle, fieldnames=field_names)
         for result in reader:
-            result["_gene_name"] = ".".join(
-                result["reference_accession"].split(".")[:3]
-            )
-            result["_gene_symbol"] = result["reference_accession"].split(".")[0]
+            result.update(decompose("groot", result["reference_accession"]))
             yield self.hAMRonize(result, self.metadata)
+        log_statistics()
@@ -1,20 +1,96 @@
 #!/usr/bin/env python
 
+import io
 import sys
 import os
 import csv
-import json
 import argparse
 import logging
 import traceback
-import dataclasses
+import itertools
+import operator
 from abc import ABC, abstractmethod
 import hAMRonization
-import hAMRonization.summarize
-from .hAMRonizedResult import hAMRonizedResult
+import hAMRonization.parallel
+import hAMRonization.batch
+from .streams import (
+    open_source,
+    close_source,
+    read_leading_lines,
+    ReplayStream,
+    DirectoryReports,
+    open_output,
+    output_compression,
+    compression_opener,
+    is_path,
+    OUTPUT_BUFFER_SIZE,
+    source_name,
+    COMPRESSION_FORMATS,
+)
+from .hAMRonizedResult import (
+    hAMRonizedResult,
+    hAMRonizedLazyResult,
+    hAMRonizedMetadataBlock,
+    hAMRonizedSharedResult,
+    hAMRonizedResultBatch,
+    _FIELD_NAMES,
+)
 
 logger = logging.getLogger(__name__)
 
+# bytes read back from the end of an uncompressed json output
+_JSON_TAIL_SIZE = 64
+
+
+class _FieldMapProjection:
+    """
+    A field_map compiled to just its active report field -> hAMRonization
+    field pairs (entries mapped to None are dropped and where several report
+    fields map to the same hAMRonization field only the last is kept, as
+    it would win anyway), fetched from a report row with one itemgetter
+    """
+
+    __slots__ = ("field_map", "targets", "sources", "_getter")
+
+    def __init__(self, field_map):
+        # keep a reference to field_map so its id can't be reused while
+        # this projection is cached
+        self.field_map = field_map
+        self.sources = {}
+        for original_field, hAMRonized_field in field_map.items():
+            if hAMRonized_field:
+                self.sources.pop(hAMRonized_field, None)
+                self.sources[hAMRonized_field] = original_field
+        self.targets = tuple(self.sources)
+        if len(self.targets) == 1:
+            getter = operator.itemgetter(*self.sources.values())
+            self._getter = lambda report_data: (getter(report_data),)
+        elif self.targets:
+            self._getter = operator.itemgetter(*self.sources.values())
+        else:
+            self._getter = lambda report_data: ()
+
+    def values(self, report_data):
+        """
+        Tuple of the mapped fields of report_data (in the order of targets)
+        """
+        return self._getter(report_data)
+
+    def project(self, report_data):
+        """
+        hAMRonization field -> value dict of the mapped fields of report_data
+        """
+        return dict(zip(self.targets, self._getter(report_data)))
+
+    def metadata_prefix(self, metadata):
+        """
+        The metadata fields that aren't overridden by a mapped report field
+        """
+        return {
+            field: value for field, value in metadata.items()
+            if field not in self.sources
+        }
+
 
 class hAMRonizedResultIterator(ABC):
     """
@@ -24,6 +100,28 @@ class hAMRonizedResultIterator(ABC):
     AMR tool report is being parsed
     """
 
+    # yield hAMRonizedLazyResults that only map and coerce a field when it
+    # is read (set through hAMRonization.parse(..., lazy=True))
+    lazy = False
+
+    # yield hAMRonizedSharedResults that point at one metadata block per
+    # report (set through hAMRonization.parse(..., shared_metadata=True))
+    shared_metadata = False
+
+    # number of leading lines of a report passed to sniff() before it is
+    # parsed (0 for parsers that don't sniff their reports)
+    sniff_lines = 0
+
+    # pattern of the reports read from a directory given as source, which
+    # parse() gets as a DirectoryReports to read in one pass (None for
+    # parsers that only read single reports)
+    directory_pattern = None
+
+    # hAMRonize() gives (hAMRonizedMetadataBlock, coerced row values) pairs
+    # rather than results (set by iter_batches(), which fills the columns of
+    # its batches from them)
+    _batch_rows = False
+
     def __init__(self, source, field_map, metadata):
         """
         Create an hAMRonizedResultIterator for whichever tool report is
@@ -33,36 +131,55 @@ class hAMRonizedResultIterator(ABC):
         github.com/biopython/biopython/blob/master/Bio/SeqIO/Interfaces.py#L23
 
         Arguments:
-            - source: input file stream or path to input
+            - source: path to input, "-" for stdin or an open (text or
+              binary) file-like object, which is left open (or a directory
+              of reports for parsers with a directory_pattern)
             - tool: name of amr tool report that is being parsed
 
         """
         self.source = source
+        self.source_name = source_name(source)
         self.field_map = field_map
         self.metadata = metadata
+        self._projections = {}
+        self._metadata_prefixes = {}
+        self._metadata_blocks = {}
 
         try:
-            if os.stat(source).st_size == 0:
-                logger.warning("Input file %s is empty", source)
-            self.stream = open(source, "r")
+            if (
+                self.directory_pattern is not None
+                and is_path(source)
+                and os.path.isdir(source)
+            ):
+                self.stream = DirectoryReports(source, self.directory_pattern)
+            else:
+                if is_path(source) and os.stat(source).st_size == 0:
+                    logger.warning("Input file %s is empty", source)
+                self.stream = open_source(source)
         except FileNotFoundError:
             logger.error("File not found: %s", source)
             sys.exit(1)
 
         try:
-            self.hAMRonized_results = self.parse(self.stream)
+            handle = self.stream
+            if self.sniff_lines:
+                lines = read_leading_lines(self.stream, self.sniff_lines)
+                self.sniff(lines)
+                # parse() reads the report from the start all the same
+                handle = ReplayStream(lines, self.stream)
+            self.hAMRonized_results = self.parse(handle)
         except KeyError as e:
-            self.stream.close()
+            self._close_stream()
             logger.error(
                 "Expected column %s not found in %s. "
                 "Please check you are using the correct AMR "
                 "prediction tool output file.",
-                e, source
+                e, self.source_name
             )
             logger.debug("Full traceback:\n%s", traceback.format_exc())
             sys.exit(1)
         except Exception:
-            self.stream.close()
+            self._close_stream()
             raise
 
     # TODO: the field_map_override is a half-hack to support the scenario
@@ -79,24 +196,78 @@ class hAMRonizedResultIterator(ABC):
         - metadata dict of additional metadata fields
         - field_map_override optional override of field_map passed in c'tor
         """
-        hAMRonized_result_data = {**metadata}
-
         field_map = field_map_override or self.field_map
-        for original_field, hAMRonized_field in field_map.items():
-            if hAMRonized_field:
-                hAMRonized_result_data[hAMRonized_field] = report_data[original_field]
+        projection = self._projection(field_map)
+        if self._batch_rows:
+            block = self._metadata_block(field_map, projection, metadata)
+            return block, block.coerce_row(projection.values(report_data))
+        if self.lazy:
+            return hAMRonizedLazyResult(report_data, metadata, projection.sources)
 
-        hAMRonized_result = hAMRonizedResult(**hAMRonized_result_data)
+        if self.shared_metadata:
+            return hAMRonizedSharedResult(
+                self._metadata_block(field_map, projection, metadata),
+                projection.values(report_data),
+            )
 
-        return hAMRonized_result
+        prefix = self._metadata_prefix(field_map, projection, metadata)
+        return hAMRonizedResult(**prefix, **projection.project(report_data))
+
+    def _metadata_prefix(self, field_map, projection, metadata):
+        """
+        The metadata shared by every result of the report is only filtered
+        once per field_map (other metadata is e.g., built per result)
+        """
+        if metadata is not self.metadata:
+            return projection.metadata_prefix(metadata)
+        prefix = self._metadata_prefixes.get(id(field_map))
+        if prefix is None:
+            prefix = projection.metadata_prefix(metadata)
+            self._metadata_prefixes[id(field_map)] = prefix
+        return prefix
+
+    def _metadata_block(self, field_map, projection, metadata):
+        """
+        Interned hAMRonizedMetadataBlock of the metadata prefix (cached per
+        field_map like the prefix itself)
+        """
+        if metadata is not self.metadata:
+            return hAMRonizedMetadataBlock.intern(
+                projection.metadata_prefix(metadata), projection.targets
+            )
+        block = self._metadata_blocks.get(id(field_map))
+        if block is None:
+            block = hAMRonizedMetadataBlock.intern(
+                self._metadata_prefix(field_map, projection, metadata),
+                projection.targets,
+            )
+            self._metadata_blocks[id(field_map)] = block
+        return block
+
+    def _projection(self, field_map):
+        """
+        Compiled _FieldMapProjection of field_map (cached per field_map)
+        """
+        try:
+            return self._projections[id(field_map)]
+        except KeyError:
+            projection = _FieldMapProjection(field_map)
+            self._projections[id(field_map)] = projection
+            return projection
 
     def __next__(self):
         try:
             return next(self.hAMRonized_results)
         except Exception:
-            self.stream.close()
+            self._close_stream()
             raise
 
+    def _close_stream(self):
+        """
+        Close the input stream (but not a file-like object passed as source)
+        """
+        close_source(self.source, self.stream)
+
     def __iter__(self):
         """
         Iterate over entries as an hAMRonizedResult object
@@ -105,101 +276,344 @@ class hAMRonizedResultIterator(ABC):
         """
         return self
 
+    def sniff(self, lines):
+        """
+        Inspect the first sniff_lines lines of the report (fewer for a
+        shorter report) before it is parsed e.g., to choose the field_map of
+        the variant of the report
+        """
+
     @abstractmethod
     def parse(self, handle):
         """
         Start parsing the file and return an hAMRonizedResult iterator
         """
 
+    def iter_batches(self, size=1024):
+        """
+        Iterate over the remaining entries as column-oriented
+        hAMRonizedResultBatch objects of up to size results each
+
+        The columns are filled straight from the projected values of the
+        report rows, without creating a result object per entry
+        """
+        self._batch_rows = True
+        while True:
+            rows = list(itertools.islice(self, size))
+            if not rows:
+                return
+            yield hAMRonizedResultBatch.from_rows(rows)
+
     def write(
         self,
         report_number=0,
         total_report_count=1,
         output_location=None,
         output_format="tsv",
+        typed_json=False,
+        compression=None,
+        compression_level=None,
+        writer=None,
     ):
         """
         Class to write to output the hAMRonized report (to either stdout or
-        a filehandle) in TSV or json format
+        a filehandle) in TSV, json or ndjson (one json object per line) format
+
+        Get number of reports and which report this one is, with typed_json
+        numeric fields are written as json numbers and missing values as null
+        (instead of strings)
 
-        Get number of reports and which report this one is
+        The output is gzip, bzip2 or xz compressed if compression is set or
+        output_location ends in .gz, .bz2 or .xz
+
+        Writing report_number 0 to total_report_count - 1 to one output
+        location continues the output the earlier reports left (whether it
+        has any results yet is read back from the output itself, reports
+        written to stdout are taken to have some). Alternatively writer, a
+        hAMRonizedResultWriter opened by the caller, is written to instead
+        and closed by the caller once all reports are written.
         """
+        if writer is not None:
+            writer.write_report(self)
+            return
 
-        if output_location:
-            # appending if more than one report
-            if os.path.exists(output_location) and total_report_count > 1:
-                out_fh = open(output_location, "a")
-            else:
-                out_fh = open(output_location, "w")
-        else:
-            out_fh = sys.stdout
+        # appending if not the first of several reports
+        append = report_number > 0 and (
+            output_location is None or os.path.exists(output_location)
+        )
+        has_entries = append and (
+            output_location is None
+            or _written_results(output_location, output_format)
+        )
+        writer = hAMRonizedResultWriter(
+            output_location,
+            output_format,
+            typed_json=typed_json,
+            compression=compression,
+            compression_level=compression_level,
+            append=append,
+            has_entries=has_entries,
+        )
+        writer.write_report(self)
+
+        # i.e. if last report then close list in json
+        writer.close(end=(total_report_count - 1) == report_number)
 
+
+def _written_results(output_location, output_format):
+    """
+    Whether the output written to output_location so far has any results,
+    as a tsv output only has its header once it has results and a json list
+    not yet closed ends with "[" until it has results
+    """
+    if output_format == "ndjson":
+        return False
+    if output_format == "json" and compression_opener(output_location) is None:
+        # only the end of an uncompressed output needs reading
+        with open(output_location, "rb") as fh:
+            fh.seek(max(0, os.path.getsize(output_location) - _JSON_TAIL_SIZE))
+            return not fh.read().rstrip().endswith(b"[")
+    with open_source(output_location) as fh:
         if output_format == "tsv":
-            # to get first result to build csvwriter
-            try:
-                first_result = next(self)
-                fieldnames = [f.name for f in dataclasses.fields(type(first_result))]
-                writer = csv.DictWriter(
-                    out_fh,
-                    delimiter="\t",
-                    fieldnames=fieldnames,
-                    lineterminator=os.linesep,
-                )
+            return bool(fh.read(1))
+        tail = ""
+        while chunk := fh.read(OUTPUT_BUFFER_SIZE):
+            tail = chunk.rstrip() or tail
+        return not tail.endswith("[")
 
-                # donly write header for first report
-                if report_number == 0:
-                    writer.writeheader()
-                writer.writerow(dataclasses.asdict(first_result))
-                for result in self:
-                    writer.writerow(dataclasses.asdict(result))
-            # if the iterator is empty then do nothing
-            except StopIteration:
-                pass
-
-        # this is painful to do streaming for json validly (requires
-        # tinkering with sublcassing the json encoder)
-        elif output_format == "json":
-            empty = True
-
-            if report_number == 0:
-                first_entry = True
-            else:
-                first_entry = False
-
-            for result in self:
-                # replace none entries with empty string for compatibility
-                # with csv and non-python
-                clean_results = {}
-                for key, value in dataclasses.asdict(result).items():
-                    if value:
-                        clean_results[key] = str(value)
-                    else:
-                        clean_results[key] = ""
-
-                json_entry = json.dumps(clean_results)
-
-                # add json list opening if first entry
-                if first_entry:
-                    out_fh.write("[")
-                    out_fh.write(json_entry)
-                    first_entry = False
-                else:
-                    out_fh.write(", ")
-                    out_fh.write(json_entry)
-                empty = False
-
-            if (total_report_count - 1) == report_number:
-                # i.e. if last report then close list in json
-                if not empty:
-                    out_fh.write("]\n")
-                else:
-                    out_fh.write("[]\n")
 
+def render_batch(batch, output_format, typed_json=False):
+    """
+    Text of the results in an hAMRonizedResultBatch in output_format (without
+    the tsv header, the json list brackets or separators between batches)
+    """
+    if output_format == "tsv":
+        buffer = io.StringIO()
+        csv.writer(
+            buffer,
+            delimiter="\t",
+            lineterminator=os.linesep,
+        ).writerows(batch.rows())
+        return buffer.getvalue()
+    # by default json values are written as strings with "" for empty ones
+    # for compatibility with csv and non-python
+    elif output_format == "json":
+        return ", ".join(batch.json_rows(typed=typed_json))
+    # one json object per line (i.e., json lines) so reports can simply
+    # be concatenated or split
+    elif output_format == "ndjson":
+        return "\n".join(batch.json_rows(typed=typed_json)) + "\n"
+    raise ValueError("Unknown output format. Valid options are: tsv, json or ndjson")
+
+
+class hAMRonizedResultWriter:
+    """
+    Writes the hAMRonized results of any number of reports to one output
+    handle (stdout or a file, compressed as for open_output) in tsv, json
+    or ndjson format, writing the tsv header once and keeping the json list
+    valid across reports
+
+    The results are written one batch at a time, either from a parsed report
+    or already rendered (by render_batch e.g., in a worker process)
+
+    output_location can also be an open text file-like object (e.g., a
+    StringIO), which is written to as is and left open
+    """
+
+    def __init__(
+        self,
+        output_location=None,
+        output_format="tsv",
+        typed_json=False,
+        compression=None,
+        compression_level=None,
+        append=False,
+        has_entries=False,
+    ):
+        """
+        With append the output is appended to (continuing the tsv or json
+        output of an earlier writer, has_entries says whether that wrote any
+        results)
+        """
+        if output_format not in ("tsv", "json", "ndjson"):
+            raise ValueError(
+                "Unknown output format. Valid options are: tsv, json or ndjson"
+            )
+        self.output_format = output_format
+        self.typed_json = typed_json
+        self.has_entries = has_entries
+        # only write the header with the first results (which may come from
+        # a later report, or a resumed run, if the first ones had none)
+        self._header_pending = output_format == "tsv" and not has_entries
+        self.output_location = output_location
+        self.compression = None
+        self.compression_level = compression_level
+        if hasattr(output_location, "write"):
+            self.out_fh = output_location
         else:
-            raise ValueError("Unknown output format. Valid options are: csv or json")
+            self.compression = compression or output_compression(output_location)
+            self.out_fh = open_output(
+                output_location, "a" if append else "w", compression,
+                compression_level,
+            )
+        # the json list is opened here and closed by close()
+        if output_format == "json" and not append:
+            self.out_fh.write("[")
+
+    def write_report(self, parsed_report):
+        """
+        Write all results left in an hAMRonizedResultIterator
+        """
+        self.write_batches(parsed_report.iter_batches())
+
+    def write_batches(self, batches):
+        """
+        Write hAMRonizedResultBatches (e.g., from a ResultCache)
+        """
+        self.write_rendered(
+            render_batch(batch, self.output_format, self.typed_json)
+            for batch in batches
+        )
+
+    def write_rendered(self, rendered_batches):
+        """
+        Write batches of results rendered by render_batch() with this
+        writer's output_format and typed_json
+        """
+        for rendered_batch in rendered_batches:
+            if self._header_pending:
+                self.out_fh.write("\t".join(_FIELD_NAMES) + os.linesep)
+                self._header_pending = False
+            elif self.has_entries and self.output_format == "json":
+                self.out_fh.write(", ")
+            self.out_fh.write(rendered_batch)
+            self.has_entries = True
+
+    def checkpoint(self):
+        """
+        Make sure everything written so far is in the output file and return
+        its size i.e. the offset to truncate the output to, to resume writing
+        (with append) from this point
+
+        A compressed output has its compressed stream finished and a new one
+        started, so the output up to the offset can be decompressed
+        """
+        if self.output_location is None:
+            raise ValueError("Only output written to a file can be checkpointed")
+        if self.compression:
+            self.out_fh.close()
+            offset = os.path.getsize(self.output_location)
+            self.out_fh = open_output(
+                self.output_location, "a", self.compression, self.compression_level
+            )
+            return offset
+        self.out_fh.flush()
+        return os.path.getsize(self.output_location)
+
+    def close(self, end=True):
+        """
+        Close the output (closing the json list too, unless end is False
+        i.e. another writer will append to it)
+        """
+        if end and self.output_format == "json":
+            self.out_fh.write("]\n")
+        if self.out_fh is self.output_location:
+            self.out_fh.flush()
+        elif self.out_fh is not sys.stdout:
+            self.out_fh.close()
+
+
+def add_compression_arguments(parser):
+    """
+    Add the output compression options to a (sub)parser
+    """
+    parser.add_argument(
+        "--compress",
+        choices=list(COMPRESSION_FORMATS),
+        default=None,
+        help="Compress the output (default: chosen from the --output suffix "
+        "i.e. .gz, .bz2 or .xz, otherwise uncompressed)",
+    )
+    parser.add_argument(
+        "--compress_level",
+        type=int,
+        default=None,
+        help="Compression level (default: that of the gzip, bzip2 or xz "
+        "command line tool)",
+    )
+
+
+def add_output_arguments(parser):
+    """
+    Add the options for writing hAMRonized results to a (sub)parser
+    """
+    parser.add_argument(
+        "--format", default="tsv", help="Output format (tsv, json or ndjson)"
+    )
+    parser.add_argument("--output", default=None, help="Output location")
+    parser.add_argument(
+        "--typed_json",
+        action="store_true",
+        default=False,
+        help="Write numeric fields as json numbers and missing values as "
+        "null (json and ndjson formats only)",
+    )
+    add_compression_arguments(parser)
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=None,
+        help="Number of reports to parse in parallel (default, or 0: all CPUs "
+        "available, respecting CPU affinity and cgroup limits, and at most "
+        "one per report)",
+    )
+
 
-        if out_fh is not sys.stdout:
-            out_fh.close()
+def _size_argument(size):
+    """
+    argparse type of sizes such as 500M (only importing the cache module
+    when the option is given)
+    """
+    try:
+        return hAMRonization.cache.parse_size(size)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+
+def add_cache_arguments(parser):
+    """
+    Add the result cache options to a (sub)parser
+    """
+    parser.add_argument(
+        "--cache_dir",
+        default=None,
+        help="Cache hAMRonized reports in this directory, so unchanged "
+        "reports (same contents, tool, metadata and hAMRonization version) "
+        "aren't parsed again",
+    )
+    parser.add_argument(
+        "--cache_size",
+        type=_size_argument,
+        default=None,
+        help="Maximum size of the cache e.g. 500M or 20G, least recently "
+        "used reports are evicted after each run (default: 1G)",
+    )
+
+
+def _result_cache(args):
+    """
+    ResultCache of the cache options (None without --cache_dir)
+    """
+    if args.cache_dir is None:
+        return None
+    if args.cache_size is None:
+        return hAMRonization.cache.ResultCache(args.cache_dir)
+    return hAMRonization.cache.ResultCache(args.cache_dir, args.cache_size)
+
+
+def _tool_subparser_help(analysis_tool):
+    report_file = hAMRonization._ReportFileToUse[analysis_tool]
+    return f"hAMRonize {analysis_tool}'s output report i.e., {report_file}"
 
 
 def generate_tool_subparser(subparser, analysis_tool):
@@ -213,17 +627,23 @@ def generate_tool_subparser(subparser, analysis_tool):
         f"{analysis_tool} ({report_file})"
     )
     usage = f"hamronize.py {analysis_tool} <options>"
-    help = f"hAMRonize {analysis_tool}'s output report i.e., {report_file}"
+    help = _tool_subparser_help(analysis_tool)
 
     tool_parser = subparser.add_parser(
         analysis_tool, description=description, usage=usage, help=help
     )
 
-    tool_parser.add_argument("report", nargs="+", help="Path to report(s)")
     tool_parser.add_argument(
-        "--format", default="tsv", help="Output format (tsv or json)"
+        "report", nargs="+", help="Path to report(s) (- to read from stdin)"
+    )
+    add_output_arguments(tool_parser)
+    add_cache_arguments(tool_parser)
+    tool_parser.add_argument(
+        "--server",
+        default=None,
+        help="Convert the reports with a hamronize serve process listening on "
+        "this unix socket or host:port instead of in this process",
     )
-    tool_parser.add_argument("--output", default=None, help="Output location")
 
     # any missing mandatory fields need supplied as CLI argument
     required_mandatory_metadata = hAMRonization._RequiredToolMetadata[analysis_tool]
@@ -233,9 +653,352 @@ def generate_tool_subparser(subparser, analysis_tool):
             required=True,
             help=f"Input string containing the {field} " f"for {analysis_tool}",
         )
+
+    # and its parser options are optional arguments
+    parser_options = hAMRonization._ToolParserOptions.get(analysis_tool, {})
+    for option, argument in parser_options.items():
+        tool_parser.add_argument(f"--{option}", **argument)
     return subparser
 
 
+def parser_options(args):
+    """
+    The parser options of the tool of hamronize <tool> args that were given
+    """
+    return {
+        option: getattr(args, option)
+        for option in hAMRonization._ToolParserOptions.get(args.analysis_tool, {})
+        if getattr(args, option) is not None
+    }
+
+
+def _selected_subcommand():
+    """
+    The tool or other subcommand given on the command line (None if there is
+    none), parsed with just the top level options and the subcommand names
+    so only the parser of the chosen tool needs to be built (and its parser
+    module imported)
+    """
+    parser = argparse.ArgumentParser(add_help=False, exit_on_error=False)
+    parser.add_argument("--debug", action="store_true")
+    subparser = parser.add_subparsers(dest="analysis_tool")
+    for name in [*hAMRonization._RequiredToolMetadata, *_SUBCOMMAND_HANDLERS]:
+        subparser.add_parser(name, add_help=False)
+    try:
+        args, _ = parser.parse_known_args()
+    except argparse.ArgumentError:
+        # e.g., an unknown tool, left to the full parser to report
+        return None
+    return args.analysis_tool
+
+
+def _add_summarize_subparser(subparser):
+    # not very pretty to have this tied into the analysis tools list
+    # but there still doesn't seem a good way to group subparsers in
+    # the argparse library
+    description = "Concatenate and summarize AMR detection reports"
+    usage = "hamronize summarize <options> <list of reports>"
+    summarize_help = "Provide a list of paths to the reports you wish " "to summarize"
+
+    summarize_subparser = subparser.add_parser(
+        "summarize", description=description, usage=usage, help=summarize_help
+    )
+
+    summarize_subparser.add_argument(
+        "-t",
+        "--summary_type",
+        choices=["tsv", "json", "ndjson", "interactive"],
+        default="tsv",
+        help="Which summary report format to " "generate",
+    )
+
+    summarize_subparser.add_argument(
+        "-o", "--output", type=str, default=None, help="Output file path for summary"
+    )
+
+    add_compression_arguments(summarize_subparser)
+
+    summarize_subparser.add_argument(
+        "hamronized_reports", nargs="+", help="list of hAMRonized reports"
+    )
+
+
+def _add_batch_subparser(subparser):
+    # for any number of reports of any of the tools
+    description = (
+        "hAMRonize the reports listed in a manifest (a tsv file with a tool, "
+        "report and one column per required metadata field of its tools, "
+        "see hamronize <tool> --help) to one output"
+    )
+    usage = "hamronize batch <options> manifest.tsv"
+    batch_help = "hAMRonize the reports of any tools listed in a manifest"
+
+    batch_subparser = subparser.add_parser(
+        "batch", description=description, usage=usage, help=batch_help
+    )
+    batch_subparser.add_argument("manifest", help="Path to the manifest")
+    add_output_arguments(batch_subparser)
+    batch_subparser.add_argument(
+        "--journal",
+        default=None,
+        help="Record completed reports in this file, rerunning with the same "
+        "manifest, output and journal resumes an interrupted run",
+    )
+    add_cache_arguments(batch_subparser)
+
+
+def _add_serve_subparser(subparser):
+    # a long-running conversion server
+    description = (
+        "Serve conversions over HTTP on a unix socket or a local port, keeping "
+        "the parsers imported and a pool of worker processes running. Clients "
+        "POST json jobs to /hamronize (see hamronize <tool> --server)"
+    )
+    usage = "hamronize serve (--socket <path> | --port <port>) <options>"
+    serve_help = "Run a conversion server for many small conversions"
+
+    serve_subparser = subparser.add_parser(
+        "serve", description=description, usage=usage, help=serve_help
+    )
+    listen_group = serve_subparser.add_mutually_exclusive_group(required=True)
+    listen_group.add_argument(
+        "--socket",
+        default=None,
+        help="Listen on this unix socket (only accessible to the user running "
+        "the server)",
+    )
+    listen_group.add_argument(
+        "--port", type=int, default=None, help="Listen on this TCP port"
+    )
+    serve_subparser.add_argument(
+        "--host",
+        default="127.0.0.1",
+        help="Address to listen on with --port (default: 127.0.0.1, the "
+        "server reads any report path it is sent so only expose it to "
+        "trusted clients)",
+    )
+    serve_subparser.add_argument(
+        "--jobs",
+        type=int,
+        default=None,
+        help="Number of worker processes parsing reports (default, or 0: all "
+        "CPUs available, respecting CPU affinity and cgroup limits; 1 parses "
+        "in the server process)",
+    )
+    add_cache_arguments(serve_subparser)
+
+
+def _add_cache_subparser(subparser):
+    # to inspect and prune a --cache_dir
+    description = "Show the size of or prune a cache of hAMRonized reports"
+    usage = "hamronize cache {stats,prune} --cache_dir <dir> <options>"
+    cache_help = "Manage a cache of hAMRonized reports (see --cache_dir)"
+
+    cache_subparser = subparser.add_parser(
+        "cache", description=description, usage=usage, help=cache_help
+    )
+    cache_subparser.add_argument(
+        "cache_action",
+        choices=["stats", "prune"],
+        help="Show the number and size of the cached reports or evict the "
+        "least recently used ones",
+    )
+    cache_subparser.add_argument(
+        "--cache_dir", required=True, help="Cache directory"
+    )
+    cache_subparser.add_argument(
+        "--max_size",
+        type=_size_argument,
+        default=None,
+        help="Size to prune the cache to e.g. 500M or 20G, 0 to empty it "
+        "(default: 1G)",
+    )
+
+
+def _request_server_conversion(parser, args, metadata, options):
+    """
+    hamronize <tool> --server: have a conversion server convert the reports
+    """
+    if "-" in args.report:
+        parser.error("stdin can't be converted with --server")
+    # the server parses and caches with its own settings
+    if args.jobs is not None or args.cache_dir is not None:
+        parser.error(
+            "--jobs and --cache_dir can't be used with --server (set "
+            "them on hamronize serve)"
+        )
+    # imported here as only the client needs it
+    from hAMRonization import server
+
+    try:
+        output = server.request_conversion(
+            args.server,
+            args.analysis_tool,
+            args.report,
+            metadata,
+            args.format,
+            typed_json=args.typed_json,
+            options=options,
+        )
+    except (server.ConversionError, OSError) as e:
+        logger.error("%s", e)
+        sys.exit(1)
+    out_fh = open_output(
+        args.output, compression=args.compress,
+        compression_level=args.compress_level,
+    )
+    out_fh.write(output)
+    if out_fh is not sys.stdout:
+        out_fh.close()
+
+
+def _job_count(parser, args, report_count=None):
+    """
+    Number of worker processes of --jobs, all CPUs available (see
+    parallel.available_cpu_count()) when it isn't given or is 0, and at
+    most one per report when their number is known
+    """
+    if args.jobs is not None and args.jobs < 0:
+        parser.error("--jobs must be 0 or a positive number of processes")
+    jobs = args.jobs or hAMRonization.parallel.available_cpu_count()
+    if report_count is not None:
+        jobs = max(1, min(jobs, report_count))
+    return jobs
+
+
+def _run_tool(parser, args):
+    """
+    hamronize <tool>: convert the reports of a tool to one output
+    """
+    required_mandatory_metadata = hAMRonization._RequiredToolMetadata[
+        args.analysis_tool
+    ]
+    metadata = {
+        field: getattr(args, field) for field in required_mandatory_metadata
+    }
+    options = parser_options(args)
+
+    if args.server:
+        _request_server_conversion(parser, args, metadata, options)
+        return
+
+    # parse reports and write them all to one output (the writer only
+    # writes the tsv header once and keeps the json list valid)
+    writer = hAMRonizedResultWriter(
+        args.output,
+        args.format,
+        typed_json=args.typed_json,
+        compression=args.compress,
+        compression_level=args.compress_level,
+    )
+    cache = _result_cache(args)
+    jobs = _job_count(parser, args, len(args.report))
+    # stdin can only be read by this process
+    if jobs == 1 or "-" in args.report:
+        for report in args.report:
+            writer.write_batches(
+                hAMRonization.parallel.report_batches(
+                    report, metadata, args.analysis_tool, cache, options
+                )
+            )
+    else:
+        for rendered_batches in hAMRonization.parallel.render_reports(
+            args.report,
+            metadata,
+            args.analysis_tool,
+            args.format,
+            typed_json=args.typed_json,
+            jobs=jobs,
+            cache=cache,
+            options=options,
+        ):
+            writer.write_rendered(rendered_batches)
+    writer.close()
+    if cache is not None:
+        cache.prune()
+
+
+def _run_batch(parser, args):
+    """
+    hamronize batch: convert the reports of a manifest to one output
+    """
+    jobs = _job_count(parser, args)
+    cache = _result_cache(args)
+    try:
+        report_count = hAMRonization.batch.run_batch(
+            args.manifest,
+            output_location=args.output,
+            output_format=args.format,
+            typed_json=args.typed_json,
+            compression=args.compress,
+            compression_level=args.compress_level,
+            jobs=jobs,
+            journal_path=args.journal,
+            cache=cache,
+        )
+    except ValueError as e:
+        logger.error("%s", e)
+        sys.exit(1)
+    if cache is not None:
+        cache.prune()
+    if args.output:
+        print(
+            f"Written {report_count} reports to {args.output}",
+            file=sys.stderr,
+        )
+
+
+def _run_serve(parser, args):
+    """
+    hamronize serve: run a conversion server until interrupted
+    """
+    jobs = _job_count(parser, args)
+    from hAMRonization import server
+
+    server.serve(
+        socket_path=args.socket,
+        host=args.host,
+        port=args.port,
+        jobs=jobs,
+        cache=_result_cache(args),
+    )
+
+
+def _run_cache(parser, args):
+    """
+    hamronize cache: show the size of or prune a cache
+    """
+    cache = hAMRonization.cache.ResultCache(args.cache_dir)
+    if args.cache_action == "prune":
+        removed, freed = cache.prune(args.max_size)
+        print(f"Removed {removed} reports ({freed} bytes)")
+    entry_count, total_size = cache.stats()
+    print(f"{entry_count} reports cached in {args.cache_dir} ({total_size} bytes)")
+
+
+def _run_summarize(parser, args):
+    """
+    hamronize summarize: concatenate and summarize hAMRonized reports
+    """
+    # only import summarize (and pandas) when summarizing
+    from hAMRonization import summarize
+
+    summarize.summarize_reports(
+        args.hamronized_reports, args.summary_type, args.output,
+        compression=args.compress, compression_level=args.compress_level,
+    )
+    exit(0)
+
+
+# (add subparser, run) of each subcommand besides the tools
+_SUBCOMMAND_HANDLERS = {
+    "summarize": (_add_summarize_subparser, _run_summarize),
+    "batch": (_add_batch_subparser, _run_batch),
+    "serve": (_add_serve_subparser, _run_serve),
+    "cache": (_add_cache_subparser, _run_cache),
+}
+
+
 def generic_cli_interface():
     """
     Generate a generic tool report parser that passes to the tool specific
@@ -269,36 +1032,18 @@ def generic_cli_interface():
         title="Tools with hAMRonizable reports", help="", dest="analysis_tool"
     )
 
+    # only the parser of the tool being run needs its arguments (and so its
+    # parser module), the others are just listed in the help
+    selected_tool = _selected_subcommand()
     for analysis_tool in hAMRonization._RequiredToolMetadata.keys():
-        subparser = generate_tool_subparser(subparser, analysis_tool)
-
-    # add summarize subparser
-    # not very pretty to have this tied into the analysis tools list
-    # but there still doesn't seem a good way to group subparsers in
-    # the argparse library
-    description = "Concatenate and summarize AMR detection reports"
-    usage = "hamronize summarize <options> <list of reports>"
-    summarize_help = "Provide a list of paths to the reports you wish " "to summarize"
-
-    summarize_subparser = subparser.add_parser(
-        "summarize", description=description, usage=usage, help=summarize_help
-    )
-
-    summarize_subparser.add_argument(
-        "-t",
-        "--summary_type",
-        choices=["tsv", "json", "interactive"],
-        default="tsv",
-        help="Which summary report format to " "generate",
-    )
-
-    summarize_subparser.add_argument(
-        "-o", "--output", type=str, default=None, help="Output file path for summary"
-    )
-
-    summarize_subparser.add_argument(
-        "hamronized_reports", nargs="+", help="list of hAMRonized reports"
-    )
+        if analysis_tool == selected_tool:
+            subparser = generate_tool_subparser(subparser, analysis_tool)
+        else:
+            subparser.add_parser(
+                analysis_tool, help=_tool_subparser_help(analysis_tool)
+            )
+    for add_subparser, _ in _SUBCOMMAND_HANDLERS.values():
+        add_subparser(subparser)
 
     args = parser.parse_args()
 
@@ -309,33 +1054,11 @@ def generic_cli_interface():
         logging.basicConfig(level=logging.WARNING,
                             format="%(levelname)s: %(message)s")
 
-    if args.analysis_tool and args.analysis_tool != "summarize":
-        required_mandatory_metadata = hAMRonization._RequiredToolMetadata[
-            args.analysis_tool
-        ]
-        metadata = {
-            field: getattr(args, field) for field in required_mandatory_metadata
-        }
-
-        # parse reports and write as appropriate (only first report with head
-        # in tsv mode)
-        # check number of reports and append correctly if >1
-        total_report_count = len(args.report)
-        for report_number, report in enumerate(args.report):
-            parsed_report = hAMRonization.parse(report, metadata, args.analysis_tool)
-
-            parsed_report.write(
-                report_number=report_number,
-                total_report_count=total_report_count,
-                output_location=args.output,
-                output_format=args.format,
-            )
-
-    elif args.analysis_tool == "summarize":
-        hAMRonization.summarize.summarize_reports(
-            args.hamronized_reports, args.summary_type, args.output
-        )
-        exit(0)
+    if args.analysis_tool in _SUBCOMMAND_HANDLERS:
+        _, run = _SUBCOMMAND_HANDLERS[args.analysis_tool]
+        run(parser, args)
+    elif args.analysis_tool:
+        _run_tool(parser, args)
     else:
         parser.print_help()
         exit(1)
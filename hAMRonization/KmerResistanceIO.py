@@ -1,7 +1,8 @@
 #!/usr/bin/env python
 
-import csv
 from .Interfaces import hAMRonizedResultIterator
+from .references import decompose, log_statistics
+from .tabular import TabularReader, mapped_columns
 from hAMRonization.constants import GENE_PRESENCE
 
 required_metadata = [
@@ -44,10 +45,8 @@ class KmerResistanceIterator(hAMRonizedResultIterator):
         Read each and return it
         """
         # skip any manually specified fields for later
-        reader = csv.DictReader(handle, delimiter="\t")
+        reader = TabularReader(handle, columns=[*mapped_columns(self.field_mapping), "#Template"])
         for result in reader:
-            gene_name = "_".join(result["#Template"].split("_")[:-1])
-            result["_gene_name"] = gene_name
-            result["_gene_symbol"] = result["#Template"].split("_")[0]
-
+            result.update(decompose("kmerresistance", result["#Template"]))
             yield self.hAMRonize(result, self.metadata)
+        log_statistics()
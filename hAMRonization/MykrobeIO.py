@@ -1,12 +1,39 @@
 #!/usr/bin/env python
 
-import json
+import itertools
 import re
 from .Interfaces import hAMRonizedResultIterator
+from .jsonstream import iter_selected_members
+from .mutations import AMINO_ACID_SYMBOLS, mykrobe_variant
 from hAMRonization.constants import NUCLEOTIDE_VARIANT, AMINO_ACID_VARIANT
 
 required_metadata = []
 
+parser_options = {
+    "input_file_names": {
+        "choices": ["auto", "report", "sample"],
+        "default": None,
+        "help": "Set input_file_name to the report's file name (report), to "
+        "each sample's name (sample) or, by default (auto), to the report's "
+        "file name for a single-sample report and to each sample's name for "
+        "a multi-sample one (e.g., the report of a plate)",
+    },
+}
+
+# a report has a member per sample (e.g., for a whole plate) and these are
+# the only parts of each sample's report that are read (e.g., the genotypes
+# of every probe and the per-variant calls are skipped without being decoded)
+JSON_SELECTION = {
+    "*": {
+        "probe_sets": True,
+        "version": True,
+        "susceptibility": True,
+    },
+}
+
+# the panel of a probe set path
+_PANEL_NAME_RE = re.compile(r".*mykrobe/data/(?P<panel>.*)/")
+
 
 class MykrobeIterator(hAMRonizedResultIterator):
     reference_genomes = {
@@ -16,28 +43,9 @@ class MykrobeIterator(hAMRonizedResultIterator):
         "typhi": "AL513382.1",  # Salmonella typhi
     }
 
-    aa_symbols = {
-        "A": "Ala",
-        "C": "Cys",
-        "D": "Asp",
-        "E": "Glu",
-        "F": "Phe",
-        "G": "Gly",
-        "H": "His",
-        "I": "Ile",
-        "K": "Lys",
-        "L": "Leu",
-        "M": "Met",
-        "N": "Asn",
-        "P": "Pro",
-        "Q": "Gln",
-        "R": "Arg",
-        "S": "Ser",
-        "T": "Thr",
-        "V": "Val",
-        "W": "Trp",
-        "Y": "Tyr",
-    }
+    aa_symbols = AMINO_ACID_SYMBOLS
+
+    input_file_names = "auto"
 
     def __init__(self, source, metadata):
         metadata["analysis_software_name"] = "Mykrobe"
@@ -65,47 +73,54 @@ class MykrobeIterator(hAMRonizedResultIterator):
         super().__init__(source, self.field_mapping, self.metadata)
 
     def parse(self, handle):
-        variant_info_re = re.compile(
-            r"(?P<gene_symbol>[^_]+)_(?P<aa_change>(?P<aa_from>[A-Z])"
-            r"(?P<aa_pos>\d+)(?P<aa_to>[A-Z]))-"
-            r"(?P<codon_change>(?P<codon_from>[ACTG]{1,3})"
-            r"(?P<codon_pos>\d+)(?P<codon_to>[ACTG]{1,3}))"
-        )
-        panel_name_re = re.compile(r".*mykrobe/data/(?P<panel>.*)/")
-        data = json.load(handle)
-
-        sample_names = list(data.keys())
-        if len(sample_names) == 0:
-            return  # take an empty JSON object as a success but with no results
-        assert len(sample_names) == 1, "can only parse output with a single "
-        "sample currently, found {}".format(len(sample_names))
-        sample_name = sample_names[0]
-        panel_name_match = panel_name_re.match(data[sample_name]["probe_sets"][0])
+        # the samples are read (and converted) one at a time, an empty JSON
+        # object is taken as a success but with no results
+        samples = iter_selected_members(handle, JSON_SELECTION)
+        if self.input_file_names == "auto":
+            # whether a report has several samples is only known once its
+            # second sample is read, so the first is held back until then
+            first = next(samples, None)
+            if first is None:
+                return
+            second = next(samples, None)
+            if second is None:
+                yield from self.parse_sample(first[1], self.source_name)
+                return
+            samples = itertools.chain((first, second), samples)
+        for sample_name, sample in samples:
+            if self.input_file_names == "report":
+                filename = self.source_name
+            else:
+                filename = sample_name
+            yield from self.parse_sample(sample, filename)
+
+    def parse_sample(self, sample, filename):
+        panel_name_match = _PANEL_NAME_RE.match(sample["probe_sets"][0])
         assert panel_name_match is not None, "can't match panel name "
-        "from {}".format(data[sample_name]["probe_sets"][0])
+        "from {}".format(sample["probe_sets"][0])
         panel_name = panel_name_match.group("panel")
         if panel_name not in self.reference_genomes:
             raise ValueError("Unknown panel {}".format(panel_name))
         reference_accession = self.reference_genomes[panel_name]
-        mykrobe_version = data[sample_name]["version"]["mykrobe-predictor"]
-        mykrobe_atlas_version = data[sample_name]["version"]["mykrobe-atlas"]
+        mykrobe_version = sample["version"]["mykrobe-predictor"]
+        mykrobe_atlas_version = sample["version"]["mykrobe-atlas"]
         db_name = ";".join(
             [
                 re.sub(r".*mykrobe/data/(.*)", r"\1", probe_set)
-                for probe_set in data[sample_name]["probe_sets"]
+                for probe_set in sample["probe_sets"]
             ]
         )
 
-        for drug_name in data[sample_name]["susceptibility"]:
-            drug = data[sample_name]["susceptibility"][drug_name]
+        for drug_name in sample["susceptibility"]:
+            drug = sample["susceptibility"][drug_name]
             if drug["predict"] == "S":
                 continue
             for variant in drug["called_by"]:
-                variant_match = variant_info_re.match(variant)
+                parsed_variant = mykrobe_variant(variant)
                 assert (
-                    variant_match is not None
-                ), "variant_info_re failed to match {}".format(variant)
-                gene_symbol = variant_match.group("gene_symbol")
+                    parsed_variant is not None
+                ), "mykrobe_variant failed to match {}".format(variant)
+                gene_symbol, codon_change, protein_change = parsed_variant
                 coverage_percentage = drug["called_by"][variant]["info"]["coverage"][
                     "alternate"
                 ]["percent_coverage"]
@@ -119,20 +134,15 @@ class MykrobeIterator(hAMRonizedResultIterator):
                     median_coverage_depth + ref_median_coverage_depth
                 )
 
-                if len(variant_match.group("codon_from")) == 1:
+                if protein_change is None:
                     # this not a protein change
                     variant_type = NUCLEOTIDE_VARIANT
                     protein_mutation = (None,)
                 else:
                     variant_type = AMINO_ACID_VARIANT
-                    protein_mutation = (
-                        "p."
-                        + self.aa_symbols[variant_match.group("aa_from")]
-                        + variant_match.group("aa_pos")
-                        + self.aa_symbols[variant_match.group("aa_to")]
-                    )
+                    protein_mutation = protein_change
                 result = {
-                    "filename": handle.name,
+                    "filename": filename,
                     "gene_symbol": gene_symbol,
                     "gene_name": gene_symbol,
                     "drug": drug_name,
@@ -142,9 +152,8 @@ class MykrobeIterator(hAMRonizedResultIterator):
                     "db_name": db_name,
                     "db_version": mykrobe_atlas_version,
                     "reference_accession": reference_accession,
-                    "nucleotide_mutation": variant_match.group(
-                        "codon_change"
-                    ),  # TODO: make this work using lookup table of gene positions
+                    # TODO: make this work using lookup table of gene positions
+                    "nucleotide_mutation": codon_change,
                     "amino_acid_mutation": protein_mutation,
                     "nucleotide_mutation_interpretation": None,
                     "amino_acid_mutation_interpretation": None,
@@ -2,6 +2,8 @@
 
 from collections import OrderedDict
 from .Interfaces import hAMRonizedResultIterator
+from .references import decompose, log_statistics
+from .hmmer import HmmerTableReader, THRESHOLD_OPTIONS
 from hAMRonization.constants import GENE_PRESENCE
 
 required_metadata = [
@@ -10,8 +12,14 @@ required_metadata = [
     "input_file_name",
 ]
 
+parser_options = THRESHOLD_OPTIONS
+
 
 class ResFamsIterator(hAMRonizedResultIterator):
+    # thresholds of the hits to report (see parser_options)
+    max_evalue = None
+    min_score = None
+
     def __init__(self, source, metadata):
         metadata["analysis_software_name"] = "resfams"
         metadata["reference_database_name"] = "resfams_hmms"
@@ -56,8 +64,14 @@ class ResFamsIterator(hAMRonizedResultIterator):
         report_fieldnames = [
             x for x in self.field_mapping.keys() if not x.startswith("_")
         ]
-        for result in handle:
-            if not result.startswith("#"):
-                result = dict(zip(report_fieldnames, result.split()))
-                result["_gene_symbol"] = result["query name"].split("_")[0]
-                yield self.hAMRonize(result, self.metadata)
+        reader = HmmerTableReader(
+            handle,
+            report_fieldnames,
+            "tblout",
+            max_evalue=self.max_evalue,
+            min_score=self.min_score,
+        )
+        for result in reader:
+            result.update(decompose("resfams", result["query name"]))
+            yield self.hAMRonize(result, self.metadata)
+        log_statistics()
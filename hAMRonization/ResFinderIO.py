@@ -1,14 +1,26 @@
 #!/usr/bin/env python
 
-import json
+from collections import defaultdict
 from .Interfaces import hAMRonizedResultIterator
-from .hAMRonizedResult import hAMRonizedResult
+from .jsonstream import load_selected
 from hAMRonization.constants import (GENE_PRESENCE, NUCLEOTIDE_VARIANT, AMINO_ACID_VARIANT)
 
 # No required metadata, everything is in the JSON
 required_metadata = [
 ]
 
+# the only parts of data_resfinder.json that are read (e.g., the aln_hits
+# and result_summary are skipped without being decoded)
+JSON_SELECTION = {
+    "databases": True,
+    "seq_regions": True,
+    "seq_variations": True,
+    "phenotypes": True,
+    "software_executions": True,
+    "software_name": True,
+    "software_version": True,
+}
+
 
 # This class is the parser instantiated by the hAMRonize framework to parse
 # ResFinder output. Its parse() method must return a hAMRonizedResultIterator
@@ -36,14 +48,11 @@ class ResFinderIterator(hAMRonizedResultIterator):
         that yields the list of results.
         """
 
-        # Result to be returned, with mandatory initialisations of the 9 "positional" args
-        res = hAMRonizedResult('', '', '', '', '', '', '', '', '')
-
         # Input data read in ResFinder 4.2+ JSON format.  This has three main elements:
         # - seq_regions: loci/genes that were found, keying into 0 or more phenotypes
         # - seq_variations: mutations that key into a seq_region and 0 or more phenotypes
         # - phenotypes: antimicrobials keying back into the above objects
-        data = json.load(handle)
+        data = load_selected(handle, JSON_SELECTION)
 
         # Helpers to fetch database names and versions from the JSON data
         _dbs = data['databases']
@@ -55,43 +64,44 @@ class ResFinderIterator(hAMRonizedResultIterator):
         def _get_db_ver(keys):
             return _dbs.get(keys[0], _unk_db).get('database_version', "no-version") if keys else "unspecified"
 
-        # Setter for the hAMRonizedResult fields related to genes
-        def set_shared_fields(r):
-            """Sets all fields in res that relate to region r. Applies to both gene and mutation results."""
-
-            # mandatory
-            res.gene_symbol = r.get('name', "unspecified")
-            res.gene_name = r.get('name', "unspecified")
-            res.reference_accession = r.get('ref_acc', r.get('ref_id', r.get('key', "unknown")))
-            res.reference_database_name = _get_db_name(r.get('ref_database'))
-            res.reference_database_version = _get_db_ver(r.get('ref_database'))
-
-            # optional
-            res.coverage_percentage = _safe_round(r.get('coverage'), 1)
-            res.coverage_depth = None  # we may have this for mutations detected from reads
-            res.coverage_ratio = None
-            res.input_sequence_id = r.get('query_id')
-            res.input_gene_length = _get_length(r.get('query_start_pos'), r.get('query_end_pos'))
-            res.input_gene_start = _get_start_pos(r.get('query_start_pos'), r.get('query_end_pos'))
-            res.input_gene_stop = _get_end_pos(r.get('query_start_pos'), r.get('query_end_pos'))
-            res.strand_orientation = _get_strand(r.get('query_start_pos'), r.get('query_end_pos'))
-            res.predicted_phenotype = 'antimicrobial resistance'  # we report only resistant phenotypes
-            res.predicted_phenotype_confidence_level = _condense_notes(r.get('notes'), r.get('pmids'))
-            res.reference_gene_length = r.get('ref_seq_length')
-            res.reference_gene_start = r.get('ref_start_pos')
-            res.reference_gene_stop = r.get('ref_end_pos')
-            res.resistance_mechanism = None  # This is available in phenotypes.txt but not in the JSON
-            res.sequence_identity = _safe_round(r.get('identity'), 2)
-
-            # Zap these by default, will only be set in seq_variations below
-            res.amino_acid_mutation = None
-            res.amino_acid_mutation_interpretation = None
-            res.nucleotide_mutation = None
-            res.nucleotide_mutation_interpretation = None
-
-        # Setter for the hAMRonizedResult fields related to mutations
-        def set_variation_fields(r, vs):
-            """Sets the mutation-specific fields in res, aggregating from all variations vs."""
+        # Builder for the hAMRonizedResult fields related to genes
+        def region_fields(r):
+            """Returns the fields that relate to region r. Applies to both gene and mutation results."""
+            return {
+                # mandatory
+                'gene_symbol': r.get('name', "unspecified"),
+                'gene_name': r.get('name', "unspecified"),
+                'reference_accession': r.get('ref_acc', r.get('ref_id', r.get('key', "unknown"))),
+                'reference_database_name': _get_db_name(r.get('ref_database')),
+                'reference_database_version': _get_db_ver(r.get('ref_database')),
+
+                # optional
+                'coverage_percentage': _safe_round(r.get('coverage'), 1),
+                'coverage_depth': None,  # we may have this for mutations detected from reads
+                'coverage_ratio': None,
+                'input_sequence_id': r.get('query_id'),
+                'input_gene_length': _get_length(r.get('query_start_pos'), r.get('query_end_pos')),
+                'input_gene_start': _get_start_pos(r.get('query_start_pos'), r.get('query_end_pos')),
+                'input_gene_stop': _get_end_pos(r.get('query_start_pos'), r.get('query_end_pos')),
+                'strand_orientation': _get_strand(r.get('query_start_pos'), r.get('query_end_pos')),
+                'predicted_phenotype': 'antimicrobial resistance',  # we report only resistant phenotypes
+                'predicted_phenotype_confidence_level': _condense_notes(r.get('notes'), r.get('pmids')),
+                'reference_gene_length': r.get('ref_seq_length'),
+                'reference_gene_start': r.get('ref_start_pos'),
+                'reference_gene_stop': r.get('ref_end_pos'),
+                'resistance_mechanism': None,  # This is available in phenotypes.txt but not in the JSON
+                'sequence_identity': _safe_round(r.get('identity'), 2),
+
+                # None by default, will only be set for seq_variations below
+                'amino_acid_mutation': None,
+                'amino_acid_mutation_interpretation': None,
+                'nucleotide_mutation': None,
+                'nucleotide_mutation_interpretation': None,
+            }
+
+        # Builder for the hAMRonizedResult fields related to mutations
+        def variation_fields(vs):
+            """Returns the mutation-specific fields, aggregating from all variations vs."""
 
             # Bags to collect variations, phenotypes and notes across the variations
             _aa_vars = list()
@@ -100,7 +110,7 @@ class ResFinderIterator(hAMRonizedResultIterator):
             _notes = set()
             _pmids = set()
 
-            res.genetic_variation_type = NUCLEOTIDE_VARIANT
+            variation_type = NUCLEOTIDE_VARIANT
 
             # Iterate v over the variations in vs in order of their position
             for v in sorted(vs, key=lambda v: v.get('ref_start_pos', 0)):
@@ -109,7 +119,7 @@ class ResFinderIterator(hAMRonizedResultIterator):
                 # though it seems recent Res/PointFinder output uses HGVS coordinates.
                 _seq_var = v.get('seq_var', '')
                 if _seq_var.startswith('p'):
-                    res.genetic_variation_type = AMINO_ACID_VARIANT  # override default set above
+                    variation_type = AMINO_ACID_VARIANT  # override default set above
                     _aa_vars.append(_seq_var)
                 elif _seq_var:
                     _nt_vars.append(_seq_var)
@@ -122,18 +132,28 @@ class ResFinderIterator(hAMRonizedResultIterator):
                 _notes.update(v.get('notes', []))
                 _pmids.update(v.get('pmids', []))
 
-            # We have collected all variations on region r, now collapse into fields on res
-            res.predicted_phenotype_confidence_level = _condense_notes(_notes, _pmids)
-            res.amino_acid_mutation = _empty_to_none(", ".join(filter(None, _aa_vars)))
-            res.nucleotide_mutation = _empty_to_none(", ".join(filter(None, _nt_vars)))
-            res.nucleotide_mutation_interpretation = ("Codon changes: " + " ".join(_codons)) if _codons else None
+            # We have collected all variations on the region, now collapse into fields
+            return {
+                'genetic_variation_type': variation_type,
+                'predicted_phenotype_confidence_level': _condense_notes(_notes, _pmids),
+                'amino_acid_mutation': _empty_to_none(", ".join(filter(None, _aa_vars))),
+                'nucleotide_mutation': _empty_to_none(", ".join(filter(None, _nt_vars))),
+                'nucleotide_mutation_interpretation': ("Codon changes: " + " ".join(_codons)) if _codons else None,
+            }
 
         # --- Do the actual work --- #
 
-        # Set the fields that are independent of gene, mutation, phenotype
-        res.input_file_name = data['software_executions'].copy().popitem()[1]['parameters']['sample_name']
-        res.analysis_software_name = data['software_name']
-        res.analysis_software_version = data['software_version']
+        # The fields that are independent of gene, mutation, phenotype
+        report_fields = {
+            'input_file_name': data['software_executions'].copy().popitem()[1]['parameters']['sample_name'],
+            'analysis_software_name': data['software_name'],
+            'analysis_software_version': data['software_version'],
+        }
+
+        # Index the phenotypes and variations in one pass each, rather than
+        # scanning all phenotypes for every region and variation
+        region_phenotypes, variation_phenotypes = _index_phenotypes(data['phenotypes'])
+        region_variations = _index_variations(data['seq_variations'])
 
         # To obtain the AMR genes, we flatten the ResFinder data graph as follows
         # - iterate over each region r
@@ -144,24 +164,24 @@ class ResFinderIterator(hAMRonizedResultIterator):
             amr_cls = set()
             amr_res = set()
 
-            # Iterate p over the phenotypes that reference r and have amr_resistant set true
-            # and collect their AMR classes and antimicrobials
-            for p in filter(lambda p: r['key'] in p.get('seq_regions', [])
-                            and p.get('amr_resistant', False), data['phenotypes'].values()):
+            # Collect the AMR classes and antimicrobials of the phenotypes that
+            # reference r and have amr_resistant set true
+            for p in region_phenotypes.get(r['key'], ()):
                 amr_cls.update(p.get('amr_classes', []))
                 amr_res.add(p.get('amr_resistance', "unspecified"))
 
             # If we collected any AMR we emit the region as a GENE_PRESENCE record
             if amr_cls or amr_res:
 
-                # Set the fields collected from the phenotypes and from the region object
-                res.genetic_variation_type = GENE_PRESENCE
-                res.drug_class = ", ".join(sorted(amr_cls))
-                res.antimicrobial_agent = ", ".join(sorted(amr_res))
-                set_shared_fields(r)
+                # Combine the fields collected from the phenotypes and from the region object
+                fields = region_fields(r)
+                fields.update(report_fields)
+                fields['genetic_variation_type'] = GENE_PRESENCE
+                fields['drug_class'] = ", ".join(sorted(amr_cls))
+                fields['antimicrobial_agent'] = ", ".join(sorted(amr_res))
 
                 # Yield a new hAMRonizedResult using super's method as that may do the needful
-                yield self.hAMRonize(None, res.__dict__)
+                yield self.hAMRonize(None, fields)
 
         # For the variants things are slightly more involved, as phenotypes don't reference
         # seq_regions directly, but through seq_variations.  We have some indirection here.
@@ -174,10 +194,8 @@ class ResFinderIterator(hAMRonizedResultIterator):
             # We want to collect all variations vs that reference region r AND are referenced
             # by a phenotype p that is amr_resistant.  Along the way we collect from the p
             # the AMR classes and antimicriobials (to save us another iteration)
-            for v in filter(lambda v: r['key'] in v.get('seq_regions', []), data['seq_variations'].values()):
-                for p in filter(lambda p: v['key'] in p.get('seq_variations', [])
-                                and (p.get('amr_classes') or p.get('amr_resistance'))
-                                and p.get('amr_resistant', False), data['phenotypes'].values()):
+            for v in region_variations.get(r['key'], ()):
+                for p in variation_phenotypes.get(v['key'], ()):
                     amr_cls.update(p.get('amr_classes', []))
                     amr_res.add(p.get('amr_resistance', "unspecified"))
                     vs_dict[v['key']] = v  # need to do this in inner loop but dups will squish
@@ -185,15 +203,46 @@ class ResFinderIterator(hAMRonizedResultIterator):
             # If we collected variants with resistant phenotypes then emit a record
             if vs_dict:
 
-                # Set fields we collected plus the region and variant ones as above
-                res.genetic_variation_type = NUCLEOTIDE_VARIANT  # default may be overridden
-                res.drug_class = ", ".join(sorted(amr_cls))
-                res.antimicrobial_agent = ", ".join(sorted(amr_res))
-                set_shared_fields(r)
-                set_variation_fields(r, vs_dict.values())
+                # Combine fields we collected plus the region and variant ones as above
+                fields = region_fields(r)
+                fields.update(report_fields)
+                fields['drug_class'] = ", ".join(sorted(amr_cls))
+                fields['antimicrobial_agent'] = ", ".join(sorted(amr_res))
+                fields.update(variation_fields(vs_dict.values()))
 
                 # Yield a new hAMRonizedResult using super's method as that may do the needful
-                yield self.hAMRonize(None, res.__dict__)
+                yield self.hAMRonize(None, fields)
+
+
+# Inverted indexes of the ResFinder data graph (keys listed twice by an object
+# are only indexed once, as in a membership test)
+
+def _index_phenotypes(phenotypes):
+    """
+    Index the amr_resistant phenotypes by the keys of the objects they
+    reference: region key -> the phenotypes that reference it, and variation
+    key -> the phenotypes (with AMR classes or antimicrobials) that reference it
+    """
+    region_phenotypes = defaultdict(list)
+    variation_phenotypes = defaultdict(list)
+    for p in phenotypes.values():
+        if not p.get('amr_resistant', False):
+            continue
+        for key in dict.fromkeys(p.get('seq_regions', [])):
+            region_phenotypes[key].append(p)
+        if p.get('amr_classes') or p.get('amr_resistance'):
+            for key in dict.fromkeys(p.get('seq_variations', [])):
+                variation_phenotypes[key].append(p)
+    return region_phenotypes, variation_phenotypes
+
+
+def _index_variations(seq_variations):
+    """Index the variations by region key (in report order)"""
+    region_variations = defaultdict(list)
+    for v in seq_variations.values():
+        for key in dict.fromkeys(v.get('seq_regions', [])):
+            region_variations[key].append(v)
+    return region_variations
 
 
 # Miscellaneous little helper functions to keep the above uncluttered
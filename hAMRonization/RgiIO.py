@@ -1,9 +1,9 @@
 #!/usr/bin/env python
 
-import csv
-import re
 import math
 from .Interfaces import hAMRonizedResultIterator
+from .tabular import TabularReader, mapped_columns
+from .mutations import protein_mutations, nucleotide_mutations
 from hAMRonization.constants import (
     NUCLEOTIDE_VARIANT,
     AMINO_ACID_VARIANT,
@@ -18,101 +18,115 @@ required_metadata = [
 
 
 class RgiIterator(hAMRonizedResultIterator):
+    # the header and first result tell the variant of the report apart
+    sniff_lines = 2
+
     def __init__(self, source, metadata):
         metadata["analysis_software_name"] = "rgi"
         metadata["reference_database_name"] = "CARD"
         metadata["genetic_variation_type"] = "Gene presence detected"
         self.metadata = metadata
 
-        with open(source) as fh:
-            header = next(fh)
-            # i.e. RGI-bwt
-            if "Resistomes & Variants: Observed in Genome(s)" in header.strip().split(
-                "\t"
-            ):
-                self.field_mapping = {
-                    "ARO Term": "gene_symbol",
-                    "ARO Accession": "reference_accession",
-                    "Reference Model Type": "genetic_variation_type",
-                    "Reference DB": "reference_database_name",
-                    "Alleles with Mapped Reads": None,
-                    "Reference Allele(s) Identity to CARD Reference Protein (%)": "sequence_identity",
-                    "Resistomes & Variants: Observed in Genome(s)": None,
-                    "Resistomes & Variants: Observed in Plasmid(s)": None,
-                    "Resistomes & Variants: Observed Pathogen(s)": None,
-                    "Completely Mapped Reads": None,
-                    "Mapped Reads with Flanking Sequence": None,
-                    "All Mapped Reads": None,
-                    "Average Percent Coverage": "coverage_percentage",
-                    "Average Length Coverage (bp)": "input_gene_length",
-                    "Average MAPQ (Completely Mapped Reads)": None,
-                    "Number of Mapped Baits": None,
-                    "Number of Mapped Baits with Reads": None,
-                    "Average Number of reads per Bait": None,
-                    "Number of reads per Bait Coefficient of Variation (%)": None,
-                    "Number of reads mapping to baits and mapping to complete gene": None,
-                    "Number of reads mapping to baits and mapping to complete gene (%)": None,
-                    "Mate Pair Linkage (# reads)": None,
-                    "Reference Length": "reference_gene_length",
-                    "AMR Gene Family": "gene_name",
-                    "Drug Class": "drug_class",
-                    "Resistance Mechanism": "resistance_mechanism",
-                }
-            else:
-                # normal RGI mode
-                self.field_mapping = {
-                    "ORF_ID": None,
-                    "Contig": "input_sequence_id",
-                    "Start": "input_gene_start",
-                    "Stop": "input_gene_stop",
-                    "Orientation": "strand_orientation",
-                    "Cut_Off": None,
-                    "Pass_Bitscore": None,
-                    "Best_Hit_Bitscore": None,
-                    "Best_Hit_ARO": "gene_symbol",
-                    "Best_Identities": "sequence_identity",
-                    "ARO": "reference_accession",
-                    "Model_type": "genetic_variation_type",
-                    "SNPs_in_Best_Hit_ARO": None,
-                    "_nucleotide_mutation": "nucleotide_mutation",
-                    "_amino_acid_mutation": "amino_acid_mutation",
-                    "Other_SNPs": None,
-                    "Drug Class": "drug_class",
-                    "Resistance Mechanism": "resistance_mechanism",
-                    "AMR Gene Family": "gene_name",
-                    "Predicted_DNA": None,
-                    "Predicted_Protein": None,
-                    "CARD_Protein_Sequence": None,
-                    "Percentage Length of " "Reference Sequence": "coverage_percentage",
-                    "ID": None,
-                    "Model_ID": None,
-                    "Nudged": None,
-                    "Note": None,
-                    "Hit_Start": "reference_gene_start",
-                    "Hit_End": "reference_gene_stop",
-                    "Antibiotic": "antimicrobial_agent",
-                }
-                # if RGI is run on ORFs then Contig should be None
-                # and input_sequence_id should the ORF_ID i.e., reverse of
-                # rgi run on contig input
-                # this checks for that
-                try:
-                    first_result = next(fh)
-                    first_result = first_result.strip().split('\t')
-                    if first_result[1] == '':
-                        self.field_mapping['ORF_ID'] = 'input_sequence_id'
-                        self.field_mapping['Contig'] = None
-                except StopIteration:
-                    pass
+        # normal RGI mode
+        self.field_mapping = {
+            "ORF_ID": None,
+            "Contig": "input_sequence_id",
+            "Start": "input_gene_start",
+            "Stop": "input_gene_stop",
+            "Orientation": "strand_orientation",
+            "Cut_Off": None,
+            "Pass_Bitscore": None,
+            "Best_Hit_Bitscore": None,
+            "Best_Hit_ARO": "gene_symbol",
+            "Best_Identities": "sequence_identity",
+            "ARO": "reference_accession",
+            "Model_type": "genetic_variation_type",
+            "SNPs_in_Best_Hit_ARO": None,
+            "_nucleotide_mutation": "nucleotide_mutation",
+            "_amino_acid_mutation": "amino_acid_mutation",
+            "Other_SNPs": None,
+            "Drug Class": "drug_class",
+            "Resistance Mechanism": "resistance_mechanism",
+            "AMR Gene Family": "gene_name",
+            "Predicted_DNA": None,
+            "Predicted_Protein": None,
+            "CARD_Protein_Sequence": None,
+            "Percentage Length of " "Reference Sequence": "coverage_percentage",
+            "ID": None,
+            "Model_ID": None,
+            "Nudged": None,
+            "Note": None,
+            "Hit_Start": "reference_gene_start",
+            "Hit_End": "reference_gene_stop",
+            "Antibiotic": "antimicrobial_agent",
+        }
+
+        # RGI-bwt mode (selected from the header when parsing)
+        self.bwt_field_mapping = {
+            "ARO Term": "gene_symbol",
+            "ARO Accession": "reference_accession",
+            "Reference Model Type": "genetic_variation_type",
+            "Reference DB": "reference_database_name",
+            "Alleles with Mapped Reads": None,
+            "Reference Allele(s) Identity to CARD Reference Protein (%)": "sequence_identity",
+            "Resistomes & Variants: Observed in Genome(s)": None,
+            "Resistomes & Variants: Observed in Plasmid(s)": None,
+            "Resistomes & Variants: Observed Pathogen(s)": None,
+            "Completely Mapped Reads": None,
+            "Mapped Reads with Flanking Sequence": None,
+            "All Mapped Reads": None,
+            "Average Percent Coverage": "coverage_percentage",
+            "Average Length Coverage (bp)": "input_gene_length",
+            "Average MAPQ (Completely Mapped Reads)": None,
+            "Number of Mapped Baits": None,
+            "Number of Mapped Baits with Reads": None,
+            "Average Number of reads per Bait": None,
+            "Number of reads per Bait Coefficient of Variation (%)": None,
+            "Number of reads mapping to baits and mapping to complete gene": None,
+            "Number of reads mapping to baits and mapping to complete gene (%)": None,
+            "Mate Pair Linkage (# reads)": None,
+            "Reference Length": "reference_gene_length",
+            "AMR Gene Family": "gene_name",
+            "Drug Class": "drug_class",
+            "Resistance Mechanism": "resistance_mechanism",
+        }
 
         super().__init__(source, self.field_mapping, self.metadata)
 
+    def _select_field_mapping(self, header, first_result):
+        """
+        Switch to the RGI-bwt field mapping or the ORF input variant of the
+        normal RGI mapping based on the header and first result of the report
+        """
+        # i.e. RGI-bwt
+        if "Resistomes & Variants: Observed in Genome(s)" in header:
+            self.field_map = self.bwt_field_mapping
+        # if RGI is run on ORFs then Contig should be None
+        # and input_sequence_id should the ORF_ID i.e., reverse of
+        # rgi run on contig input
+        # this checks for that
+        elif len(header) > 1 and first_result[header[1]] == "":
+            self.field_mapping["ORF_ID"] = "input_sequence_id"
+            self.field_mapping["Contig"] = None
+
+    def sniff(self, lines):
+        """
+        Select the field mapping of the report from its header and first
+        result
+        """
+        reader = TabularReader(lines)
+        first_result = next(iter(reader), None)
+        if first_result is not None:
+            self._select_field_mapping(reader.fieldnames, first_result)
+
     def parse(self, handle):
         """
         Read each and return it
         """
         # skip any manually specified fields for later
-        reader = csv.DictReader(handle, delimiter="\t")
+        reader = TabularReader(handle, columns=[
+            *mapped_columns(self.field_map), "Model_type", "SNPs_in_Best_Hit_ARO",
+        ])
         for result in reader:
             result["_nucleotide_mutation"] = None
             result["_amino_acid_mutation"] = None
@@ -125,7 +139,6 @@ class RgiIterator(hAMRonizedResultIterator):
                 if result["SNPs_in_Best_Hit_ARO"] == "n/a":
                     result["SNPs_in_Best_Hit_ARO"] = None
 
-                hgvs_mutations = []
                 if (
                     result["Model_type"] == "protein variant model"
                     or result["Model_type"] == "protein overexpression model"
@@ -133,17 +146,16 @@ class RgiIterator(hAMRonizedResultIterator):
                     result["Model_type"] = AMINO_ACID_VARIANT
 
                     if result["SNPs_in_Best_Hit_ARO"]:
-                        for mutation in result["SNPs_in_Best_Hit_ARO"].split(","):
-                            hgvs_mutations.append(f"p.{mutation}")
-                        result["_amino_acid_mutation"] = ",".join(hgvs_mutations)
+                        result["_amino_acid_mutation"] = protein_mutations(
+                            result["SNPs_in_Best_Hit_ARO"]
+                        )
 
                 elif result["Model_type"] == "rrna variant model":
                     result["Model_type"] = NUCLEOTIDE_VARIANT
                     if result["SNPs_in_Best_Hit_ARO"]:
-                        for mutation in result["SNPs_in_Best_Hit_ARO"].split(","):
-                            _, ref, pos, alt, _ = re.split(r"(\D+)(\d+)(\D+)", mutation)
-                            hgvs_mutations.append(f"n.{pos}{ref}>{alt}")
-                        result["_nucleotide_mutation"] = ",".join(hgvs_mutations)
+                        result["_nucleotide_mutation"] = nucleotide_mutations(
+                            result["SNPs_in_Best_Hit_ARO"]
+                        )
                 else:
                     result["Model_type"] = GENE_PRESENCE
 
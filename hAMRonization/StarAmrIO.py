@@ -1,7 +1,7 @@
 #!/usr/bin/env python
 
-import csv
 from .Interfaces import hAMRonizedResultIterator
+from .tabular import TabularReader, mapped_columns
 from hAMRonization.constants import (
     NUCLEOTIDE_VARIANT,
     AMINO_ACID_VARIANT,
@@ -43,7 +43,7 @@ class StarAmrIterator(hAMRonizedResultIterator):
         Read each and return it
         """
         # skip any manually specified fields for later
-        reader = csv.DictReader(handle, delimiter="\t")
+        reader = TabularReader(handle, columns=[*mapped_columns(self.field_mapping), "Mutation", "Position"])
         for result in reader:
             coverage_ratio = result["HSP Length/Total Length"].split("/")
             cov_1 = float(coverage_ratio[0])
@@ -1,13 +1,37 @@
 #!/usr/bin/env python
 
-import json
 from .Interfaces import hAMRonizedResultIterator
+from .jsonstream import load_selected
+from .streams import DirectoryReports
 from hAMRonization.constants import NUCLEOTIDE_VARIANT, AMINO_ACID_VARIANT
 
 required_metadata = []
 
+parser_options = {
+    "records": {
+        "choices": ["variant", "drug"],
+        "default": None,
+        "help": "Report one result per resistance variant, with its drugs "
+        "joined by ';' (variant, the default) or one per variant and drug (drug)",
+    },
+}
+
+# the only parts of the report that are read (the qc, lineage and
+# other_variants sections are skipped without being decoded)
+JSON_SELECTION = {
+    "dr_variants": True,
+    "db_version": True,
+    "tbprofiler_version": True,
+}
+
 
 class TBProfilerIterator(hAMRonizedResultIterator):
+    records = "variant"
+
+    # the reports of a directory (e.g., the results/ of a cohort run) are
+    # read one after another as a single source
+    directory_pattern = "*.results.json"
+
     def __init__(self, source, metadata):
         metadata["analysis_software_name"] = "tb-profiler"
         self.metadata = metadata
@@ -34,11 +58,22 @@ class TBProfilerIterator(hAMRonizedResultIterator):
         """
         Read each and return it
         """
+        if isinstance(handle, DirectoryReports):
+            for name, report in handle:
+                yield from self.parse_report(report, name)
+        else:
+            yield from self.parse_report(handle, self.source_name)
+
+    def parse_report(self, handle, filename):
         # skip any manually specified fields for later
-        json_obj = json.load(handle)
+        json_obj = load_selected(handle, JSON_SELECTION)
+        per_drug = self.records == "drug"
         for variant in json_obj["dr_variants"]:
+            # a variant without drugs has no result (nor one per drug)
+            if not variant["drugs"]:
+                continue
             result = {
-                "filename": handle.name,
+                "filename": filename,
                 "gene_symbol": variant["gene"],
                 "gene_name": variant["gene"],
                 "drug": ";".join([d["drug"] for d in variant["drugs"]]),
@@ -54,5 +89,9 @@ class TBProfilerIterator(hAMRonizedResultIterator):
                 "nucleotide_mutation_interpretation": None,  # These will need to be added in
                 "amino_acid_mutation_interpretation": None,  # These will need to be added in
             }
-            for drug in variant["drugs"]:
+            if not per_drug:
                 yield self.hAMRonize(result, self.metadata)
+                continue
+            for drug in variant["drugs"]:
+                # a dict per drug, as lazy results keep the dict they're given
+                yield self.hAMRonize({**result, "drug": drug["drug"]}, self.metadata)
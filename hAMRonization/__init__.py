@@ -2,44 +2,98 @@
 
 __version__ = "1.3.1"
 
-from hAMRonization import AbricateIO
-from hAMRonization import AmrFinderPlusIO
-from hAMRonization import AribaIO
-from hAMRonization import RgiIO
-from hAMRonization import ResFinderIO
-from hAMRonization import SraxIO
-from hAMRonization import DeepArgIO
-from hAMRonization import KmerResistanceIO
-from hAMRonization import Srst2IO
-from hAMRonization import GrootIO
-from hAMRonization import StarAmrIO
-from hAMRonization import CSStarIO
-from hAMRonization import AmrPlusPlusIO
-from hAMRonization import ResFamsIO
-from hAMRonization import TBProfilerIO
-from hAMRonization import MykrobeIO
-from hAMRonization import FARGeneIO
-
-_FormatToIterator = {
-    "abricate": AbricateIO.AbricateIterator,
-    "amrfinderplus": AmrFinderPlusIO.AmrFinderPlusIterator,
-    "ariba": AribaIO.AribaIterator,
-    "rgi": RgiIO.RgiIterator,
-    "resfinder": ResFinderIO.ResFinderIterator,
-    "srax": SraxIO.SraxIterator,
-    "deeparg": DeepArgIO.DeepArgIterator,
-    "kmerresistance": KmerResistanceIO.KmerResistanceIterator,
-    "srst2": Srst2IO.Srst2Iterator,
-    "groot": GrootIO.GrootIterator,
-    "staramr": StarAmrIO.StarAmrIterator,
-    "csstar": CSStarIO.CSStarIterator,
-    "amrplusplus": AmrPlusPlusIO.AmrPlusPlusIterator,
-    "resfams": ResFamsIO.ResFamsIterator,
-    "tbprofiler": TBProfilerIO.TBProfilerIterator,
-    "mykrobe": MykrobeIO.MykrobeIterator,
-    "fargene": FARGeneIO.FARGeneIOIterator,
+import importlib
+from collections.abc import Mapping
+
+
+class _LazyToolRegistry(Mapping):
+    """
+    Read-only tool -> attribute of its *IO module mapping that only imports
+    the module of a tool when its entry is looked up (so e.g. a CLI run for
+    one tool doesn't import the parsers of all the others)
+    """
+
+    def __init__(self, attributes):
+        # tool -> (module name, attribute name)
+        self._attributes = attributes
+
+    def __getitem__(self, tool):
+        module_name, attribute = self._attributes[tool]
+        module = importlib.import_module(f"{__name__}.{module_name}")
+        return getattr(module, attribute)
+
+    def __iter__(self):
+        return iter(self._attributes)
+
+    def __len__(self):
+        return len(self._attributes)
+
+    def keys(self):
+        return self._attributes.keys()
+
+
+# submodules that are imported on first access as attributes of the package
+_LAZY_SUBMODULES = {
+    "AbricateIO",
+    "AmrFinderPlusIO",
+    "AribaIO",
+    "RgiIO",
+    "ResFinderIO",
+    "SraxIO",
+    "DeepArgIO",
+    "KmerResistanceIO",
+    "Srst2IO",
+    "GrootIO",
+    "StarAmrIO",
+    "CSStarIO",
+    "AmrPlusPlusIO",
+    "ResFamsIO",
+    "TBProfilerIO",
+    "MykrobeIO",
+    "FARGeneIO",
+    "Interfaces",
+    "batch",
+    "cache",
+    "constants",
+    "hAMRonizedResult",
+    "hmmer",
+    "jsonstream",
+    "mutations",
+    "parallel",
+    "references",
+    "server",
+    "streams",
+    "summarize",
+    "tabular",
 }
 
+
+def __getattr__(name):
+    if name in _LAZY_SUBMODULES:
+        return importlib.import_module(f"{__name__}.{name}")
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+_FormatToIterator = _LazyToolRegistry({
+    "abricate": ("AbricateIO", "AbricateIterator"),
+    "amrfinderplus": ("AmrFinderPlusIO", "AmrFinderPlusIterator"),
+    "ariba": ("AribaIO", "AribaIterator"),
+    "rgi": ("RgiIO", "RgiIterator"),
+    "resfinder": ("ResFinderIO", "ResFinderIterator"),
+    "srax": ("SraxIO", "SraxIterator"),
+    "deeparg": ("DeepArgIO", "DeepArgIterator"),
+    "kmerresistance": ("KmerResistanceIO", "KmerResistanceIterator"),
+    "srst2": ("Srst2IO", "Srst2Iterator"),
+    "groot": ("GrootIO", "GrootIterator"),
+    "staramr": ("StarAmrIO", "StarAmrIterator"),
+    "csstar": ("CSStarIO", "CSStarIterator"),
+    "amrplusplus": ("AmrPlusPlusIO", "AmrPlusPlusIterator"),
+    "resfams": ("ResFamsIO", "ResFamsIterator"),
+    "tbprofiler": ("TBProfilerIO", "TBProfilerIterator"),
+    "mykrobe": ("MykrobeIO", "MykrobeIterator"),
+    "fargene": ("FARGeneIO", "FARGeneIOIterator"),
+})
+
 _ReportFileToUse = {
     "abricate": "OUTPUT.tsv",
     "amrfinderplus": "OUTPUT.tsv",
@@ -61,33 +115,51 @@ _ReportFileToUse = {
 }
 
 
-_RequiredToolMetadata = {
-    "abricate": AbricateIO.required_metadata,
-    "amrfinderplus": AmrFinderPlusIO.required_metadata,
-    "amrplusplus": AmrPlusPlusIO.required_metadata,
-    "ariba": AribaIO.required_metadata,
-    "csstar": CSStarIO.required_metadata,
-    "deeparg": DeepArgIO.required_metadata,
-    "fargene": FARGeneIO.required_metadata,
-    "groot": GrootIO.required_metadata,
-    "kmerresistance": KmerResistanceIO.required_metadata,
-    "resfams": ResFamsIO.required_metadata,
-    "resfinder": ResFinderIO.required_metadata,
-    "mykrobe": MykrobeIO.required_metadata,
-    "rgi": RgiIO.required_metadata,
-    "srax": SraxIO.required_metadata,
-    "srst2": Srst2IO.required_metadata,
-    "staramr": StarAmrIO.required_metadata,
-    "tbprofiler": TBProfilerIO.required_metadata,
-}
+_RequiredToolMetadata = _LazyToolRegistry({
+    "abricate": ("AbricateIO", "required_metadata"),
+    "amrfinderplus": ("AmrFinderPlusIO", "required_metadata"),
+    "amrplusplus": ("AmrPlusPlusIO", "required_metadata"),
+    "ariba": ("AribaIO", "required_metadata"),
+    "csstar": ("CSStarIO", "required_metadata"),
+    "deeparg": ("DeepArgIO", "required_metadata"),
+    "fargene": ("FARGeneIO", "required_metadata"),
+    "groot": ("GrootIO", "required_metadata"),
+    "kmerresistance": ("KmerResistanceIO", "required_metadata"),
+    "resfams": ("ResFamsIO", "required_metadata"),
+    "resfinder": ("ResFinderIO", "required_metadata"),
+    "mykrobe": ("MykrobeIO", "required_metadata"),
+    "rgi": ("RgiIO", "required_metadata"),
+    "srax": ("SraxIO", "required_metadata"),
+    "srst2": ("Srst2IO", "required_metadata"),
+    "staramr": ("StarAmrIO", "required_metadata"),
+    "tbprofiler": ("TBProfilerIO", "required_metadata"),
+})
 
 
-def parse(handle, metadata, tool):
+# tools whose parsers take options (see parse()), each option is declared
+# with the keyword arguments of its command line argument
+_ToolParserOptions = _LazyToolRegistry({
+    "deeparg": ("DeepArgIO", "parser_options"),
+    "fargene": ("FARGeneIO", "parser_options"),
+    "mykrobe": ("MykrobeIO", "parser_options"),
+    "resfams": ("ResFamsIO", "parser_options"),
+    "tbprofiler": ("TBProfilerIO", "parser_options"),
+})
+
+
+def parse(handle, metadata, tool, lazy=False, shared_metadata=False, **options):
     r"""Turn a sequence file into an iterator returning SeqRecords.
     Arguments:
-     - handle   - handle to the file, or the filename as a string
+     - handle   - handle to the file (text or binary, left open), the
+                  filename as a string or "-" to read from stdin
      - tool - lower case string describing the file format.
      - required_arguments - dict containing the required arguments for tool
+     - lazy - yield hAMRonizedLazyResults that only map and type check each
+              field when it is first read (use .validate() to force all)
+     - shared_metadata - yield hAMRonizedSharedResults that point at one
+              block of the run-level fields per report instead of copies
+     - options - tool specific parser options (see hamronize <tool> --help)
+              e.g., max_evalue=1e-10 for resfams
     Typical usage, opening a file to read in, and looping over the record(s):
     >>> import hAMRonization as hAMR
     >>> filename = "abricate_report.tsv"
@@ -103,6 +175,8 @@ def parse(handle, metadata, tool):
         raise TypeError("Metadata must be provided as a dictionary")
     if not tool:
         raise ValueError("Tool required (lower case string)")
+    if lazy and shared_metadata:
+        raise ValueError("lazy and shared_metadata results can't be combined")
     if not tool.islower():
         raise ValueError(f"Tool string '{tool}' should be lower case")
 
@@ -122,7 +196,25 @@ def parse(handle, metadata, tool):
             f"{tool} requires {missing_data} supplied " "in metadata dictionary"
         )
 
+    tool_options = _ToolParserOptions.get(tool, {})
+    unknown_options = [option for option in options if option not in tool_options]
+    if unknown_options:
+        raise ValueError(
+            f"{tool} has no options {unknown_options}, must be in "
+            f"{list(tool_options)}"
+        )
+    for option, value in options.items():
+        choices = tool_options[option].get("choices")
+        if choices is not None and value not in choices:
+            raise ValueError(f"{tool} option {option} must be one of {choices}")
+
     iterator_generator = _FormatToIterator.get(tool)
     if iterator_generator:
-        return iterator_generator(handle, metadata)
+        iterator = iterator_generator(handle, metadata)
+        iterator.lazy = lazy
+        iterator.shared_metadata = shared_metadata
+        # the parsers read their options as attributes
+        for option, value in options.items():
+            setattr(iterator, option, value)
+        return iterator
     raise ValueError(f"Unknown tool: {tool}\nMust be in " f"{_FormatToIterator.keys()}")
@@ -0,0 +1,245 @@
+#!/usr/bin/env python
+
+import os
+import csv
+import json
+import logging
+
+import hAMRonization
+import hAMRonization.parallel
+from .streams import open_source, output_compression
+
+logger = logging.getLogger(__name__)
+
+# columns every manifest needs besides the required metadata of its tools
+MANIFEST_COLUMNS = ["tool", "report"]
+
+
+def read_manifest(manifest_path):
+    """
+    Read a batch manifest, a tsv file with a header and one row per report
+    giving its tool, report path and the required metadata of that tool (as
+    for hamronize <tool>, columns not required by a row's tool are ignored)
+
+    Returns a list of (report, metadata, tool) tasks in manifest order
+    """
+    tasks = []
+    with open_source(manifest_path) as fh:
+        reader = csv.DictReader(fh, delimiter="\t")
+        missing_columns = [
+            column for column in MANIFEST_COLUMNS
+            if column not in (reader.fieldnames or [])
+        ]
+        if missing_columns:
+            raise ValueError(
+                f"Manifest {manifest_path} is missing the column(s) "
+                f"{', '.join(missing_columns)}"
+            )
+        # line numbers as shown by an editor (the header is line 1)
+        for line_number, row in enumerate(reader, start=2):
+            tool = row["tool"]
+            if tool not in hAMRonization._RequiredToolMetadata:
+                raise ValueError(
+                    f"Unknown tool {tool} on line {line_number} of "
+                    f"{manifest_path}"
+                )
+            required_metadata = hAMRonization._RequiredToolMetadata[tool]
+            missing_metadata = [
+                field for field in required_metadata if not row.get(field)
+            ]
+            if missing_metadata or not row["report"]:
+                raise ValueError(
+                    f"Line {line_number} of {manifest_path} has no "
+                    f"{', '.join(missing_metadata or ['report'])}"
+                )
+            metadata = {field: row[field] for field in required_metadata}
+            tasks.append((row["report"], metadata, tool))
+    return tasks
+
+
+class CompletionJournal:
+    """
+    Journal of the reports of a batch run that are completely written to
+    its output, so an interrupted run can be resumed
+
+    Every line is a json object. The first gives the output settings of the
+    run (output path, format, compression and typed_json), so a run with
+    other settings isn't resumed on top of it. Each following line gives a
+    report written to the output, in the order they are written: its
+    manifest index, the report, its tool and metadata, the size of the
+    output once it was written and whether the output has any results by
+    then.
+    """
+
+    def __init__(self, journal_path, settings):
+        """
+        Open the journal at journal_path for a run with settings (a json
+        serialisable dict), raising ValueError if it records completed
+        reports of a run with other settings
+        """
+        self.journal_path = journal_path
+        self.settings = settings
+        # ((report, metadata, tool), output size, has results) of each
+        # completed report
+        self.completed = []
+        if os.path.exists(journal_path):
+            journal_settings = None
+            with open(journal_path) as fh:
+                for line_number, line in enumerate(fh):
+                    try:
+                        record = json.loads(line)
+                        if line_number == 0:
+                            journal_settings = record["settings"]
+                            continue
+                        entry = (
+                            (record["report"], record["metadata"], record["tool"]),
+                            record["offset"],
+                            record["has_entries"],
+                        )
+                    except (ValueError, TypeError, KeyError):
+                        # a line cut short by the interruption
+                        break
+                    self.completed.append(entry)
+            if self.completed and journal_settings != settings:
+                raise ValueError(
+                    f"Journal {journal_path} is of a run with other output "
+                    f"settings ({self._describe(journal_settings)}, now "
+                    f"{self._describe(settings)})"
+                )
+        # (re)write the journal without any partial line
+        with open(journal_path, "w") as fh:
+            fh.write(json.dumps({"settings": settings}) + "\n")
+            for index, entry in enumerate(self.completed):
+                fh.write(self._line(index, *entry))
+        self._fh = open(journal_path, "a")
+
+    @staticmethod
+    def _describe(settings):
+        return ", ".join(f"{name} {value}" for name, value in settings.items())
+
+    @staticmethod
+    def _line(index, task, offset, has_entries):
+        report, metadata, tool = task
+        record = {
+            "index": index,
+            "report": report,
+            "tool": tool,
+            "metadata": metadata,
+            "offset": offset,
+            "has_entries": has_entries,
+        }
+        return json.dumps(record, sort_keys=True) + "\n"
+
+    def record(self, task, offset, has_entries):
+        """
+        Record that the report of a (report, metadata, tool) task was written
+        completely, leaving the output at offset bytes (and with or without
+        any results)
+        """
+        self._fh.write(self._line(len(self.completed), task, offset, has_entries))
+        self._fh.flush()
+        self.completed.append((task, offset, has_entries))
+
+    def close(self):
+        self._fh.close()
+
+
+def run_batch(
+    manifest_path,
+    output_location=None,
+    output_format="tsv",
+    typed_json=False,
+    compression=None,
+    compression_level=None,
+    jobs=1,
+    journal_path=None,
+    cache=None,
+):
+    """
+    hAMRonize all reports of a manifest (see read_manifest) to one output,
+    parsing them in jobs worker processes (0 for available_cpu_count(), at
+    most one per report)
+
+    With a journal_path, every completed report is recorded in a
+    CompletionJournal and a rerun with the same manifest, output settings
+    and journal continues after the last completed report
+
+    Returns the number of reports in the output (including those of an
+    interrupted run resumed)
+
+    With a ResultCache, reports it has an entry for aren't parsed again
+    """
+    tasks = read_manifest(manifest_path)
+    report_count = len(tasks)
+
+    journal = None
+    if journal_path:
+        if output_location is None:
+            raise ValueError("A batch run with a journal needs an output file")
+        settings = {
+            "output": os.path.abspath(output_location),
+            "format": output_format,
+            "compression": compression or output_compression(output_location),
+            "typed_json": typed_json,
+        }
+        journal = CompletionJournal(journal_path, settings)
+        for index, (task, (completed_task, _, _)) in enumerate(
+            zip(tasks, journal.completed)
+        ):
+            # the report, its tool or its metadata changed since
+            if tuple(task) != completed_task:
+                raise ValueError(
+                    f"Journal {journal_path} doesn't match manifest "
+                    f"{manifest_path} (report {index + 1} was "
+                    f"{completed_task[2]} {completed_task[0]} "
+                    f"{completed_task[1]}, now {task[2]} {task[0]} {task[1]})"
+                )
+        if len(journal.completed) > len(tasks):
+            raise ValueError(
+                f"Journal {journal_path} has more reports than manifest "
+                f"{manifest_path}"
+            )
+
+    if journal is not None and journal.completed:
+        _, offset, has_entries = journal.completed[-1]
+        if not os.path.exists(output_location):
+            raise ValueError(
+                f"Can't resume, {output_location} in journal {journal_path} "
+                "doesn't exist"
+            )
+        # drop anything written after the last completed report
+        os.truncate(output_location, offset)
+        logger.info("Resuming after %s completed reports", len(journal.completed))
+        tasks = tasks[len(journal.completed):]
+        writer = hAMRonization.Interfaces.hAMRonizedResultWriter(
+            output_location,
+            output_format,
+            typed_json=typed_json,
+            compression=compression,
+            compression_level=compression_level,
+            append=True,
+            has_entries=has_entries,
+        )
+    else:
+        writer = hAMRonization.Interfaces.hAMRonizedResultWriter(
+            output_location,
+            output_format,
+            typed_json=typed_json,
+            compression=compression,
+            compression_level=compression_level,
+        )
+
+    # no more workers than reports left to parse
+    jobs = max(1, min(jobs or hAMRonization.parallel.available_cpu_count(), len(tasks)))
+    rendered_reports = hAMRonization.parallel.render_tasks(
+        tasks, output_format, typed_json=typed_json, jobs=jobs, cache=cache
+    )
+
+    for task, rendered_batches in zip(tasks, rendered_reports):
+        writer.write_rendered(rendered_batches)
+        if journal is not None:
+            journal.record(task, writer.checkpoint(), writer.has_entries)
+    writer.close()
+    if journal is not None:
+        journal.close()
+    return report_count
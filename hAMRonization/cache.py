@@ -0,0 +1,202 @@
+#!/usr/bin/env python
+
+import os
+import json
+import contextlib
+import gzip
+import hashlib
+import logging
+
+import hAMRonization
+from .hAMRonizedResult import _FIELD_NAMES, hAMRonizedResultBatch
+from .streams import is_path
+
+logger = logging.getLogger(__name__)
+
+# bump when the layout of cache entries changes
+CACHE_FORMAT_VERSION = 1
+CACHE_SUFFIX = ".json.gz"
+DEFAULT_MAX_SIZE = 1024 ** 3
+READ_CHUNK_SIZE = 1024 * 1024
+
+_SIZE_UNITS = {"": 1, "K": 1024, "M": 1024 ** 2, "G": 1024 ** 3, "T": 1024 ** 4}
+
+
+def parse_size(size):
+    """
+    Number of bytes in a size such as 500M or 2G (K, M, G and T are powers
+    of 1024, a plain number is bytes)
+    """
+    text = size.strip().upper().removesuffix("B")
+    number, unit = text, ""
+    if text and text[-1] in _SIZE_UNITS:
+        number, unit = text[:-1], text[-1]
+    try:
+        return int(float(number) * _SIZE_UNITS[unit])
+    except ValueError:
+        raise ValueError(f"Invalid size {size}, use e.g. 500M or 2G") from None
+
+
+class ResultCache:
+    """
+    Persistent cache of hAMRonized reports in a directory, keyed by a hash
+    of the report's bytes, the tool, the metadata, any parser options and
+    the hAMRonization version, so unchanged reports are never parsed twice
+
+    Each entry is a gzip compressed json file of the report's
+    hAMRonizedResultBatches (see hAMRonizedResultBatch.encode()). Entries
+    are evicted least recently used first (by modification time, which a
+    hit refreshes) once the cache grows over max_size bytes.
+    """
+
+    def __init__(self, directory, max_size=DEFAULT_MAX_SIZE):
+        self.directory = directory
+        self.max_size = max_size
+
+    def key(self, report, metadata, tool, options=None):
+        """
+        Cache key of a report path (None for stdin, file-like objects and
+        directories of reports, which aren't cached)
+        """
+        if not is_path(report) or os.path.isdir(report):
+            return None
+        digest = hashlib.sha256()
+        header = [
+            CACHE_FORMAT_VERSION, hAMRonization.__version__, tool, metadata,
+            options or {},
+        ]
+        digest.update(json.dumps(header, sort_keys=True).encode() + b"\0")
+        with open(report, "rb") as fh:
+            while chunk := fh.read(READ_CHUNK_SIZE):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], key + CACHE_SUFFIX)
+
+    def load(self, key):
+        """
+        The list of hAMRonizedResultBatches stored under key (None if there
+        is no such entry)
+        """
+        path = self._path(key)
+        try:
+            with gzip.open(path, "rt") as fh:
+                entry = json.load(fh)
+        except FileNotFoundError:
+            return None
+        except (OSError, EOFError, ValueError):
+            logger.warning("Ignoring unreadable cache entry %s", path)
+            return None
+        if entry.get("fields") != list(_FIELD_NAMES):
+            return None
+        # a hit makes the entry the most recently used
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            # pruned since it was read
+            return None
+        except OSError:
+            # e.g., a read-only cache, whose entries are still good
+            pass
+        return [hAMRonizedResultBatch.decode(batch) for batch in entry["batches"]]
+
+    def store(self, key, batches):
+        """
+        Store the hAMRonizedResultBatches of a report under key
+        """
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        entry = {
+            "fields": _FIELD_NAMES,
+            "batches": [batch.encode() for batch in batches],
+        }
+        # write to a temporary file and rename it so concurrent runs never
+        # read a partial entry
+        temporary_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            with gzip.open(temporary_path, "wt") as fh:
+                json.dump(entry, fh, separators=(",", ":"))
+            os.replace(temporary_path, path)
+        except BaseException:
+            # the temporary file may not have been created (or was renamed)
+            with contextlib.suppress(FileNotFoundError):
+                os.unlink(temporary_path)
+            raise
+
+    def batches(self, report, metadata, tool, size=1024, options=None):
+        """
+        The hAMRonizedResultBatches of a report, from the cache if it has
+        an entry for it and otherwise parsed (as by
+        hAMRonization.parse(report, metadata, tool, **options).iter_batches(size))
+        and stored once all are parsed (a cache that can't be written to
+        only logs a warning)
+        """
+        options = options or {}
+        try:
+            key = self.key(report, metadata, tool, options)
+        except OSError:
+            # leave reporting unreadable reports to the parser
+            key = None
+        if key is not None:
+            cached_batches = self.load(key)
+            if cached_batches is not None:
+                logger.debug("Cache hit for %s", report)
+                yield from cached_batches
+                return
+        parsed_batches = []
+        parsed_report = hAMRonization.parse(report, dict(metadata), tool, **options)
+        for batch in parsed_report.iter_batches(size):
+            parsed_batches.append(batch)
+            yield batch
+        if key is not None:
+            try:
+                self.store(key, parsed_batches)
+            except OSError as error:
+                logger.warning("Couldn't cache %s: %s", report, error)
+
+    def entries(self):
+        """
+        (path, size, modification time) of every entry
+        """
+        entries = []
+        if not os.path.isdir(self.directory):
+            return entries
+        for prefix in os.scandir(self.directory):
+            if not prefix.is_dir():
+                continue
+            for entry in os.scandir(prefix.path):
+                if entry.name.endswith(CACHE_SUFFIX):
+                    stat = entry.stat()
+                    entries.append((entry.path, stat.st_size, stat.st_mtime))
+        return entries
+
+    def stats(self):
+        """
+        Number of entries and their total size in bytes
+        """
+        entries = self.entries()
+        return len(entries), sum(size for _, size, _ in entries)
+
+    def prune(self, max_size=None):
+        """
+        Delete the least recently used entries until the cache is at most
+        max_size bytes (by default its max_size), returning the number of
+        entries deleted and the bytes freed
+        """
+        if max_size is None:
+            max_size = self.max_size
+        entries = sorted(self.entries(), key=lambda entry: entry[2])
+        total_size = sum(size for _, size, _ in entries)
+        removed, freed = 0, 0
+        for path, size, _ in entries:
+            if total_size - freed <= max_size:
+                break
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                # pruned concurrently
+                pass
+            removed += 1
+            freed += size
+        return removed, freed
@@ -1,8 +1,16 @@
 #!/usr/bin/env python
 
 import os
+import json
+import math
 import logging
+import array
+import types
+import weakref
+import operator
+import functools
 import dataclasses
+from json.encoder import encode_basestring_ascii
 
 logger = logging.getLogger(__name__)
 
@@ -31,11 +39,30 @@ def _extract_first_numeric(value, target_type):
     return target_type(raw)
 
 
-@dataclasses.dataclass
+@functools.lru_cache(maxsize=1024)
+def _normalise_input_file_name(input_file_name):
+    """
+    Normalise input filename to just basename without extension
+    this is to ensure compatibility with all tools using the lowest
+    common denominator staramr which does this
+    (cached as every record of a report shares the same input file)
+    """
+    input_file_name = os.path.basename(input_file_name)
+
+    for suffix in [".gz", ".fna", ".fasta", ".fsa", ".faa", ".fa"]:
+        input_file_name = input_file_name.removesuffix(suffix)
+
+    return input_file_name
+
+
+@dataclasses.dataclass(slots=True)
 class hAMRonizedResult:
     """
     Single AMR result converted to the hAMRonization specification
     Checks types and requires the mandatory fields be supplied
+
+    Uses __slots__ rather than a per-instance __dict__ to keep large
+    in-memory result sets compact
     """
 
     # mandatory fields
@@ -86,43 +113,553 @@ class hAMRonizedResult:
         Ensure the input_file_name path is just the basename due to different
         tools reporting this differently
         """
-        for field in dataclasses.fields(self):
-            value = getattr(self, field.name)
-            if not isinstance(value, field.type) and value:
-                try:
-                    setattr(self, field.name, field.type(value))
-                except (ValueError, TypeError):
-                    if field.name in _MULTI_VALUE_NUMERIC_FIELDS:
-                        try:
-                            extracted = _extract_first_numeric(
-                                value, field.type
-                            )
-                            setattr(self, field.name, extracted)
-                            logger.debug(
-                                "Field '%s' contained multiple values "
-                                "(%r), extracted first: %s",
-                                field.name, value, extracted
-                            )
-                            continue
-                        except (ValueError, TypeError):
-                            pass
-                    logger.error(
-                        "Expected %s to be %s, got %r",
-                        field.name, field.type, value
-                    )
-                    raise ValueError(
-                        f"Expected {field.name} "
-                        f"to be {field.type}, "
-                        f"got {repr(value)}"
-                    )
-
-        # normalise input filename to just basename without extension
-        # this is to ensure compatibility with all tools using the lowest
-        # common denominator staramr which does this
-        input_file_name = getattr(self, "input_file_name")
-        input_file_name = os.path.basename(input_file_name)
-
-        for suffix in [".gz", ".fna", ".fasta", ".fsa", ".faa", ".fa"]:
-            input_file_name = input_file_name.removesuffix(suffix)
-
-        setattr(self, "input_file_name", input_file_name)
+        for name, field_type, multi_value in _FIELD_COERCIONS:
+            value = getattr(self, name)
+            if value and not isinstance(value, field_type):
+                setattr(self, name, _coerce(name, field_type, multi_value, value))
+
+        self.input_file_name = _normalise_input_file_name(self.input_file_name)
+
+
+def _coerce(name, field_type, multi_value, value):
+    """
+    Cast value to the field_type of field name, falling back to the first
+    numeric value for multi-value fields (raising a ValueError on failure)
+    """
+    try:
+        return field_type(value)
+    except (ValueError, TypeError):
+        if multi_value:
+            try:
+                extracted = _extract_first_numeric(value, field_type)
+                logger.debug(
+                    "Field '%s' contained multiple values "
+                    "(%r), extracted first: %s",
+                    name, value, extracted
+                )
+                return extracted
+            except (ValueError, TypeError):
+                pass
+        logger.error(
+            "Expected %s to be %s, got %r",
+            name, field_type, value
+        )
+        raise ValueError(
+            f"Expected {name} "
+            f"to be {field_type}, "
+            f"got {repr(value)}"
+        )
+
+
+# The field types never change so resolve the (name, type, multi-value)
+# coercion table once at import rather than walking dataclasses.fields()
+# for every record
+_FIELD_COERCIONS = tuple(
+    (field.name, field.type, field.name in _MULTI_VALUE_NUMERIC_FIELDS)
+    for field in dataclasses.fields(hAMRonizedResult)
+)
+
+_FIELD_NAMES = tuple(name for name, _, _ in _FIELD_COERCIONS)
+
+# fetch all field values of a record (in specification order) in one call
+_record_values = operator.attrgetter(*_FIELD_NAMES)
+
+# per-field coercion details and whether the field is mandatory (no default)
+_FIELD_SPECS = {
+    field.name: (
+        field.type,
+        field.name in _MULTI_VALUE_NUMERIC_FIELDS,
+        field.default is dataclasses.MISSING,
+    )
+    for field in dataclasses.fields(hAMRonizedResult)
+}
+
+
+class hAMRonizedLazyResult:
+    """
+    AMR result that keeps the raw parsed report row and only maps, coerces
+    and caches an hAMRonization field the first time it is read
+
+    Reading an invalid field raises the same ValueError as hAMRonizedResult
+    would on construction, validate() forces all remaining fields
+    """
+
+    __slots__ = ("_report_data", "_metadata", "_sources", "_cache")
+
+    def __init__(self, report_data, metadata, sources):
+        """
+        - report_data parsed dict of single result from report
+        - metadata dict of additional metadata fields
+        - sources dict of hAMRonization field to report_data field
+        """
+        self._report_data = report_data
+        self._metadata = metadata
+        self._sources = sources
+        self._cache = {}
+
+    def __getattr__(self, name):
+        # only called for names that aren't slots i.e., the result fields
+        try:
+            field_type, multi_value, mandatory = _FIELD_SPECS[name]
+        except KeyError:
+            raise AttributeError(
+                f"'{type(self).__name__}' object has no attribute '{name}'"
+            ) from None
+        cache = self._cache
+        if name in cache:
+            return cache[name]
+
+        source = self._sources.get(name)
+        if source is not None:
+            value = self._report_data[source]
+        elif name in self._metadata:
+            value = self._metadata[name]
+        elif mandatory:
+            raise ValueError(f"Mandatory field {name} has not been supplied")
+        else:
+            value = None
+
+        if value and not isinstance(value, field_type):
+            value = _coerce(name, field_type, multi_value, value)
+        if name == "input_file_name":
+            value = _normalise_input_file_name(value)
+
+        cache[name] = value
+        return value
+
+    def validate(self):
+        """
+        Map and coerce all fields not read so far (raising ValueError on the
+        first invalid one)
+        """
+        _record_values(self)
+        return self
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self._cache!r})"
+
+
+# interned metadata blocks, so reports with the same metadata share one
+_metadata_blocks = weakref.WeakValueDictionary()
+
+
+class hAMRonizedMetadataBlock:
+    """
+    Immutable block of the run-level fields (e.g., analysis_software_name,
+    reference_database_version) shared by every result of a report, as
+    pointed at by hAMRonizedSharedResults
+
+    - fixed: mapping of field to its (coerced) value for the metadata fields
+      and the fields no report field maps to (always None)
+    - row_fields: the fields whose values are stored per result
+    - metadata: the metadata the fixed values were coerced from (so the
+      block can be interned again e.g., when its results are unpickled)
+    """
+
+    __slots__ = (
+        "fixed", "metadata", "row_fields", "row_index", "_row_specs", "_fixed_values",
+        "_full_row_getter", "__weakref__",
+    )
+
+    def __init__(self, metadata, row_fields):
+        fixed = {}
+        for name, field_type, multi_value in _FIELD_COERCIONS:
+            if name in row_fields:
+                continue
+            if name not in metadata:
+                if _FIELD_SPECS[name][2]:
+                    raise ValueError(f"Mandatory field {name} has not been supplied")
+                fixed[name] = None
+                continue
+            value = metadata[name]
+            if value and not isinstance(value, field_type):
+                value = _coerce(name, field_type, multi_value, value)
+            if name == "input_file_name":
+                value = _normalise_input_file_name(value)
+            fixed[name] = value
+
+        set_ = object.__setattr__
+        set_(self, "fixed", types.MappingProxyType(fixed))
+        set_(self, "metadata", types.MappingProxyType(
+            {name: metadata[name] for name in fixed if name in metadata}
+        ))
+        set_(self, "row_fields", tuple(row_fields))
+        set_(self, "row_index", types.MappingProxyType(
+            {name: index for index, name in enumerate(row_fields)}
+        ))
+        set_(self, "_row_specs", tuple(
+            (index, name) + _FIELD_SPECS[name][:2]
+            for index, name in enumerate(row_fields)
+        ))
+        # all fields of a row are picked from its values followed by the
+        # fixed values in one call
+        fixed_index = {name: len(row_fields) + index for index, name in enumerate(fixed)}
+        set_(self, "_fixed_values", tuple(fixed.values()))
+        set_(self, "_full_row_getter", operator.itemgetter(*(
+            self.row_index[name] if name in self.row_index else fixed_index[name]
+            for name in _FIELD_NAMES
+        )))
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    @classmethod
+    def intern(cls, metadata, row_fields):
+        """
+        Return the shared block for metadata and row_fields, creating it if
+        no live block has the same content
+        """
+        block = cls(metadata, row_fields)
+        key = (tuple(block.fixed.items()), block.row_fields)
+        try:
+            return _metadata_blocks.setdefault(key, block)
+        except TypeError:
+            # unhashable metadata values can't be interned
+            return block
+
+    def coerce_row(self, values):
+        """
+        Type check and cast a tuple of row_fields values
+        """
+        values = list(values)
+        for index, name, field_type, multi_value in self._row_specs:
+            value = values[index]
+            if value and not isinstance(value, field_type):
+                values[index] = _coerce(name, field_type, multi_value, value)
+        if "input_file_name" in self.row_index:
+            index = self.row_index["input_file_name"]
+            values[index] = _normalise_input_file_name(values[index])
+        return tuple(values)
+
+    def full_row(self, values):
+        """
+        Tuple of all field values (in specification order) of a tuple of
+        (coerced) row_fields values
+        """
+        return self._full_row_getter(values + self._fixed_values)
+
+
+class hAMRonizedSharedResult:
+    """
+    AMR result that only stores the values of the fields read from the report
+    row and points at a hAMRonizedMetadataBlock for the run-level fields
+    (attribute access to all fields is the same as for hAMRonizedResult)
+    """
+
+    __slots__ = ("_block", "_values")
+
+    def __init__(self, block, values):
+        """
+        - block hAMRonizedMetadataBlock of the report
+        - values tuple of values for block.row_fields
+        """
+        self._block = block
+        self._values = block.coerce_row(values)
+
+    def __getattr__(self, name):
+        # only called for names that aren't set slots i.e., the result fields,
+        # or special names and unset slots (e.g., as copy probes a result
+        # being rebuilt), which no field starts with
+        if name.startswith("_"):
+            raise AttributeError(
+                f"'{type(self).__name__}' object has no attribute '{name}'"
+            )
+        block = self._block
+        index = block.row_index.get(name)
+        if index is not None:
+            return self._values[index]
+        try:
+            return block.fixed[name]
+        except KeyError:
+            raise AttributeError(
+                f"'{type(self).__name__}' object has no attribute '{name}'"
+            ) from None
+
+    def __reduce__(self):
+        # the block is interned again rather than copied with each result
+        block = self._block
+        return (
+            _restore_shared_result,
+            (dict(block.metadata), block.row_fields, self._values),
+        )
+
+    def __repr__(self):
+        values = ", ".join(
+            f"{name}={value!r}"
+            for name, value in zip(_FIELD_NAMES, _record_values(self))
+        )
+        return f"{type(self).__name__}({values})"
+
+
+def _restore_shared_result(metadata, row_fields, values):
+    """
+    Rebuild a copied or unpickled hAMRonizedSharedResult (its values are
+    already coerced)
+    """
+    result = object.__new__(hAMRonizedSharedResult)
+    result._block = hAMRonizedMetadataBlock.intern(metadata, row_fields)
+    result._values = values
+    return result
+
+
+# array.array typecodes used to store the numeric fields in batches
+_ARRAY_TYPECODES = {int: "q", float: "d"}
+
+# JSON object of a result with every key encoded once, as json.dumps would
+_JSON_ROW_TEMPLATE = (
+    "{" + ", ".join(f"{json.dumps(name)}: %s" for name in _FIELD_NAMES) + "}"
+)
+
+
+class hAMRonizedResultBatch:
+    """
+    Column-oriented block of hAMRonized results i.e., one column per
+    hAMRonization field rather than one object per result
+
+    String fields are stored as lists and numeric fields (e.g.,
+    sequence_identity, input_gene_start) as typed array.array columns with
+    a bytearray mask flagging the missing values (None if nothing is missing)
+    """
+
+    __slots__ = ("columns", "missing", "size")
+
+    def __init__(self, columns, missing, size):
+        self.columns = columns
+        self.missing = missing
+        self.size = size
+
+    @classmethod
+    def from_results(cls, results):
+        """
+        Build a batch from a sequence of hAMRonizedResults
+        """
+        block = _common_metadata_block(results)
+        if block is not None:
+            return cls._from_block_rows(block, [result._values for result in results])
+        if results:
+            transposed = zip(
+                _FIELD_NAMES,
+                zip(*(_record_values(result) for result in results)),
+            )
+        else:
+            transposed = ((name, ()) for name in _FIELD_NAMES)
+        return cls._from_transposed({}, {}, transposed, len(results))
+
+    @classmethod
+    def from_rows(cls, rows):
+        """
+        Build a batch from a sequence of (hAMRonizedMetadataBlock, coerced
+        row values) rows (see hAMRonizedResultIterator.iter_batches()),
+        without a result object per row
+        """
+        if not rows:
+            return cls.from_results(())
+        block = rows[0][0]
+        if all(row_block is block for row_block, _ in rows):
+            return cls._from_block_rows(block, [values for _, values in rows])
+        transposed = zip(
+            _FIELD_NAMES,
+            zip(*(row_block.full_row(values) for row_block, values in rows)),
+        )
+        return cls._from_transposed({}, {}, transposed, len(rows))
+
+    @classmethod
+    def _from_block_rows(cls, block, rows):
+        """
+        Build a batch from the row values of rows sharing one
+        hAMRonizedMetadataBlock (whose fields are encoded once rather than
+        fetched per row)
+        """
+        size = len(rows)
+        columns = {}
+        missing = {}
+        row_columns = dict(zip(block.row_fields, zip(*rows)))
+        for name, field_type, _ in _FIELD_COERCIONS:
+            if name not in row_columns:
+                cls._add_constant(
+                    columns, missing, name, field_type, block.fixed[name], size,
+                )
+        if not size:
+            row_columns = {name: () for name in block.row_fields}
+        return cls._from_transposed(columns, missing, row_columns.items(), size)
+
+    @classmethod
+    def _from_transposed(cls, columns, missing, transposed, size):
+        """
+        Build a batch from the (field name, values) columns in transposed
+        and the columns (and missing masks) already filled
+        """
+        for name, values in transposed:
+            typecode = _ARRAY_TYPECODES.get(_FIELD_SPECS[name][0])
+            if typecode is None:
+                columns[name] = list(values)
+                continue
+            # falsy values are never coerced so anything that isn't a number
+            # here (None or an empty string) is missing
+            mask = bytearray(
+                not isinstance(value, (int, float)) for value in values
+            )
+            if any(mask):
+                values = [
+                    0 if is_missing else value
+                    for value, is_missing in zip(values, mask)
+                ]
+                missing[name] = mask
+            columns[name] = array.array(typecode, values)
+        # keep the columns in specification order
+        columns = {name: columns[name] for name in _FIELD_NAMES}
+        return cls(columns, missing, size)
+
+    @staticmethod
+    def _add_constant(columns, missing, name, field_type, value, size):
+        """
+        Add a column repeating value size times
+        """
+        typecode = _ARRAY_TYPECODES.get(field_type)
+        if typecode is None:
+            columns[name] = [value] * size
+        elif isinstance(value, (int, float)):
+            columns[name] = array.array(typecode, [value]) * size
+        else:
+            columns[name] = array.array(typecode, [0]) * size
+            if size:
+                missing[name] = bytearray(b"\x01") * size
+
+    def __len__(self):
+        return self.size
+
+    def encode(self):
+        """
+        The batch as a json serialisable dict (see decode()), with the typed
+        columns as lists, the missing masks as hex and columns of one
+        repeated value (e.g., the metadata fields) stored once
+        """
+        columns = {}
+        constants = {}
+        for name, values in self.columns.items():
+            if (
+                self.size
+                and name not in self.missing
+                and values.count(values[0]) == self.size
+            ):
+                constants[name] = values[0]
+            elif isinstance(values, array.array):
+                columns[name] = values.tolist()
+            else:
+                columns[name] = values
+        return {
+            "size": self.size,
+            "columns": columns,
+            "constants": constants,
+            "missing": {name: mask.hex() for name, mask in self.missing.items()},
+        }
+
+    @classmethod
+    def decode(cls, encoded):
+        """
+        Rebuild a batch from the dict returned by encode()
+        """
+        size = encoded["size"]
+        columns = {}
+        for name in _FIELD_NAMES:
+            typecode = _ARRAY_TYPECODES.get(_FIELD_SPECS[name][0])
+            if name in encoded["constants"]:
+                values = [encoded["constants"][name]]
+                if typecode is None:
+                    columns[name] = values * size
+                else:
+                    columns[name] = array.array(typecode, values) * size
+            elif typecode is None:
+                columns[name] = encoded["columns"][name]
+            else:
+                columns[name] = array.array(typecode, encoded["columns"][name])
+        missing = {
+            name: bytearray.fromhex(mask)
+            for name, mask in encoded["missing"].items()
+        }
+        return cls(columns, missing, size)
+
+    def column(self, name):
+        """
+        Values of field name as a list (with None for missing values)
+        """
+        values = self.columns[name]
+        mask = self.missing.get(name)
+        if mask is None:
+            return list(values)
+        return [
+            None if is_missing else value
+            for value, is_missing in zip(values, mask)
+        ]
+
+    def rows(self):
+        """
+        Iterate over the results in the batch as tuples of field values
+        """
+        return zip(*(self.column(name) for name in _FIELD_NAMES))
+
+    def json_rows(self, typed=False):
+        """
+        Encode each result in the batch as a JSON object (one string each)
+
+        By default every value is written as a string with "" for empty
+        values (compatible with the TSV output), with typed=True numbers are
+        kept as JSON numbers and missing values written as null
+        """
+        encoded_columns = []
+        for name in _FIELD_NAMES:
+            values = self.columns[name]
+            mask = self.missing.get(name)
+            if isinstance(values, list):
+                encoded = _encode_json_strings(values, typed)
+            elif typed:
+                encoded = list(map(repr, values))
+                if values.typecode == "d" and not all(map(math.isfinite, values)):
+                    encoded = [json.dumps(value) for value in values]
+                if mask is not None:
+                    encoded = [
+                        "null" if is_missing else value
+                        for value, is_missing in zip(encoded, mask)
+                    ]
+            else:
+                # zero is empty too
+                encoded = [
+                    f'"{value!r}"' if value else '""' for value in values
+                ]
+                if mask is not None:
+                    encoded = [
+                        '""' if is_missing else value
+                        for value, is_missing in zip(encoded, mask)
+                    ]
+            encoded_columns.append(encoded)
+        return [_JSON_ROW_TEMPLATE % row for row in zip(*encoded_columns)]
+
+
+def _encode_json_strings(values, typed):
+    """
+    JSON encode a column of strings, encoding each distinct value only once
+    (values repeat a lot e.g., the metadata or gene names)
+    """
+    encoded = {}
+    for value in dict.fromkeys(values):
+        if isinstance(value, str) and (value or typed):
+            encoded[value] = encode_basestring_ascii(value)
+        elif typed:
+            encoded[value] = json.dumps(value)
+        else:
+            encoded[value] = encode_basestring_ascii(str(value) if value else "")
+    return list(map(encoded.__getitem__, values))
+
+
+def _common_metadata_block(results):
+    """
+    The hAMRonizedMetadataBlock of results if they are all
+    hAMRonizedSharedResults pointing at the same one, otherwise None
+    """
+    if not results or type(results[0]) is not hAMRonizedSharedResult:
+        return None
+    block = results[0]._block
+    for result in results:
+        if type(result) is not hAMRonizedSharedResult or result._block is not block:
+            return None
+    return block
@@ -1,6 +1,6 @@
 #!/usr/bin/env python3
 
-import hAMRonization
+import hAMRonization.Interfaces
 
 
 def main():
@@ -0,0 +1,90 @@
+#!/usr/bin/env python
+
+# lines are read in chunks of (at least) this many characters
+READ_CHUNK_SIZE = 1024 * 1024
+
+# number of columns of HMMER's --tblout and --domtblout tables (the last,
+# the description of the target, may contain spaces), the indexes of the
+# full sequence E-value and score and the slices of all E-value, score and
+# bias columns
+_TABLE_FORMATS = {
+    "tblout": (19, 4, 5, (slice(4, 10),)),
+    "domtblout": (23, 6, 7, (slice(6, 9), slice(11, 15))),
+}
+
+# the parser options of the tools reporting HMMER tables (see
+# hAMRonization.parse())
+THRESHOLD_OPTIONS = {
+    "max_evalue": {
+        "type": float,
+        "default": None,
+        "help": "Only report hits with a full sequence E-value of at most this",
+    },
+    "min_score": {
+        "type": float,
+        "default": None,
+        "help": "Only report hits with a full sequence bit score of at least this",
+    },
+}
+
+
+class HmmerTableReader:
+    """
+    Reads the hits of a HMMER --tblout or --domtblout table (table_format)
+    as dicts of fieldnames, one name per column
+
+    Lines are split on whitespace into the fixed number of columns of the
+    table, so the description of the target stays intact, and the E-values,
+    scores and biases are floats. Comment lines are dropped a chunk of lines
+    at a time and hits with a full sequence E-value over max_evalue or bit
+    score under min_score are skipped before they are turned into dicts.
+    """
+
+    def __init__(
+        self, handle, fieldnames, table_format="tblout", max_evalue=None, min_score=None
+    ):
+        (
+            self.column_count, self.evalue_column, self.score_column, self.float_columns
+        ) = _TABLE_FORMATS[table_format]
+        if len(fieldnames) != self.column_count:
+            raise ValueError(
+                f"A {table_format} table has {self.column_count} columns, "
+                f"got {len(fieldnames)} fieldnames"
+            )
+        self.handle = handle
+        self.fieldnames = fieldnames
+        self.max_evalue = max_evalue
+        self.min_score = min_score
+
+    def _lines(self):
+        """
+        The hit (i.e. not comment or blank) lines, read in chunks
+        """
+        readlines = self.handle.readlines
+        while lines := readlines(READ_CHUNK_SIZE):
+            yield from [
+                line for line in lines
+                if not line.startswith("#") and not line.isspace()
+            ]
+
+    def __iter__(self):
+        fieldnames = self.fieldnames
+        last_split = self.column_count - 1
+        float_columns = self.float_columns
+        evalue_column = self.evalue_column
+        score_column = self.score_column
+        max_evalue = self.max_evalue
+        min_score = self.min_score
+        for line in self._lines():
+            values = line.rstrip().split(None, last_split)
+            if len(values) <= last_split:
+                raise ValueError(
+                    f"Expected {self.column_count} columns in HMMER table line: {line!r}"
+                )
+            if max_evalue is not None and float(values[evalue_column]) > max_evalue:
+                continue
+            if min_score is not None and float(values[score_column]) < min_score:
+                continue
+            for columns in float_columns:
+                values[columns] = map(float, values[columns])
+            yield dict(zip(fieldnames, values))
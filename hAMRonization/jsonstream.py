@@ -0,0 +1,258 @@
+#!/usr/bin/env python
+
+import re
+import json
+
+# text is read in chunks of (at least) this many characters
+READ_CHUNK_SIZE = 1024 * 1024
+
+_WHITESPACE_RE = re.compile(r"[ \t\n\r]*")
+_SCALAR_END_RE = re.compile(r"[,\]} \t\n\r]")
+_DECODER = json.JSONDecoder()
+
+
+class _SelectiveScanner:
+    """
+    Scans json text read from a handle chunk by chunk, decoding selected
+    values and skipping the others
+
+    Skipped arrays and objects are still decoded into objects (by the C
+    decoder, which is faster than any skipping done in python, even one
+    only tracking brackets and strings), but one buffered piece at a time
+    and dropped right away, so they never take more memory than a chunk's
+    worth of objects. This saves memory, not time: reading a document
+    takes a little longer than json.load (see benchmark.py json).
+    """
+
+    def __init__(self, handle, chunk_size):
+        self.handle = handle
+        self.chunk_size = chunk_size
+        self.buffer = ""
+        self.pos = 0
+        self.eof = False
+        # start of a value being decoded, which must stay in the buffer
+        self.keep = None
+
+    def _error(self, message):
+        return json.JSONDecodeError(message, self.buffer, self.pos)
+
+    def _fill(self):
+        """
+        Read another chunk, dropping the text already scanned (False at the
+        end of the input)
+        """
+        if self.eof:
+            return False
+        start = self.pos if self.keep is None else self.keep
+        # read at least as much as is kept, so values spanning many chunks
+        # are still read (and retried) in linear time
+        chunk = self.handle.read(max(self.chunk_size, len(self.buffer) - start))
+        if not chunk:
+            self.eof = True
+            return False
+        self.buffer = self.buffer[start:] + chunk
+        self.pos -= start
+        if self.keep is not None:
+            self.keep -= start
+        return True
+
+    def peek(self):
+        """
+        The next character after any whitespace ("" at the end of the input)
+        """
+        while True:
+            self.pos = _WHITESPACE_RE.match(self.buffer, self.pos).end()
+            if self.pos < len(self.buffer) or not self._fill():
+                return self.buffer[self.pos:self.pos + 1]
+
+    def expect(self, character, message):
+        if self.peek() != character:
+            raise self._error(message)
+        self.pos += 1
+
+    def read_string(self):
+        """
+        Decode the string starting at pos
+        """
+        while True:
+            try:
+                value, self.pos = json.decoder.scanstring(self.buffer, self.pos + 1)
+                return value
+            except json.JSONDecodeError:
+                # the string may continue in the next chunk
+                if not self._fill():
+                    raise
+
+    def _skip_scalar(self):
+        """
+        Move pos past the number, true, false or null starting at pos
+        """
+        while True:
+            match = _SCALAR_END_RE.search(self.buffer, self.pos)
+            if match is not None:
+                self.pos = match.start()
+                return
+            if not self._fill():
+                self.pos = len(self.buffer)
+                return
+
+    def skip_value(self):
+        """
+        Move pos past the value starting at the next non-whitespace character
+        """
+        character = self.peek()
+        if character == '"':
+            self.read_string()
+        elif character in ("[", "{"):
+            try:
+                _, self.pos = _DECODER.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                # it continues past the buffer (or is invalid, which is then
+                # found among its members)
+                self._skip_members(character)
+        elif character:
+            self._skip_scalar()
+        else:
+            raise self._error("Expecting value")
+
+    def _skip_members(self, opening):
+        """
+        Move pos past the array or object starting at pos one element or
+        member at a time
+        """
+        closing = "]" if opening == "[" else "}"
+        self.pos += 1
+        if self.peek() == closing:
+            self.pos += 1
+            return
+        while True:
+            if opening == "{":
+                if self.peek() != '"':
+                    raise self._error("Expecting property name enclosed in double quotes")
+                self.read_string()
+                self.expect(":", "Expecting ':' delimiter")
+            else:
+                self._skip_buffered_elements()
+            self.skip_value()
+            character = self.peek()
+            if character == closing:
+                self.pos += 1
+                return
+            if character != ",":
+                raise self._error("Expecting ',' delimiter")
+            self.pos += 1
+
+    def _skip_buffered_elements(self):
+        """
+        Move pos past the array elements from pos on that are complete in the
+        buffer and followed by another element, in one tight loop (the
+        elements of large arrays would otherwise each take several calls)
+        """
+        buffer = self.buffer
+        scan_once = _DECODER.scan_once
+        whitespace = _WHITESPACE_RE.match
+        pos = whitespace(buffer, self.pos).end()
+        try:
+            while True:
+                _, end = scan_once(buffer, pos)
+                if not buffer.startswith(",", end):
+                    end = whitespace(buffer, end).end()
+                    # the last element, or one that may continue in the
+                    # next chunk (e.g., a number)
+                    if not buffer.startswith(",", end):
+                        break
+                pos = whitespace(buffer, end + 1).end()
+        except (StopIteration, ValueError):
+            # not complete in the buffer (or invalid), left to skip_value()
+            pass
+        self.pos = pos
+
+    def decode_value(self):
+        """
+        Decode the value starting at the next non-whitespace character
+        """
+        character = self.peek()
+        self.keep = self.pos
+        try:
+            if character in ("[", "{"):
+                while True:
+                    try:
+                        value, self.pos = _DECODER.raw_decode(self.buffer, self.keep)
+                        return value
+                    except json.JSONDecodeError:
+                        # it may continue in the next chunk
+                        if not self._fill():
+                            raise
+            # scalars aren't delimited, so find their end before decoding
+            self.skip_value()
+            return json.loads(self.buffer[self.keep:self.pos])
+        finally:
+            self.keep = None
+
+    def load(self, selection):
+        """
+        Decode the next value, only keeping the selected members of objects
+        """
+        if selection is True or self.peek() != "{":
+            return self.decode_value()
+        return dict(self.members(selection))
+
+    def members(self, selection):
+        """
+        The (name, value) of each selected member of the object starting at
+        the next non-whitespace character, decoded one at a time
+        """
+        self.expect("{", "Expecting object")
+        if self.peek() == "}":
+            self.pos += 1
+            return
+        while True:
+            if self.peek() != '"':
+                raise self._error("Expecting property name enclosed in double quotes")
+            key = self.read_string()
+            self.expect(":", "Expecting ':' delimiter")
+            member_selection = selection.get(key, selection.get("*"))
+            if member_selection is None:
+                self.skip_value()
+            else:
+                yield key, self.load(member_selection)
+            character = self.peek()
+            if character == "}":
+                self.pos += 1
+                return
+            if character != ",":
+                raise self._error("Expecting ',' delimiter")
+            self.pos += 1
+
+
+def load_selected(handle, selection, chunk_size=READ_CHUNK_SIZE):
+    """
+    Read a json document from a text handle like json.load, but only decode
+    the members of its objects that are selected, skipping the others
+    (reading the document chunk by chunk rather than all at once), so its
+    peak memory is bounded by the selected members and the chunk size
+    rather than by the document size
+
+    selection is a dict of the member names to keep ("*" matching any other
+    name), each mapped to True to decode the whole member or to a nested
+    selection for the members of an object e.g., {"*": {"version": True}}
+    keeps just the version of each member of the document.
+    """
+    scanner = _SelectiveScanner(handle, chunk_size)
+    result = scanner.load(selection)
+    if scanner.peek():
+        raise scanner._error("Extra data")
+    return result
+
+
+def iter_selected_members(handle, selection, chunk_size=READ_CHUNK_SIZE):
+    """
+    The (name, value) of each selected member of the json object in a text
+    handle, decoded as load_selected would but yielded one at a time, so a
+    document of many large members (e.g., the samples of a plate) is never
+    held in memory all at once
+    """
+    scanner = _SelectiveScanner(handle, chunk_size)
+    yield from scanner.members(selection)
+    if scanner.peek():
+        raise scanner._error("Extra data")
@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+
+import re
+import functools
+
+# number of distinct mutation strings whose conversions are kept
+CACHE_SIZE = 1 << 14
+
+# reference, position and alternate of a substitution such as S83L, A2032G
+# or C-11T (a position upstream of the start, anything before or after it
+# is dropped)
+_SUBSTITUTION_RE = re.compile(r"([^\d-]+)(-?\d+)(\D+)")
+
+# a Mykrobe variant: gene, amino acid change and codon (or nucleotide)
+# change e.g., gyrA_D94G-GAC7570GGC or rrs_A1401X-A1401G
+_MYKROBE_VARIANT_RE = re.compile(
+    r"(?P<gene_symbol>[^_]+)_(?P<aa_change>(?P<aa_from>[A-Z])"
+    r"(?P<aa_pos>\d+)(?P<aa_to>[A-Z]))-"
+    r"(?P<codon_change>(?P<codon_from>[ACTG]{1,3})"
+    r"(?P<codon_pos>\d+)(?P<codon_to>[ACTG]{1,3}))"
+)
+
+AMINO_ACID_SYMBOLS = {
+    "A": "Ala",
+    "C": "Cys",
+    "D": "Asp",
+    "E": "Glu",
+    "F": "Phe",
+    "G": "Gly",
+    "H": "His",
+    "I": "Ile",
+    "K": "Lys",
+    "L": "Leu",
+    "M": "Met",
+    "N": "Asn",
+    "P": "Pro",
+    "Q": "Gln",
+    "R": "Arg",
+    "S": "Ser",
+    "T": "Thr",
+    "V": "Val",
+    "W": "Trp",
+    "Y": "Tyr",
+}
+
+
+@functools.lru_cache(maxsize=CACHE_SIZE)
+def split_substitution(mutation):
+    """
+    (reference, position, alternate) strings of a substitution e.g.,
+    ("S", "83", "L") for S83L or ("C", "-11", "T") for C-11T, raising
+    ValueError if it isn't one
+    """
+    _, ref, pos, alt, _ = _SUBSTITUTION_RE.split(mutation)
+    return ref, pos, alt
+
+
+@functools.lru_cache(maxsize=CACHE_SIZE)
+def protein_substitution(mutation):
+    """
+    HGVS protein notation of a substitution e.g., p.S83L for S83L
+    """
+    ref, pos, alt = split_substitution(mutation)
+    return f"p.{ref}{pos}{alt}"
+
+
+@functools.lru_cache(maxsize=CACHE_SIZE)
+def nucleotide_substitution(mutation, prefix="n."):
+    """
+    HGVS nucleotide notation of a substitution e.g., n.2032A>G for A2032G
+    (prefix c. for coding sequence positions, where e.g., C-11T upstream of
+    the start codon is c.-11C>T)
+    """
+    ref, pos, alt = split_substitution(mutation)
+    return f"{prefix}{pos}{ref}>{alt}"
+
+
+@functools.lru_cache(maxsize=CACHE_SIZE)
+def protein_mutations(mutations):
+    """
+    HGVS protein notation of a comma separated list of amino acid changes
+    e.g., p.S83L,p.D87N for S83L,D87N (each change is kept as it is)
+    """
+    return ",".join(f"p.{mutation}" for mutation in mutations.split(","))
+
+
+@functools.lru_cache(maxsize=CACHE_SIZE)
+def nucleotide_mutations(mutations, prefix="n."):
+    """
+    HGVS nucleotide notation of a comma separated list of substitutions
+    e.g., n.1401A>G,n.1484G>T for A1401G,G1484T
+    """
+    return ",".join(
+        nucleotide_substitution(mutation, prefix)
+        for mutation in mutations.split(",")
+    )
+
+
+@functools.lru_cache(maxsize=CACHE_SIZE)
+def mykrobe_variant(variant):
+    """
+    (gene symbol, codon or nucleotide change, HGVS protein change with
+    three letter amino acids or None for a nucleotide change) of a Mykrobe
+    variant e.g., ("gyrA", "GAC7570GGC", "p.Asp94Gly") for
+    gyrA_D94G-GAC7570GGC, None if it isn't one
+    """
+    match = _MYKROBE_VARIANT_RE.match(variant)
+    if match is None:
+        return None
+    if len(match.group("codon_from")) == 1:
+        protein_change = None
+    else:
+        protein_change = (
+            "p."
+            + AMINO_ACID_SYMBOLS[match.group("aa_from")]
+            + match.group("aa_pos")
+            + AMINO_ACID_SYMBOLS[match.group("aa_to")]
+        )
+    return match.group("gene_symbol"), match.group("codon_change"), protein_change
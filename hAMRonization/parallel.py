@@ -0,0 +1,138 @@
+#!/usr/bin/env python
+
+import os
+import math
+import collections
+
+import hAMRonization
+
+
+def _cgroup_cpu_quota():
+    """
+    CPU quota (in CPUs) of the cgroup of this process or None if unlimited
+    """
+    # cgroup v2
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as fh:
+            quota, period = fh.read().split()[:2]
+        if quota == "max":
+            return None
+        return int(quota) / int(period)
+    except (OSError, ValueError):
+        pass
+    # cgroup v1
+    try:
+        with open("/sys/fs/cgroup/cpu/cpu.cfs_quota_us") as fh:
+            quota = int(fh.read())
+        with open("/sys/fs/cgroup/cpu/cpu.cfs_period_us") as fh:
+            period = int(fh.read())
+        if quota > 0 and period > 0:
+            return quota / period
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+def available_cpu_count():
+    """
+    Number of CPUs this process can use, respecting its CPU affinity and any
+    cgroup CPU quota (e.g., of a container or batch scheduler job)
+    """
+    try:
+        count = len(os.sched_getaffinity(0))
+    except AttributeError:
+        count = os.cpu_count() or 1
+    quota = _cgroup_cpu_quota()
+    if quota is not None:
+        count = min(count, max(1, math.ceil(quota)))
+    return count
+
+
+def report_batches(report, metadata, tool, cache=None, options=None):
+    """
+    The hAMRonizedResultBatches of a report (parsed with the parser options
+    of its tool), through a ResultCache if given
+    """
+    options = options or {}
+    if cache is not None:
+        return cache.batches(report, metadata, tool, options=options)
+    return hAMRonization.parse(report, dict(metadata), tool, **options).iter_batches()
+
+
+def _render_report(
+    report, metadata, tool, output_format, typed_json, cache=None, options=None
+):
+    """
+    Parse a report and render its results (run in the worker processes)
+    """
+    return [
+        hAMRonization.Interfaces.render_batch(batch, output_format, typed_json)
+        for batch in report_batches(report, metadata, tool, cache, options)
+    ]
+
+
+def render_reports(
+    reports, metadata, tool, output_format, typed_json=False, jobs=None, cache=None,
+    options=None,
+):
+    """
+    Parse (with the parser options of tool) and render (see render_batch)
+    reports of one tool in a pool of jobs worker processes (by default
+    available_cpu_count()), yielding the list of rendered batches of each
+    report in the order of reports
+
+    With a ResultCache, reports it has an entry for aren't parsed again
+    """
+    return render_tasks(
+        ((report, metadata, tool) for report in reports),
+        output_format,
+        typed_json=typed_json,
+        jobs=jobs,
+        cache=cache,
+        options=options,
+    )
+
+
+def render_tasks(
+    tasks, output_format, typed_json=False, jobs=None, cache=None, options=None
+):
+    """
+    As render_reports for (report, metadata, tool) tasks i.e. reports of any
+    tool (options then apply to every task, so are only for tasks of one
+    tool)
+
+    At most two reports per worker are parsed ahead of the one being
+    yielded, so memory use doesn't grow with the number of reports (with a
+    single job the reports are parsed in this process instead)
+    """
+    if not jobs:
+        jobs = available_cpu_count()
+    if jobs == 1:
+        for report, metadata, tool in tasks:
+            yield _render_report(
+                report, metadata, tool, output_format, typed_json, cache, options
+            )
+        return
+
+    # importing multiprocessing is only worth it with several jobs
+    from concurrent.futures import ProcessPoolExecutor
+
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        pending = collections.deque()
+        try:
+            for report, metadata, tool in tasks:
+                if len(pending) >= 2 * jobs:
+                    yield pending.popleft().result()
+                pending.append(
+                    executor.submit(
+                        _render_report, report, metadata, tool, output_format,
+                        typed_json, cache, options,
+                    )
+                )
+            while pending:
+                yield pending.popleft().result()
+        except BaseException:
+            # don't wait for reports that won't be written
+            for future in pending:
+                future.cancel()
+            raise
@@ -0,0 +1,97 @@
+#!/usr/bin/env python
+
+import logging
+import functools
+
+logger = logging.getLogger(__name__)
+
+# number of (tool, reference name) decompositions kept, least recently used
+# first out
+CACHE_SIZE = 1 << 16
+
+
+def _megares_fields(name):
+    # e.g., MEG_1490|Drugs|Cationic_antimicrobial_peptides|...|CAP16S|RequiresSNPConfirmation
+    hit_information = name.replace("|RequiresSNPConfirmation", "").split("|")
+    return {
+        "_reference_accession": hit_information[0],
+        "_drug_class": hit_information[2],
+        "_gene_symbol": hit_information[-1],
+        "_gene_name": hit_information[-2],
+    }
+
+
+def _kmerresistance_fields(name):
+    # e.g., aac(6')-Ib11_1_AY136758
+    return {
+        "_gene_name": "_".join(name.split("_")[:-1]),
+        "_gene_symbol": name.split("_")[0],
+    }
+
+
+def _groot_fields(name):
+    # e.g., efpA.3003955.AL123456.3.3153038-3154631.5259
+    return {
+        "_gene_name": ".".join(name.split(".")[:3]),
+        "_gene_symbol": name.split(".")[0],
+    }
+
+
+def _ariba_fields(name):
+    return {"_gene_symbol": name.split(".")[0]}
+
+
+def _resfams_fields(name):
+    return {"_gene_symbol": name.split("_")[0]}
+
+
+def _fargene_fields(name):
+    # e.g., classA_70_centroids-aligned
+    return {
+        "_gene_name": name,
+        "_gene_symbol": name.split("_")[0],
+        "_drug_class": name.split("_")[0],
+    }
+
+
+def _deeparg_fields(name):
+    # e.g., YP_001693237.1|FEATURES|oqxA|multidrug|oqxA
+    return {"_reference_accession": name.split("|")[0]}
+
+
+# tool -> the fields its parser derives from a reference name
+_DECOMPOSERS = {
+    "amrplusplus": _megares_fields,
+    "kmerresistance": _kmerresistance_fields,
+    "groot": _groot_fields,
+    "ariba": _ariba_fields,
+    "resfams": _resfams_fields,
+    "fargene": _fargene_fields,
+    "deeparg": _deeparg_fields,
+}
+
+
+@functools.lru_cache(maxsize=CACHE_SIZE)
+def decompose(tool, reference_name):
+    """
+    Dict of the fields the parser of tool derives from a reference name
+    (e.g., the MEGARes header of an AMR++ hit), memoised as the same names
+    recur on many rows and across reports. The dict is shared, so update a
+    result with it rather than changing it.
+    """
+    return _DECOMPOSERS[tool](reference_name)
+
+
+def log_statistics():
+    """
+    Log the hit rate of the decomposition cache (in debug mode)
+    """
+    if not logger.isEnabledFor(logging.DEBUG):
+        return
+    info = decompose.cache_info()
+    lookups = info.hits + info.misses
+    logger.debug(
+        "Reference name cache: %d of %d lookups hit (%.1f%%), %d names cached",
+        info.hits, lookups, 100 * info.hits / lookups if lookups else 0.0,
+        info.currsize,
+    )
@@ -0,0 +1,315 @@
+#!/usr/bin/env python
+
+import io
+import os
+import json
+import stat
+import socket
+import logging
+import socketserver
+import http.client
+import http.server
+
+import hAMRonization
+from hAMRonization.Interfaces import hAMRonizedResultWriter
+from hAMRonization.parallel import _render_report
+
+logger = logging.getLogger(__name__)
+
+# the one endpoint converting reports, see _ConversionHandler.do_POST
+CONVERT_PATH = "/hamronize"
+
+
+class ConversionError(ValueError):
+    """
+    A conversion the server rejected (with the server's message)
+    """
+
+
+def _warm_up():
+    """
+    Runs once in each worker process so they are started before any request
+    """
+    return os.getpid()
+
+
+class _ConversionHandler(http.server.BaseHTTPRequestHandler):
+    """
+    Handles POST requests to CONVERT_PATH with a json object of a tool, the
+    paths of its reports (as seen by the server), their metadata, the
+    output format (tsv, json or ndjson, optionally with typed_json) and any
+    parser options of the tool, e.g.:
+
+        {"tool": "abricate", "reports": ["/data/sample1/abricate.tsv"],
+         "metadata": {"analysis_software_version": "1.0.1",
+                      "reference_database_version": "2019-Jul-28"},
+         "format": "tsv"}
+
+    The response is the hAMRonized output of all reports as
+    hamronize <tool> would write it. GET / gives the version and tools.
+    """
+
+    protocol_version = "HTTP/1.1"
+
+    def address_string(self):
+        # unix socket clients have no address
+        if isinstance(self.client_address, tuple):
+            return self.client_address[0]
+        return "unix"
+
+    def log_message(self, format, *args):
+        logger.debug("%s %s", self.address_string(), format % args)
+
+    def _respond(self, status, body, content_type="text/plain; charset=utf-8"):
+        body = body.encode()
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path != "/":
+            self._respond(404, f"Unknown path {self.path}\n")
+            return
+        info = {
+            "version": hAMRonization.__version__,
+            "tools": list(hAMRonization._FormatToIterator.keys()),
+        }
+        self._respond(200, json.dumps(info) + "\n", "application/json")
+
+    def do_POST(self):
+        if self.path != CONVERT_PATH:
+            self._respond(404, f"Unknown path {self.path}\n")
+            return
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            job = json.loads(self.rfile.read(length))
+            output = self.server.convert(job)
+        except (ValueError, TypeError, KeyError, OSError) as e:
+            self._respond(400, f"{e}\n")
+        except SystemExit:
+            # the parsers exit on reports they can't read, having logged why
+            self._respond(400, "Report could not be parsed, see the server log\n")
+        except Exception as e:
+            logger.exception("Conversion failed")
+            self._respond(500, f"{type(e).__name__}: {e}\n")
+        else:
+            self._respond(200, output)
+
+
+class _ConversionServer:
+    """
+    Conversion state shared by the HTTP and unix socket servers: the parsers
+    (all imported up front), a warm pool of jobs worker processes (reports
+    are parsed in the request threads with a single job) and an optional
+    ResultCache
+    """
+
+    daemon_threads = True
+
+    def setup_conversions(self, jobs=1, cache=None):
+        self.cache = cache
+        self.executor = None
+        for tool in hAMRonization._FormatToIterator.keys():
+            hAMRonization._FormatToIterator[tool]
+        if jobs > 1:
+            from concurrent.futures import ProcessPoolExecutor
+
+            self.executor = ProcessPoolExecutor(max_workers=jobs)
+            warm_ups = [self.executor.submit(_warm_up) for _ in range(jobs)]
+            for warm_up in warm_ups:
+                warm_up.result()
+
+    def convert(self, job):
+        """
+        hAMRonized output of a conversion request (see _ConversionHandler)
+        """
+        if not isinstance(job, dict):
+            raise ValueError("Request must be a json object")
+        tool = job["tool"]
+        reports = job["reports"]
+        metadata = job.get("metadata", {})
+        output_format = job.get("format", "tsv")
+        typed_json = bool(job.get("typed_json", False))
+        options = job.get("options", {})
+        if tool not in hAMRonization._RequiredToolMetadata:
+            raise ValueError(f"Unknown tool: {tool}")
+        if not isinstance(reports, list) or not all(
+            isinstance(report, str) for report in reports
+        ):
+            raise ValueError("reports must be a list of paths")
+        if not isinstance(metadata, dict):
+            raise ValueError("metadata must be a json object")
+        if not isinstance(options, dict):
+            raise ValueError("options must be a json object")
+        tool_options = hAMRonization._ToolParserOptions.get(tool, {})
+        unknown_options = [option for option in options if option not in tool_options]
+        if unknown_options:
+            raise ValueError(f"{tool} has no options {unknown_options}")
+        missing_metadata = [
+            field
+            for field in hAMRonization._RequiredToolMetadata[tool]
+            if field not in metadata
+        ]
+        if missing_metadata:
+            raise ValueError(f"{tool} requires {missing_metadata} in metadata")
+        for report in reports:
+            if not os.path.isfile(report):
+                raise ValueError(f"File not found: {report}")
+
+        buffer = io.StringIO()
+        writer = hAMRonizedResultWriter(buffer, output_format, typed_json)
+        arguments = [
+            (report, metadata, tool, output_format, typed_json, self.cache, options)
+            for report in reports
+        ]
+        if self.executor is None:
+            for report_arguments in arguments:
+                writer.write_rendered(_render_report(*report_arguments))
+        else:
+            futures = [
+                self.executor.submit(_render_report, *report_arguments)
+                for report_arguments in arguments
+            ]
+            try:
+                for future in futures:
+                    writer.write_rendered(future.result())
+            finally:
+                for future in futures:
+                    future.cancel()
+        writer.close()
+        return buffer.getvalue()
+
+    def close(self):
+        self.server_close()
+        if self.executor is not None:
+            self.executor.shutdown(cancel_futures=True)
+        if self.cache is not None:
+            self.cache.prune()
+
+
+class _HTTPConversionServer(_ConversionServer, http.server.ThreadingHTTPServer):
+    pass
+
+
+class _UnixConversionServer(_ConversionServer, socketserver.ThreadingUnixStreamServer):
+    def server_bind(self):
+        # the socket is created accessible to the user running the server
+        # only (0600), as the server reads any report path it is sent
+        umask = os.umask(0o177)
+        try:
+            super().server_bind()
+        finally:
+            os.umask(umask)
+
+    def server_close(self):
+        super().server_close()
+        try:
+            os.unlink(self.server_address)
+        except FileNotFoundError:
+            pass
+
+
+def create_server(socket_path=None, host="127.0.0.1", port=None, jobs=1, cache=None):
+    """
+    A conversion server (see _ConversionHandler) listening on the unix socket
+    socket_path or on host:port (port 0 picks a free port), to be run with
+    serve_forever() and released with close()
+
+    The server reads any report path it is sent with the permissions of the
+    user running it, so its unix socket is only accessible to that user and
+    host:port should only be reachable by trusted clients
+    """
+    if socket_path is not None:
+        # replace the socket of a server that wasn't shut down cleanly
+        try:
+            if stat.S_ISSOCK(os.stat(socket_path).st_mode):
+                os.unlink(socket_path)
+        except FileNotFoundError:
+            pass
+        server = _UnixConversionServer(socket_path, _ConversionHandler)
+    else:
+        server = _HTTPConversionServer((host, port), _ConversionHandler)
+    try:
+        server.setup_conversions(jobs, cache)
+    except BaseException:
+        server.server_close()
+        raise
+    return server
+
+
+def serve(socket_path=None, host="127.0.0.1", port=None, jobs=1, cache=None):
+    """
+    Run a conversion server until interrupted
+    """
+    server = create_server(socket_path, host, port, jobs, cache)
+    if socket_path is not None:
+        logger.warning("Listening on %s", socket_path)
+    else:
+        logger.warning("Listening on http://%s:%s", *server.server_address[:2])
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+
+
+class _UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, socket_path, timeout=None):
+        super().__init__("localhost", timeout=timeout)
+        self.socket_path = socket_path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.socket_path)
+
+
+def connect(address, timeout=None):
+    """
+    Connection to a conversion server at address, a unix socket path or
+    host:port (optionally prefixed with http://)
+    """
+    address = address.removeprefix("http://").rstrip("/")
+    host, _, port = address.rpartition(":")
+    if host and port.isdigit() and "/" not in address:
+        return http.client.HTTPConnection(host, int(port), timeout=timeout)
+    return _UnixHTTPConnection(address, timeout=timeout)
+
+
+def request_conversion(
+    address, tool, reports, metadata, output_format="tsv", typed_json=False,
+    options=None,
+):
+    """
+    hAMRonized output of reports (parsed with the parser options of tool)
+    from the conversion server at address (see connect()), relative report
+    paths are resolved here rather than by the server
+
+    Raises ConversionError if the server rejects the request
+    """
+    job = {
+        "tool": tool,
+        "reports": [os.path.abspath(report) for report in reports],
+        "metadata": metadata,
+        "format": output_format,
+        "typed_json": typed_json,
+        "options": options or {},
+    }
+    connection = connect(address)
+    try:
+        connection.request(
+            "POST",
+            CONVERT_PATH,
+            body=json.dumps(job),
+            headers={"Content-Type": "application/json"},
+        )
+        response = connection.getresponse()
+        body = response.read().decode()
+    finally:
+        connection.close()
+    if response.status != 200:
+        raise ConversionError(body.strip())
+    return body
@@ -0,0 +1,297 @@
+#!/usr/bin/env python
+
+import io
+import os
+import sys
+import bz2
+import itertools
+import gzip
+import lzma
+import fnmatch
+import logging
+
+logger = logging.getLogger(__name__)
+
+# leading bytes of each supported compression format
+_COMPRESSION_MAGIC = {
+    b"\x1f\x8b": gzip.open,
+    b"BZh": bz2.open,
+    b"\xfd7zXZ\x00": lzma.open,
+}
+_MAGIC_LENGTH = max(len(magic) for magic in _COMPRESSION_MAGIC)
+
+# output compression formats: (file suffix, open function, name of its
+# compression level argument, default level i.e. that of the command line
+# tool)
+COMPRESSION_FORMATS = {
+    "gzip": (".gz", gzip.open, "compresslevel", 6),
+    "bzip2": (".bz2", bz2.open, "compresslevel", 9),
+    "xz": (".xz", lzma.open, "preset", 6),
+}
+
+# write buffer size, so output is written (and compressed) in large chunks
+OUTPUT_BUFFER_SIZE = 1024 * 1024
+
+
+def is_path(source):
+    """
+    Whether a report source is a path (rather than "-" for stdin or an
+    already open file-like object)
+    """
+    return isinstance(source, (str, os.PathLike)) and source != "-"
+
+
+def source_name(source):
+    """
+    Name of a report source for messages and reports (the path as given,
+    "<stdin>" or the name of a file-like object if it has one)
+    """
+    if source == "-":
+        return "<stdin>"
+    if is_path(source):
+        return os.fspath(source)
+    return getattr(source, "name", "<stream>")
+
+
+def _leading_bytes(fh):
+    """
+    Leading bytes of a binary file-like object without consuming them (empty
+    if they can't be read without consuming them)
+    """
+    if hasattr(fh, "peek"):
+        return fh.peek(_MAGIC_LENGTH)[:_MAGIC_LENGTH]
+    if fh.seekable():
+        position = fh.tell()
+        leading_bytes = fh.read(_MAGIC_LENGTH)
+        fh.seek(position)
+        return leading_bytes
+    return b""
+
+
+def compression_opener(source):
+    """
+    The open function of the compression format of a path or binary
+    file-like object (detected from its leading bytes, not its file
+    extension) or None if it isn't compressed
+    """
+    if is_path(source):
+        with open(source, "rb") as fh:
+            leading_bytes = fh.read(_MAGIC_LENGTH)
+    else:
+        leading_bytes = _leading_bytes(source)
+    for magic, opener in _COMPRESSION_MAGIC.items():
+        if leading_bytes.startswith(magic):
+            return opener
+    return None
+
+
+def open_source(source):
+    """
+    Open a report for reading as text, transparently stream-decompressing
+    gzip, bzip2 and xz compressed reports
+
+    source can be a path, "-" for stdin or an open text or binary file-like
+    object (only binary ones can be decompressed). File-like objects are
+    wrapped rather than reopened, use close_source() to release them
+    without closing the caller's object.
+    """
+    if source == "-":
+        source = sys.stdin.buffer
+    if isinstance(source, io.TextIOBase):
+        return source
+    opener = compression_opener(source)
+    if opener is not None:
+        return opener(source, "rt")
+    if is_path(source):
+        return open(source, "r")
+    return io.TextIOWrapper(source)
+
+
+def read_leading_lines(stream, count):
+    """
+    Read up to count lines from the start of a text stream
+    """
+    lines = []
+    while len(lines) < count:
+        line = stream.readline()
+        if not line:
+            break
+        lines.append(line)
+    return lines
+
+
+class ReplayStream:
+    """
+    A text stream of lines already read from stream (e.g., by
+    read_leading_lines() to sniff a report) followed by the rest of it, so
+    a report is still read only once when its start is inspected before it
+    is parsed (also when it is piped or compressed)
+
+    Supports iteration, read(), readline() and readlines() (the parsers'
+    ways of reading), other attributes are those of stream.
+    """
+
+    def __init__(self, lines, stream):
+        self.lines = list(lines)
+        self.stream = stream
+
+    def _replay(self):
+        lines, self.lines = self.lines, []
+        return lines
+
+    def __iter__(self):
+        return itertools.chain(self._replay(), self.stream)
+
+    def read(self, size=-1):
+        prefix = "".join(self._replay())
+        if size is None or size < 0:
+            return prefix + self.stream.read()
+        if len(prefix) >= size:
+            if len(prefix) > size:
+                self.lines = [prefix[size:]]
+            return prefix[:size]
+        return prefix + self.stream.read(size - len(prefix))
+
+    def readline(self, size=-1):
+        if self.lines:
+            return self.lines.pop(0)
+        return self.stream.readline(size)
+
+    def readlines(self, hint=-1):
+        lines = self._replay()
+        if hint is None or hint <= 0:
+            return lines + self.stream.readlines()
+        # the replayed lines are returned on their own, which readers that
+        # take the lines a chunk at a time handle like any short chunk
+        return lines or self.stream.readlines(hint)
+
+    def __getattr__(self, name):
+        return getattr(self.stream, name)
+
+
+class DirectoryReports:
+    """
+    The reports in a directory whose names match pattern (e.g.,
+    "*.results.json"), also when compressed (i.e. with a .gz, .bz2 or .xz
+    suffix), for parsers that read a whole directory of per-sample reports
+    as one source in a single pass
+
+    Iterating gives a (name, text stream) pair per report in name order,
+    the name being its path without the compression suffix. Each report is
+    opened (and decompressed) as it is reached and closed when the next one
+    is, so only one is open at a time.
+    """
+
+    def __init__(self, directory, pattern):
+        self.directory = directory
+        self.pattern = pattern
+        self.stream = None
+
+    def _report_name(self, name):
+        """
+        name without its compression suffix if it matches pattern (None if
+        it doesn't)
+        """
+        for suffix, _, _, _ in COMPRESSION_FORMATS.values():
+            if name.endswith(suffix):
+                name = name[:-len(suffix)]
+                break
+        return name if fnmatch.fnmatch(name, self.pattern) else None
+
+    def paths(self):
+        """
+        (path, name) of the matching reports in name order
+        """
+        with os.scandir(self.directory) as entries:
+            names = [
+                entry.name for entry in entries
+                if entry.is_file() and self._report_name(entry.name) is not None
+            ]
+        if not names:
+            logger.warning(
+                "No %s reports found in directory %s", self.pattern, self.directory
+            )
+        return [
+            (os.path.join(self.directory, name),
+             os.path.join(self.directory, self._report_name(name)))
+            for name in sorted(names)
+        ]
+
+    def __iter__(self):
+        try:
+            for path, name in self.paths():
+                self.stream = open_source(path)
+                yield name, self.stream
+                self.close()
+        finally:
+            self.close()
+
+    def close(self):
+        if self.stream is not None:
+            self.stream.close()
+            self.stream = None
+
+
+def close_source(source, stream):
+    """
+    Close a stream opened by open_source(source), leaving file-like objects
+    (and stdin) passed as source open
+    """
+    if is_path(source):
+        stream.close()
+    elif stream is not source:
+        # decompressors don't close the object they read from
+        try:
+            stream.detach()
+        except ValueError:
+            # already detached
+            pass
+
+
+def output_compression(path):
+    """
+    The compression format implied by the suffix of an output path (if any)
+    """
+    if path:
+        suffix = os.path.splitext(path)[1]
+        for compression, (compression_suffix, _, _, _) in COMPRESSION_FORMATS.items():
+            if suffix == compression_suffix:
+                return compression
+    return None
+
+
+def open_output(path, mode="w", compression=None, compression_level=None):
+    """
+    Open an output path (or stdout if path is None) for writing text with a
+    large write buffer, compressed with compression ("gzip", "bzip2" or "xz",
+    by default chosen from the suffix of path)
+
+    Appending to a compressed file adds a new compressed stream to it, which
+    is read back as one stream. The caller must close the returned handle
+    unless it is sys.stdout (closing a compressed stdout handle doesn't close
+    stdout itself).
+    """
+    if compression is None:
+        compression = output_compression(path)
+    if compression is None:
+        if path is None:
+            return sys.stdout
+        return open(path, mode, buffering=OUTPUT_BUFFER_SIZE)
+
+    try:
+        _, opener, level_argument, default_level = COMPRESSION_FORMATS[compression]
+    except KeyError:
+        raise ValueError(
+            f"Unknown compression {compression}. Valid options are: "
+            f"{', '.join(COMPRESSION_FORMATS)}"
+        ) from None
+    if compression_level is None:
+        compression_level = default_level
+    if path is None:
+        sys.stdout.flush()
+        target = sys.stdout.buffer
+    else:
+        target = path
+    compressed = opener(target, mode + "b", **{level_argument: compression_level})
+    # the compressors don't buffer their input themselves
+    return io.TextIOWrapper(io.BufferedWriter(compressed, OUTPUT_BUFFER_SIZE))
@@ -5,7 +5,8 @@ import pandas as pd
 import os
 import sys
 import json
-from .hAMRonizedResult import hAMRonizedResult
+from .streams import open_source, open_output
+from .hAMRonizedResult import hAMRonizedResult, _FIELD_SPECS
 import dataclasses
 from string import Template
 
@@ -673,14 +674,29 @@ def generate_interactive_report(combined_report_data):
     return interactive_report
 
 
+# number of records read at a time from ndjson reports (pandas takes about
+# 10 times a chunk's text size to decode it)
+NDJSON_CHUNK_SIZE = 2000
+
+
 def check_report_type(file_path):
     """
     Taken from blhsing's answer to stackoverflow.com/questions/54698130
-    Identifies whether a report is json or tsv
+    Identifies whether a report is json, ndjson (one json object per line)
+    or tsv
     """
-    with open(file_path) as fh:
-        if fh.read(1) in ["{", "["]:
+    with open_source(file_path) as fh:
+        first_character = fh.read(1)
+        if first_character == "[":
             return "json"
+        elif first_character == "{":
+            # a json object on its own line is ndjson, otherwise it is
+            # (pretty-printed) json
+            try:
+                json.loads(first_character + fh.readline())
+            except ValueError:
+                return "json"
+            return "ndjson"
         else:
             fh.seek(0)
             reader = csv.reader(fh, delimiter="\t")
@@ -691,13 +707,129 @@ def check_report_type(file_path):
                 return None
 
 
-def summarize_reports(report_paths, summary_type, output_path=None):
-    # fix default output
-    if output_path:
-        out_fh = open(output_path, "w")
-    else:
-        out_fh = sys.stdout
+def _numeric_columns(report_chunk):
+    """
+    Convert the numeric hAMRonized fields of a chunk of ndjson records
+    (so the column types don't depend on which records ended up in a chunk)
+    """
+    for name, (field_type, _, _) in _FIELD_SPECS.items():
+        if field_type in (int, float) and name in report_chunk:
+            report_chunk[name] = pd.to_numeric(report_chunk[name], errors="coerce")
+    return report_chunk
+
+
+def _read_ndjson_report(fh):
+    """
+    Read an ndjson report in chunks of NDJSON_CHUNK_SIZE records, merging
+    the chunks read into the unique records so far (dropping duplicates)
+    whenever they hold as many records
+
+    The summary is sorted, so it still needs all unique records of the
+    report in memory at once, but not its duplicates (e.g., of reports
+    hAMRonized more than once). Returns the DataFrame of the unique records
+    and the number of records read.
+    """
+    unique_records = None
+    pending_chunks = []
+    pending_count = 0
+    record_count = 0
+    for chunk in pd.read_json(
+        fh, lines=True, chunksize=NDJSON_CHUNK_SIZE, dtype=False
+    ):
+        record_count += len(chunk)
+        pending_chunks.append(_numeric_columns(chunk))
+        pending_count += len(chunk)
+        # merging once the pending records are as many as the unique ones
+        # keeps the merging work linear in the number of records
+        if unique_records is None or pending_count >= len(unique_records):
+            unique_records = _merge_unique(unique_records, pending_chunks)
+            pending_chunks, pending_count = [], 0
+    if pending_chunks:
+        unique_records = _merge_unique(unique_records, pending_chunks)
+    if unique_records is None:
+        unique_records = pd.DataFrame()
+    return unique_records, record_count
+
+
+def _merge_unique(unique_records, chunks):
+    """
+    Unique records of a DataFrame of unique records (or None) followed by
+    chunks, keeping the first of any duplicates
+    """
+    if unique_records is not None:
+        chunks = [unique_records] + chunks
+    return pd.concat(chunks, ignore_index=True).drop_duplicates(ignore_index=True)
+
+
+def batches_to_dataframe(batches):
+    """
+    Convert hAMRonizedResultBatches to a single DataFrame, using the typed
+    numeric columns of the batches directly as nullable pandas arrays
+    """
+    # only needed for the batches' typed columns
+    import numpy as np
+
+    hamronized_fields = [
+            field.name for field in dataclasses.fields(hAMRonizedResult)
+        ]
+    frames = []
+    for batch in batches:
+        columns = {}
+        for name in hamronized_fields:
+            values = batch.columns[name]
+            if isinstance(values, list):
+                columns[name] = values
+                continue
+            values = np.frombuffer(values, dtype=values.typecode)
+            mask = batch.missing.get(name)
+            if mask is None:
+                mask = np.zeros(len(values), dtype=bool)
+            else:
+                mask = np.frombuffer(mask, dtype=bool)
+            if values.dtype.kind == "f":
+                columns[name] = pd.arrays.FloatingArray(values, mask)
+            else:
+                columns[name] = pd.arrays.IntegerArray(values, mask)
+        frames.append(pd.DataFrame(columns, columns=hamronized_fields))
+    if not frames:
+        return pd.DataFrame(columns=hamronized_fields)
+    return pd.concat(frames, ignore_index=True)
+
+
+def summarize_batches(
+    batches,
+    summary_type,
+    output_path=None,
+    compression=None,
+    compression_level=None,
+):
+    """
+    Summarize hAMRonizedResultBatches (e.g., from iter_batches()) without
+    writing them to intermediate hAMRonized reports first
+    """
+    batches = list(batches)
+    combined_reports = batches_to_dataframe(batches)
+    _write_summary(
+        [combined_reports], summary_type, output_path, len(batches), "batches",
+        compression=compression, compression_level=compression_level,
+    )
+
+
+def summarize_reports(
+    report_paths,
+    summary_type,
+    output_path=None,
+    compression=None,
+    compression_level=None,
+):
+    """
+    Summarize hAMRonized reports (tsv, json or ndjson) into one de-duplicated
+    and sorted summary_type summary
 
+    The unique records of all reports are held in memory to be sorted.
+    ndjson reports are read in chunks whose duplicates are dropped as they
+    are read, json and tsv reports are read whole.
+    """
     # initialise the combined report with an empty df with just headers
     hamronized_fields = [
             field.name for field in dataclasses.fields(hAMRonizedResult)
@@ -705,32 +837,66 @@ def summarize_reports(report_paths, summary_type, output_path=None):
     combined_report_data = [pd.DataFrame(columns=hamronized_fields)]
 
     report_count = 0
+    # duplicates already dropped while reading (ndjson) reports
+    dropped_duplicate_count = 0
 
     for report in report_paths:
         if not os.path.exists(report):
             raise FileNotFoundError(f"{report} cannot be found")
         else:
             report_type = check_report_type(report)
-            with open(report) as fh:
+            with open_source(report) as fh:
                 # use json library if report is json
                 if report_type == "json" or report_type == "interactive":
-                    parsed_report = pd.read_json(fh)
+                    parsed_reports = [pd.read_json(fh)]
+
+                # ndjson is read in chunks of records rather than as one
+                # document
+                elif report_type == "ndjson":
+                    unique_records, record_count = _read_ndjson_report(fh)
+                    dropped_duplicate_count += record_count - len(unique_records)
+                    parsed_reports = [unique_records]
 
                 # similarly if the report is a tsv use csv reader
                 elif report_type == "tsv":
-                    parsed_report = pd.read_csv(fh, sep="\t")
+                    parsed_reports = [pd.read_csv(fh, sep="\t")]
 
                 elif report_type is None:
                     print(f"Warning: {fh} report is empty", file=sys.stderr)
-                    parsed_report = pd.DataFrame()
+                    parsed_reports = [pd.DataFrame()]
                 else:
                     raise FileNotFoundError(
                         f"{report} type cannot be parsed, " "check validity of file"
                     )
 
-        combined_report_data.append(parsed_report)
+        combined_report_data.extend(parsed_reports)
         report_count += 1
 
+    _write_summary(
+        combined_report_data, summary_type, output_path, report_count,
+        compression=compression, compression_level=compression_level,
+        dropped_duplicate_count=dropped_duplicate_count,
+    )
+
+
+def _write_summary(
+    combined_report_data,
+    summary_type,
+    output_path,
+    report_count,
+    unit="reports",
+    compression=None,
+    compression_level=None,
+    dropped_duplicate_count=0,
+):
+    """
+    Concatenate, de-duplicate and sort the report DataFrames and write them
+    as a summary_type summary (compressed as for open_output), counting
+    dropped_duplicate_count duplicates removed while reading the reports
+    """
+    # fix default output
+    out_fh = open_output(output_path, "w", compression, compression_level)
+
     # remove any duplicate entries in the parsed_report
     # set can't hash dictionaries unfortunately
     non_empty_reports = [report for report in combined_report_data if not report.empty]
@@ -738,7 +904,7 @@ def summarize_reports(report_paths, summary_type, output_path=None):
         combined_reports = pd.concat(non_empty_reports, ignore_index=True)
     else:
         combined_reports = pd.DataFrame(columns=combined_report_data[0].columns)
-    total_records = len(combined_reports)
+    total_records = len(combined_reports) + dropped_duplicate_count
     combined_reports = combined_reports.drop_duplicates()
 
     unique_records = len(combined_reports)
@@ -774,14 +940,18 @@ def summarize_reports(report_paths, summary_type, output_path=None):
     elif summary_type == "json":
         combined_reports.to_json(out_fh, orient="records")
 
+    elif summary_type == "ndjson":
+        combined_reports.to_json(out_fh, orient="records", lines=True)
+
     elif summary_type == "interactive":
         interactive_report = generate_interactive_report(combined_reports)
         out_fh.write(interactive_report)
 
     if output_path:
         print(
-            f"Written {report_count} reports with a combined "
+            f"Written {report_count} {unit} with a combined "
             f"{unique_records} unique results to {output_path}",
             file=sys.stderr,
         )
+    if out_fh is not sys.stdout:
         out_fh.close()
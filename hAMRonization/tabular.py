@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+
+import csv
+import itertools
+import operator
+
+
+def mapped_columns(*field_maps):
+    """
+    The report columns of field_maps that are mapped to a hAMRonization field
+    (the ones a parser has to read for its field map)
+    """
+    return [
+        column
+        for field_map in field_maps
+        for column, hAMRonized_field in field_map.items()
+        if hAMRonized_field
+    ]
+
+
+class TabularReader:
+    """
+    Reads the rows of a delimited report as dicts of just the selected
+    columns, like csv.DictReader but resolving the header to column indexes
+    once and never building the unselected (e.g., long sequence) fields
+
+    Lines are split on the delimiter directly, only lines with a quote
+    character are read with the csv module. As with csv.DictReader, blank
+    lines are skipped, columns missing from short rows are None and of
+    duplicated column names the last is read.
+
+    fieldnames is the header (or the given fieldnames if the report has no
+    header line) and None for an empty report.
+    """
+
+    def __init__(self, handle, columns=None, delimiter="\t", fieldnames=None):
+        self.lines = iter(handle)
+        self.delimiter = delimiter
+        self.fieldnames = fieldnames
+        if fieldnames is None:
+            for values in self._split_lines():
+                self.fieldnames = values
+                break
+        self.select(columns)
+
+    def select(self, columns=None):
+        """
+        Read only columns (names of the header, the ones it doesn't have are
+        left out of the rows) from now on, all of them if None
+        """
+        indexes = {name: index for index, name in enumerate(self.fieldnames or ())}
+        if columns is not None:
+            indexes = {
+                column: indexes[column] for column in dict.fromkeys(columns)
+                if column in indexes
+            }
+        self.columns = tuple(indexes)
+        self.width = max(indexes.values(), default=-1) + 1
+        if len(indexes) == 1:
+            getter = operator.itemgetter(*indexes.values())
+            self._getter = lambda values: (getter(values),)
+        elif indexes:
+            self._getter = operator.itemgetter(*indexes.values())
+        else:
+            self._getter = lambda values: ()
+
+    def _split_lines(self):
+        """
+        The fields of each non-blank line
+        """
+        delimiter = self.delimiter
+        lines = self.lines
+        for line in lines:
+            if '"' in line:
+                # quoted fields (possibly spanning lines) need the csv module
+                values = next(
+                    csv.reader(itertools.chain((line,), lines), delimiter=delimiter),
+                    [],
+                )
+                if values:
+                    yield values
+                continue
+            line = line.rstrip("\r\n")
+            if line:
+                yield line.split(delimiter)
+
+    def __iter__(self):
+        columns = self.columns
+        width = self.width
+        getter = self._getter
+        for values in self._split_lines():
+            if len(values) < width:
+                values += [None] * (width - len(values))
+            yield dict(zip(columns, getter(values)))
@@ -0,0 +1,855 @@
+#!/usr/bin/env python
+"""
+Micro-benchmarks for the hAMRonization internals
+
+These are not run by pytest, invoke them from the test directory e.g.:
+
+    python benchmark.py records
+
+Each benchmark prints its timings to stdout so that runs before and after
+a change can be compared.
+"""
+
+import os
+import sys
+import argparse
+import subprocess
+import dataclasses
+import time
+import tracemalloc
+
+import hAMRonization
+from hAMRonization.Interfaces import hAMRonizedResultIterator
+from hAMRonization.hAMRonizedResult import (
+    hAMRonizedResult,
+    hAMRonizedResultBatch,
+)
+
+
+def _time(func, repeat=5):
+    """Best wall-clock time in seconds of `repeat` calls to func"""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+
+def _record_kwargs():
+    """Constructor arguments for every record in the RGI and DeepARG corpus"""
+    reports = [
+        ("data/raw_outputs/rgi/rgi.txt", "rgi"),
+        ("data/raw_outputs/rgibwt/Kp11_bwtoutput.gene_mapping_data.txt", "rgi"),
+        ("data/raw_outputs/deeparg/output.mapping.potential.ARG", "deeparg"),
+    ]
+    kwargs = []
+    for path, tool in reports:
+        metadata = {
+            "analysis_software_version": "1.0",
+            "reference_database_version": "1.0",
+            "input_file_name": "benchmark.fasta",
+        }
+        parsed_report = hAMRonization.parse(path, metadata, tool)
+        for result in parsed_report:
+            kwargs.append(
+                {field: getattr(result, field) for field in _field_names()}
+            )
+    return kwargs
+
+
+def _field_names():
+    return [field.name for field in dataclasses.fields(hAMRonizedResult)]
+
+
+def bench_records(args):
+    """Per-record construction cost and per-instance memory"""
+    kwargs = _record_kwargs() * args.scale
+
+    # stringify the values as a parser would hand them over
+    raw_kwargs = [
+        {k: (str(v) if v is not None else None) for k, v in kw.items()}
+        for kw in kwargs
+    ]
+
+    def build():
+        for kw in raw_kwargs:
+            hAMRonizedResult(**kw)
+
+    elapsed = _time(build)
+    print(f"records: {len(raw_kwargs)}")
+    print(f"construct: {elapsed / len(raw_kwargs) * 1e6:.2f} us/record")
+
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    kept = [hAMRonizedResult(**kw) for kw in kwargs]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    # subtract the list holding the records
+    per_record = (after - before - kept.__sizeof__()) / len(kept)
+    print(f"memory: {per_record:.0f} bytes/record")
+
+
+# (path, tool, metadata) of the reports in the raw_outputs corpus
+_CORPUS_METADATA = {
+    "analysis_software_version": "1.0",
+    "reference_database_version": "1.0",
+    "reference_database_name": "db",
+    "input_file_name": "benchmark",
+}
+CORPUS = [
+    ("data/raw_outputs/abricate/report.tsv", "abricate"),
+    ("data/raw_outputs/amrfinderplus/report_nucleotide.tsv", "amrfinderplus"),
+    ("data/raw_outputs/amrfinderplus/report_protein.tsv", "amrfinderplus"),
+    ("data/raw_outputs/amrplusplus/gene.tsv", "amrplusplus"),
+    ("data/raw_outputs/ariba/report.tsv", "ariba"),
+    ("data/raw_outputs/deeparg/output.mapping.potential.ARG", "deeparg"),
+    ("data/raw_outputs/fargene/retrieved-genes-class_A-hmmsearched.out", "fargene"),
+    ("data/raw_outputs/groot/report.tsv", "groot"),
+    ("data/raw_outputs/kmerresistance/results.res", "kmerresistance"),
+    ("data/raw_outputs/resfams/resfams.tblout", "resfams"),
+    ("data/raw_outputs/resfinder/data_resfinder.json", "resfinder"),
+    ("data/raw_outputs/rgi/rgi.txt", "rgi"),
+    ("data/raw_outputs/rgibwt/Kp11_bwtoutput.gene_mapping_data.txt", "rgi"),
+    ("data/raw_outputs/srax/sraX_detected_ARGs.tsv", "srax"),
+    ("data/raw_outputs/srst2/SAMN13064234_srst2_report.tsv", "srst2"),
+    ("data/raw_outputs/sstar/report.tsv", "csstar"),
+    ("data/raw_outputs/staramr/resfinder.tsv", "staramr"),
+    ("data/raw_outputs/staramr/pointfinder.tsv", "staramr"),
+    ("data/raw_outputs/tbprofiler/tbprofiler.json", "tbprofiler"),
+]
+
+
+def _parse_corpus(**kwargs):
+    count = 0
+    for path, tool in CORPUS:
+        for _ in hAMRonization.parse(path, dict(_CORPUS_METADATA), tool, **kwargs):
+            count += 1
+    return count
+
+
+def bench_corpus(args):
+    """Per-row cost of hAMRonizing the whole raw_outputs corpus"""
+    rows = _parse_corpus()
+    elapsed = _time(_parse_corpus, repeat=args.repeat)
+    print(f"rows: {rows}")
+    print(f"parse: {elapsed * 1e3:.1f} ms ({elapsed / rows * 1e6:.2f} us/row)")
+
+
+def bench_shared(args):
+    """Memory and batching cost of results with shared metadata blocks"""
+    reports = [
+        (path, tool) for path, tool in CORPUS
+        if tool in ("rgi", "deeparg", "resfams")
+    ]
+    for shared_metadata in (False, True):
+        tracemalloc.start()
+        kept = []
+        start = time.perf_counter()
+        for _ in range(args.scale):
+            for path, tool in reports:
+                kept.append(list(hAMRonization.parse(
+                    path, dict(_CORPUS_METADATA), tool,
+                    shared_metadata=shared_metadata,
+                )))
+        parse_time = time.perf_counter() - start
+        memory = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        count = sum(len(results) for results in kept)
+
+        # batches never span reports (as with iter_batches)
+        start = time.perf_counter()
+        for results in kept:
+            for offset in range(0, len(results), 1024):
+                hAMRonizedResultBatch.from_results(results[offset:offset + 1024])
+        batch_time = time.perf_counter() - start
+
+        print(f"shared_metadata={shared_metadata}: {count} records, "
+              f"{memory / count:.0f} bytes/record, "
+              f"parse {parse_time / count * 1e6:.2f} us/record, "
+              f"batch {batch_time / count * 1e6:.2f} us/record")
+        del kept
+
+
+class _Replay(hAMRonizedResultIterator):
+    """Iterator over already hAMRonized results (to time just the writer)"""
+
+    def __init__(self, results):
+        self._results = iter(results)
+
+    def __next__(self):
+        return next(self._results)
+
+    def parse(self, handle):
+        pass
+
+
+def bench_write(args):
+    """Writer throughput on scaled-up RGI and DeepARG reports"""
+    for path in (
+        "data/raw_outputs/rgibwt/Kp11_bwtoutput.gene_mapping_data.txt",
+        "data/raw_outputs/deeparg/output.mapping.potential.ARG",
+    ):
+        tool = "rgi" if "rgi" in path else "deeparg"
+        results = list(hAMRonization.parse(path, dict(_CORPUS_METADATA), tool))
+        results = results * (args.rows // len(results) + 1)
+        results = results[:args.rows]
+
+        def write():
+            _Replay(results).write(
+                output_location=args.output, output_format=args.format,
+                **({"typed_json": True} if args.typed else {}),
+            )
+
+        elapsed = _time(write, repeat=3)
+        size = os.path.getsize(args.output)
+        print(f"{tool} {args.format}: {len(results)} rows, {size / 1e6:.1f} MB "
+              f"in {elapsed:.2f} s ({size / 1e6 / elapsed:.1f} MB/s, "
+              f"{len(results) / elapsed / 1e3:.0f}k rows/s)")
+    os.remove(args.output)
+
+
+def bench_compress(args):
+    """Bytes written versus wall time of each output compression"""
+    path = "data/raw_outputs/deeparg/output.mapping.potential.ARG"
+    results = list(hAMRonization.parse(path, dict(_CORPUS_METADATA), "deeparg"))
+    results = results * (args.rows // len(results) + 1)
+    results = results[:args.rows]
+
+    settings = [(None, None)]
+    for compression in ("gzip", "bzip2", "xz"):
+        for level in args.levels:
+            settings.append((compression, level))
+    for compression, level in settings:
+        def write():
+            _Replay(results).write(
+                output_location=args.output, output_format=args.format,
+                compression=compression, compression_level=level,
+            )
+
+        elapsed = _time(write, repeat=3)
+        size = os.path.getsize(args.output)
+        label = f"{compression} -{level}" if compression else "uncompressed"
+        print(f"{label:<14} {args.format}: {size / 1e6:8.2f} MB "
+              f"in {elapsed:.2f} s ({len(results) / elapsed / 1e3:.0f}k rows/s)")
+    os.remove(args.output)
+
+
+def bench_jobs(args):
+    """Wall time of writing many reports to one output with N worker processes"""
+    import hAMRonization.parallel
+    from hAMRonization.Interfaces import hAMRonizedResultWriter
+
+    reports = [
+        "data/raw_outputs/deeparg/output.mapping.potential.ARG"
+    ] * args.reports
+    for jobs in args.jobs:
+        jobs = jobs or hAMRonization.parallel.available_cpu_count()
+
+        def write():
+            writer = hAMRonizedResultWriter(args.output, args.format)
+            if jobs == 1:
+                for report in reports:
+                    writer.write_report(hAMRonization.parse(
+                        report, dict(_CORPUS_METADATA), "deeparg"
+                    ))
+            else:
+                for rendered in hAMRonization.parallel.render_reports(
+                    reports, _CORPUS_METADATA, "deeparg", args.format, jobs=jobs
+                ):
+                    writer.write_rendered(rendered)
+            writer.close()
+
+        elapsed = _time(write, repeat=3)
+        print(f"jobs={jobs}: {len(reports)} reports in {elapsed:.2f} s")
+    os.remove(args.output)
+
+
+def bench_cache(args):
+    """Parsing versus ResultCache hits for the corpus and a scaled-up report"""
+    import shutil
+    import tempfile
+    from hAMRonization.cache import ResultCache
+
+    directory = tempfile.mkdtemp()
+    scaled_report = os.path.join(directory, "scaled.ARG")
+    with open("data/raw_outputs/deeparg/output.mapping.potential.ARG") as fh:
+        header, *lines = fh.readlines()
+    with open(scaled_report, "w") as fh:
+        fh.write(header)
+        fh.writelines((lines * (args.rows // len(lines) + 1))[:args.rows])
+
+    try:
+        for name, reports in (
+            ("corpus", CORPUS),
+            (f"deeparg x{args.rows}", [(scaled_report, "deeparg")]),
+        ):
+            cache = ResultCache(os.path.join(directory, "cache"))
+
+            def parse():
+                for path, tool in reports:
+                    for _ in hAMRonization.parse(
+                        path, dict(_CORPUS_METADATA), tool
+                    ).iter_batches():
+                        pass
+
+            def cached():
+                for path, tool in reports:
+                    for _ in cache.batches(path, _CORPUS_METADATA, tool):
+                        pass
+
+            parse_elapsed = _time(parse, repeat=3)
+            cached()
+            hit_elapsed = _time(cached, repeat=3)
+            count, size = cache.stats()
+            print(f"{name}: parse {parse_elapsed * 1e3:.1f} ms, hit "
+                  f"{hit_elapsed * 1e3:.1f} ms ({count} entries, "
+                  f"{size / 1e3:.0f} kB)")
+            cache.prune(0)
+    finally:
+        shutil.rmtree(directory)
+
+
+def bench_serve(args):
+    """Small conversions per minute: one CLI process each versus a server"""
+    import threading
+    import tempfile
+    from hAMRonization import server
+
+    report = "data/raw_outputs/abricate/report.tsv"
+    metadata = {"analysis_software_version": "1.0", "reference_database_version": "1.0"}
+    command = [
+        sys.executable, "-m", "hAMRonization.hamronize", "abricate", report,
+        "--analysis_software_version", "1.0", "--reference_database_version", "1.0",
+    ]
+    start = time.perf_counter()
+    for _ in range(args.requests):
+        subprocess.run(command, check=True, stdout=subprocess.DEVNULL)
+    elapsed = time.perf_counter() - start
+    print(f"cli: {args.requests / elapsed * 60:.0f} conversions/min")
+
+    socket_path = os.path.join(tempfile.mkdtemp(), "hamronize.sock")
+    conversion_server = server.create_server(socket_path)
+    threading.Thread(target=conversion_server.serve_forever, daemon=True).start()
+    try:
+        start = time.perf_counter()
+        for _ in range(args.requests):
+            server.request_conversion(socket_path, "abricate", [report], metadata)
+        elapsed = time.perf_counter() - start
+        print(f"server: {args.requests / elapsed * 60:.0f} conversions/min")
+    finally:
+        conversion_server.shutdown()
+        conversion_server.close()
+        os.rmdir(os.path.dirname(socket_path))
+
+
+def _scaled_resfinder_report(path, scale):
+    """
+    Write a data_resfinder.json with scale copies of every seq_region and
+    seq_variation of the test report (the phenotypes, i.e. antimicrobials,
+    stay the same but reference all copies)
+    """
+    import json
+
+    with open("data/raw_outputs/resfinder/data_resfinder.json") as fh:
+        data = json.load(fh)
+
+    def copies(objects, key_fields):
+        scaled = {}
+        for copy in range(scale):
+            for key, obj in objects.items():
+                obj = dict(obj, key=f"{obj['key']}#{copy}")
+                for field in key_fields:
+                    obj[field] = [f"{ref}#{copy}" for ref in obj.get(field, [])]
+                scaled[f"{key}#{copy}"] = obj
+        return scaled
+
+    regions, variations = data["seq_regions"], data["seq_variations"]
+    data["seq_regions"] = copies(regions, ["seq_variations"])
+    data["seq_variations"] = copies(variations, ["seq_regions"])
+    for phenotype in data["phenotypes"].values():
+        for field in ("seq_regions", "seq_variations"):
+            phenotype[field] = [
+                f"{ref}#{copy}" for copy in range(scale) for ref in phenotype[field]
+            ]
+    with open(path, "w") as fh:
+        json.dump(data, fh)
+    return len(data["seq_regions"]), len(data["seq_variations"]), len(data["phenotypes"])
+
+
+def bench_resfinder(args):
+    """ResFinder parse time on a synthetic report with scaled-up regions/variations"""
+    import tempfile
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "data_resfinder.json")
+        for scale in args.scales:
+            regions, variations, phenotypes = _scaled_resfinder_report(path, scale)
+
+            def parse():
+                return sum(1 for _ in hAMRonization.parse(path, {}, "resfinder"))
+
+            rows = parse()
+            elapsed = _time(parse, repeat=3)
+            print(f"{regions} regions, {variations} variations, {phenotypes} "
+                  f"phenotypes: {rows} rows in {elapsed * 1e3:.1f} ms")
+
+
+def bench_json(args):
+    """Peak memory (at a small time cost) of load_selected versus json.load on a TB-Profiler report with large sections"""
+    import json
+    import tempfile
+    from hAMRonization.jsonstream import load_selected
+    from hAMRonization.TBProfilerIO import JSON_SELECTION
+
+    with open("data/raw_outputs/tbprofiler/tbprofiler.json") as fh:
+        data = json.load(fh)
+    data["other_variants"] = data["other_variants"] * args.scale
+    data["qc"]["gene_coverage"] = data["qc"]["gene_coverage"] * args.scale
+
+    with tempfile.NamedTemporaryFile("w", suffix=".json") as report:
+        json.dump(data, report)
+        report.flush()
+        print(f"report: {os.path.getsize(report.name) / 1e6:.1f} MB")
+        for name, load in (
+            ("json.load", json.load),
+            ("load_selected", lambda fh: load_selected(fh, JSON_SELECTION)),
+        ):
+            def run():
+                with open(report.name) as fh:
+                    return load(fh)
+
+            elapsed = _time(run, repeat=3)
+            tracemalloc.start()
+            run()
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            print(f"{name}: {elapsed * 1e3:.1f} ms, peak {peak / 1e6:.1f} MB")
+
+
+def bench_tsv(args):
+    """csv.DictReader versus TabularReader and the parse time on a scaled-up RGI report"""
+    import csv
+    import tempfile
+    from hAMRonization.tabular import TabularReader, mapped_columns
+    from hAMRonization.RgiIO import RgiIterator
+
+    with open("data/raw_outputs/rgi/rgi.txt") as fh:
+        header, *rows = fh.readlines()
+    columns = mapped_columns(RgiIterator("data/raw_outputs/rgi/rgi.txt", {}).field_mapping)
+
+    with tempfile.NamedTemporaryFile("w", suffix=".txt") as report:
+        report.write(header)
+        for _ in range(args.scale):
+            report.writelines(rows)
+        report.flush()
+        print(f"report: {len(rows) * args.scale} rows, "
+              f"{os.path.getsize(report.name) / 1e6:.1f} MB")
+        readers = {
+            "csv.DictReader": lambda fh: csv.DictReader(fh, delimiter="\t"),
+            "TabularReader": lambda fh: TabularReader(fh, columns=columns),
+        }
+        for name, reader in readers.items():
+            def run():
+                with open(report.name) as fh:
+                    return sum(1 for _ in reader(fh))
+
+            print(f"{name}: {_time(run, repeat=3) * 1e3:.0f} ms")
+
+        metadata = {
+            "analysis_software_version": "6.0.0",
+            "reference_database_version": "3.2.6",
+            "input_file_name": "rgi.txt",
+        }
+
+        def parse():
+            return sum(1 for _ in hAMRonization.parse(report.name, dict(metadata), "rgi"))
+
+        print(f"hAMRonization.parse: {_time(parse, repeat=3) * 1e3:.0f} ms")
+
+
+def bench_hmmer(args):
+    """ResFams parse time on a scaled-up tblout, without and with E-value thresholds"""
+    import tempfile
+
+    with open("data/raw_outputs/resfams/resfams.tblout") as fh:
+        lines = fh.readlines()
+    comments = [line for line in lines if line.startswith("#")]
+    hits = [line for line in lines if not line.startswith("#")]
+    metadata = {
+        "analysis_software_version": "1.2",
+        "reference_database_version": "1.2",
+        "input_file_name": "sample1",
+    }
+
+    with tempfile.NamedTemporaryFile("w", suffix=".tblout") as report:
+        report.writelines(comments)
+        for _ in range(args.scale):
+            report.writelines(hits)
+        report.flush()
+        print(f"report: {len(hits) * args.scale} hits, "
+              f"{os.path.getsize(report.name) / 1e6:.1f} MB")
+        for options in ({}, {"max_evalue": 1e-10}, {"max_evalue": 1e-30}):
+            def parse():
+                return sum(
+                    1 for _ in hAMRonization.parse(
+                        report.name, dict(metadata), "resfams", **options
+                    )
+                )
+
+            rows = parse()
+            elapsed = _time(parse, repeat=3)
+            print(f"{options or 'no thresholds'}: {rows} rows in {elapsed * 1e3:.0f} ms")
+
+
+def bench_deeparg(args):
+    """DeepARG per read versus per gene results: parse and tsv output time and size"""
+    import io
+    import tempfile
+    from hAMRonization.Interfaces import hAMRonizedResultWriter
+
+    with open("data/raw_outputs/deeparg/output.mapping.potential.ARG") as fh:
+        header, *rows = fh.readlines()
+    metadata = {
+        "analysis_software_version": "1.0.1",
+        "reference_database_version": "2",
+        "input_file_name": "sample1",
+    }
+
+    with tempfile.NamedTemporaryFile("w", suffix=".ARG") as report:
+        report.write(header)
+        for _ in range(args.scale):
+            report.writelines(rows)
+        report.flush()
+        print(f"report: {len(rows) * args.scale} rows")
+        for aggregate in ("read", "gene"):
+            def convert():
+                output = io.StringIO()
+                writer = hAMRonizedResultWriter(output, "tsv")
+                writer.write_batches(
+                    hAMRonization.parse(
+                        report.name, dict(metadata), "deeparg", aggregate=aggregate
+                    ).iter_batches()
+                )
+                writer.close()
+                return output.getvalue()
+
+            size = len(convert())
+            elapsed = _time(convert, repeat=3)
+            print(f"{aggregate}: {elapsed * 1e3:.0f} ms, {size / 1e3:.0f} kB of tsv")
+
+
+def bench_mutations(args):
+    """Inline re.split HGVS formatting versus hAMRonization.mutations on distinct (cold caches) and repeated mutations"""
+    import re
+    import csv
+    from hAMRonization import mutations
+
+    def shifted(mutation, offset):
+        # the same substitution at another position, so every copy is distinct
+        ref, pos, alt = mutations.split_substitution(mutation)
+        return f"{ref}{int(pos) + offset}{alt}"
+
+    with open("data/raw_outputs/amrfinderplus/report_nucleotide.tsv") as fh:
+        afp_rows = [
+            (row["Element symbol"].rsplit("_", 1)[1], row["Method"])
+            for row in csv.DictReader(fh, delimiter="\t")
+            if row["Subtype"] == "POINT" and "-" not in row["Element symbol"]
+        ]
+    with open("data/raw_outputs/rgi/rgi.txt") as fh:
+        rgi_rows = [
+            row["SNPs_in_Best_Hit_ARO"]
+            for row in csv.DictReader(fh, delimiter="\t")
+            if row["SNPs_in_Best_Hit_ARO"] != "n/a"
+        ]
+    afp = [
+        (shifted(mutation, 10000 * copy), method)
+        for copy in range(args.scale) for mutation, method in afp_rows
+    ]
+    rgi = [
+        ",".join(shifted(mutation, 10000 * copy) for mutation in snps.split(","))
+        for copy in range(args.scale) for snps in rgi_rows
+    ]
+    print(f"{len(afp)} distinct AFP POINT mutations, {len(rgi)} distinct RGI SNP lists")
+
+    def inline():
+        for mutation, method in afp:
+            _, ref, pos, alt, _ = re.split(r"(\D+)(\d+)(\D+)", mutation)
+            if method in ["POINTX", "POINTP"]:
+                f"p.{ref}{pos}{alt}"
+            else:
+                f"c.{pos}{ref}>{alt}"
+        for snps in rgi:
+            ",".join(f"p.{mutation}" for mutation in snps.split(","))
+            hgvs_mutations = []
+            for mutation in snps.split(","):
+                _, ref, pos, alt, _ = re.split(r"(\D+)(\d+)(\D+)", mutation)
+                hgvs_mutations.append(f"n.{pos}{ref}>{alt}")
+            ",".join(hgvs_mutations)
+
+    def module():
+        for mutation, method in afp:
+            if method in ["POINTX", "POINTP"]:
+                mutations.protein_substitution(mutation)
+            else:
+                mutations.nucleotide_substitution(mutation, "c.")
+        for snps in rgi:
+            mutations.protein_mutations(snps)
+            mutations.nucleotide_mutations(snps)
+
+    def cold_module():
+        for function in (
+            mutations.split_substitution, mutations.protein_substitution,
+            mutations.nucleotide_substitution, mutations.protein_mutations,
+            mutations.nucleotide_mutations,
+        ):
+            function.cache_clear()
+        module()
+
+    print(f"inline re.split: {_time(inline) * 1e3:.1f} ms")
+    print(f"hAMRonization.mutations, cold caches: {_time(cold_module) * 1e3:.1f} ms")
+    module()
+    print(f"hAMRonization.mutations, warm caches: {_time(module) * 1e3:.1f} ms")
+
+
+def bench_mykrobe(args):
+    """Where the time of converting a multi-sample Mykrobe report goes, versus what per-sample workers would cost"""
+    import io
+    import json
+    import pickle
+    from hAMRonization.jsonstream import iter_selected_members
+    from hAMRonization.MykrobeIO import JSON_SELECTION
+
+    with open("data/dummy/mykrobe/mykrobe.json") as fh:
+        (sample,) = json.load(fh).values()
+    text = json.dumps({f"sample{i}": sample for i in range(args.samples)}, indent=4)
+    print(f"plate: {args.samples} samples, {len(text) / 1e6:.1f} MB")
+
+    def find_samples():
+        # the least the reading process has to do to hand samples to workers
+        for _ in iter_selected_members(io.StringIO(text), {}):
+            pass
+
+    def decode_samples():
+        return list(iter_selected_members(io.StringIO(text), JSON_SELECTION))
+
+    def convert():
+        return list(hAMRonization.parse(
+            io.StringIO(text), {}, "mykrobe", input_file_names="sample"
+        ))
+
+    samples = decode_samples()
+    results = convert()
+    timings = {
+        "find sample ends": _time(find_samples),
+        "decode selected parts": _time(decode_samples),
+        "convert (decode + records)": _time(convert),
+        "send samples to workers (pickle)": _time(
+            lambda: pickle.loads(pickle.dumps(samples))
+        ),
+        "send results back (pickle)": _time(
+            lambda: pickle.loads(pickle.dumps(results))
+        ),
+    }
+    for name, elapsed in timings.items():
+        print(f"{name}: {elapsed * 1e3:.0f} ms")
+    records = timings["convert (decode + records)"] - timings["decode selected parts"]
+    print(f"records (the part workers could share): {records * 1e3:.0f} ms")
+
+
+def bench_startup(args):
+    """Wall time of fresh interpreters importing hAMRonization / running the CLI"""
+    commands = {
+        "import hAMRonization": [sys.executable, "-c", "import hAMRonization"],
+        "hamronize --help": [
+            sys.executable, "-m", "hAMRonization.hamronize", "--help"
+        ],
+        "hamronize abricate": [
+            sys.executable, "-m", "hAMRonization.hamronize", "abricate",
+            "data/raw_outputs/abricate/report.tsv",
+            "--analysis_software_version", "1.0",
+            "--reference_database_version", "1.0",
+        ],
+    }
+    for name, command in commands.items():
+        def run():
+            subprocess.run(command, check=True, stdout=subprocess.DEVNULL)
+
+        elapsed = _time(run, repeat=args.repeat)
+        print(f"{name}: {elapsed * 1e3:.0f} ms")
+
+
+def bench_tbprofiler(args):
+    """A cohort of TB-Profiler reports: one hamronize run per report versus one run over their directory"""
+    import shutil
+    import tempfile
+
+    hamronize = [sys.executable, "-m", "hAMRonization.hamronize", "tbprofiler"]
+    with tempfile.TemporaryDirectory() as directory:
+        for sample in range(args.samples):
+            shutil.copy(
+                "data/raw_outputs/tbprofiler/tbprofiler.json",
+                os.path.join(directory, f"sample{sample}.results.json"),
+            )
+        reports = sorted(os.listdir(directory))
+        print(f"cohort: {len(reports)} reports")
+
+        def per_report():
+            for report in reports:
+                subprocess.run(
+                    [*hamronize, os.path.join(directory, report)],
+                    check=True, stdout=subprocess.DEVNULL,
+                )
+
+        def directory_pass():
+            subprocess.run(
+                [*hamronize, directory], check=True, stdout=subprocess.DEVNULL
+            )
+
+        for name, run in (("per report", per_report), ("directory", directory_pass)):
+            print(f"{name}: {_time(run, repeat=1) * 1e3:.0f} ms")
+
+
+def bench_ndjson(args):
+    """Peak memory of reading an ndjson report with duplicate records for summarize, keeping all records or the unique ones"""
+    import tempfile
+    import pandas as pd
+    from hAMRonization import summarize
+
+    with tempfile.NamedTemporaryFile("w", suffix=".ndjson") as report:
+        writer = hAMRonization.Interfaces.hAMRonizedResultWriter(report, "ndjson")
+        # each sample hAMRonized several times (e.g., reruns appended)
+        for _ in range(args.copies):
+            for sample in range(args.samples):
+                writer.write_report(hAMRonization.parse(
+                    "data/raw_outputs/rgi/rgi.txt",
+                    {
+                        "analysis_software_version": "5.2.0",
+                        "reference_database_version": "3.2.5",
+                        "input_file_name": f"sample{sample}",
+                    },
+                    "rgi",
+                ))
+        report.flush()
+        print(f"report: {os.path.getsize(report.name) / 1e6:.1f} MB")
+
+        def all_records():
+            with open(report.name) as fh:
+                return pd.concat([
+                    summarize._numeric_columns(chunk)
+                    for chunk in pd.read_json(
+                        fh, lines=True, chunksize=chunk_size, dtype=False
+                    )
+                ])
+
+        def unique_records():
+            with open(report.name) as fh:
+                return summarize._read_ndjson_report(fh)[0]
+
+        for chunk_size in args.chunk_sizes:
+            summarize.NDJSON_CHUNK_SIZE = chunk_size
+            for name, read in (("all records", all_records), ("unique records", unique_records)):
+                elapsed = _time(read, repeat=1)
+                tracemalloc.start()
+                records = read()
+                peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+                print(f"chunks of {chunk_size}, {name}: {len(records)} records, "
+                      f"{elapsed * 1e3:.0f} ms, peak {peak / 1e6:.1f} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+
+    records = subparsers.add_parser("records", help=bench_records.__doc__)
+    records.add_argument("--scale", type=int, default=50)
+    records.set_defaults(func=bench_records)
+
+    corpus = subparsers.add_parser("corpus", help=bench_corpus.__doc__)
+    corpus.add_argument("--repeat", type=int, default=10)
+    corpus.set_defaults(func=bench_corpus)
+
+    shared = subparsers.add_parser("shared", help=bench_shared.__doc__)
+    shared.add_argument("--scale", type=int, default=20)
+    shared.set_defaults(func=bench_shared)
+
+    write = subparsers.add_parser("write", help=bench_write.__doc__)
+    write.add_argument("--format", default="json")
+    write.add_argument("--rows", type=int, default=200000)
+    write.add_argument("--typed", action="store_true")
+    write.add_argument("--output", default="benchmark_output")
+    write.set_defaults(func=bench_write)
+
+    compress = subparsers.add_parser("compress", help=bench_compress.__doc__)
+    compress.add_argument("--format", default="tsv")
+    compress.add_argument("--rows", type=int, default=200000)
+    compress.add_argument("--levels", type=int, nargs="+", default=[1, 6, 9])
+    compress.add_argument("--output", default="benchmark_output")
+    compress.set_defaults(func=bench_compress)
+
+    jobs = subparsers.add_parser("jobs", help=bench_jobs.__doc__)
+    jobs.add_argument("--format", default="tsv")
+    jobs.add_argument("--reports", type=int, default=40)
+    jobs.add_argument("--jobs", type=int, nargs="+", default=[1, 2, 0])
+    jobs.add_argument("--output", default="benchmark_output")
+    jobs.set_defaults(func=bench_jobs)
+
+    cache = subparsers.add_parser("cache", help=bench_cache.__doc__)
+    cache.add_argument("--rows", type=int, default=100000)
+    cache.set_defaults(func=bench_cache)
+
+    serve = subparsers.add_parser("serve", help=bench_serve.__doc__)
+    serve.add_argument("--requests", type=int, default=200)
+    serve.set_defaults(func=bench_serve)
+
+    resfinder = subparsers.add_parser("resfinder", help=bench_resfinder.__doc__)
+    resfinder.add_argument("--scales", type=int, nargs="+", default=[1, 10, 100])
+    resfinder.set_defaults(func=bench_resfinder)
+
+    json_parser = subparsers.add_parser("json", help=bench_json.__doc__)
+    json_parser.add_argument("--scale", type=int, default=2000)
+    json_parser.set_defaults(func=bench_json)
+
+    tsv = subparsers.add_parser("tsv", help=bench_tsv.__doc__)
+    tsv.add_argument("--scale", type=int, default=5000)
+    tsv.set_defaults(func=bench_tsv)
+
+    hmmer = subparsers.add_parser("hmmer", help=bench_hmmer.__doc__)
+    hmmer.add_argument("--scale", type=int, default=50)
+    hmmer.set_defaults(func=bench_hmmer)
+
+    deeparg = subparsers.add_parser("deeparg", help=bench_deeparg.__doc__)
+    deeparg.add_argument("--scale", type=int, default=20)
+    deeparg.set_defaults(func=bench_deeparg)
+
+    mutations = subparsers.add_parser("mutations", help=bench_mutations.__doc__)
+    mutations.add_argument("--scale", type=int, default=200)
+    mutations.set_defaults(func=bench_mutations)
+
+    tbprofiler = subparsers.add_parser("tbprofiler", help=bench_tbprofiler.__doc__)
+    tbprofiler.add_argument("--samples", type=int, default=100)
+    tbprofiler.set_defaults(func=bench_tbprofiler)
+
+    mykrobe = subparsers.add_parser("mykrobe", help=bench_mykrobe.__doc__)
+    mykrobe.add_argument("--samples", type=int, default=2000)
+    mykrobe.set_defaults(func=bench_mykrobe)
+
+    ndjson = subparsers.add_parser("ndjson", help=bench_ndjson.__doc__)
+    ndjson.add_argument("--samples", type=int, default=500)
+    ndjson.add_argument("--copies", type=int, default=4)
+    ndjson.add_argument("--chunk_sizes", type=int, nargs="+", default=[10000, 2000])
+    ndjson.set_defaults(func=bench_ndjson)
+
+    startup = subparsers.add_parser("startup", help=bench_startup.__doc__)
+    startup.add_argument("--repeat", type=int, default=20)
+    startup.set_defaults(func=bench_startup)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,23 @@
 import pytest
+import bz2
+import gzip
+import lzma
+import io
 import json
+import logging
 import os
+import sys
 import csv
+import subprocess
+import dataclasses
 from contextlib import contextmanager
 import hAMRonization
+from hAMRonization.hAMRonizedResult import (
+    hAMRonizedLazyResult,
+    hAMRonizedResultBatch,
+)
 from hAMRonization.summarize import summarize_reports
+from hAMRonization.streams import open_source
 
 
 @contextmanager
@@ -132,3 +145,1191 @@ def test_summarize_empty_reports():
 
     for report in reports_order_1:
         os.remove(report)
+
+
+def test_iter_batches():
+    """
+    Batches should hold the same values as the per-result iterator, with
+    typed arrays for the numeric fields, and be summarizable directly
+    """
+    from hAMRonization.summarize import summarize_batches
+
+    metadata = {
+        "analysis_software_version": "5.2.0",
+        "reference_database_version": "3.2.5",
+        "input_file_name": "rgi_report",
+    }
+    expected = list(
+        hAMRonization.parse("data/raw_outputs/rgi/rgi.txt", dict(metadata), "rgi")
+    )
+    batches = list(
+        hAMRonization.parse(
+            "data/raw_outputs/rgi/rgi.txt", dict(metadata), "rgi"
+        ).iter_batches(size=3)
+    )
+    assert [len(batch) for batch in batches] == [3, 3, 3, 1]
+
+    assert batches[0].columns["sequence_identity"].typecode == "d"
+    assert batches[0].columns["input_gene_start"].typecode == "q"
+    assert isinstance(batches[0].columns["gene_symbol"], list)
+
+    for field in ["gene_symbol", "sequence_identity", "input_gene_start"]:
+        column = [value for batch in batches for value in batch.column(field)]
+        assert column == [getattr(result, field) or None for result in expected]
+
+    # empty numeric values are reported as missing
+    assert batches[0].missing["reference_gene_start"] == bytearray([1, 1, 1])
+    assert batches[0].column("reference_gene_start") == [None, None, None]
+
+    summarize_batches(batches, "tsv", "summarize_batches.tsv")
+    with open("summarize_batches.tsv") as fh:
+        assert len(fh.readlines()) == len(expected) + 1
+    os.remove("summarize_batches.tsv")
+
+
+@pytest.mark.parametrize(
+    "tool,report",
+    [
+        ("rgi", "data/raw_outputs/rgi/rgi.txt"),
+        ("deeparg", "data/raw_outputs/deeparg/output.mapping.potential.ARG"),
+    ],
+)
+def test_iter_batches_from_rows(monkeypatch, tool, report):
+    """
+    Batches should be filled straight from the projected rows, without a
+    result object per entry, and match batches built from the results
+    """
+    metadata = {
+        "analysis_software_version": "1.0",
+        "reference_database_version": "1.0",
+        "input_file_name": "report",
+    }
+    expected = hAMRonizedResultBatch.from_results(
+        list(hAMRonization.parse(report, dict(metadata), tool))
+    )
+
+    def no_result(*args, **kwargs):
+        raise AssertionError("a result object was created")
+
+    monkeypatch.setattr(hAMRonization.Interfaces, "hAMRonizedResult", no_result)
+    batches = list(
+        hAMRonization.parse(report, dict(metadata), tool).iter_batches(
+            size=len(expected)
+        )
+    )
+    assert len(batches) == 1
+    assert batches[0].columns == expected.columns
+    assert batches[0].missing == expected.missing
+
+
+def test_lazy_results():
+    """
+    Lazy results should only map and coerce the fields that are read, and
+    agree with the eagerly hAMRonized results
+    """
+    metadata = {
+        "analysis_software_version": "5.2.0",
+        "reference_database_version": "3.2.5",
+        "input_file_name": "rgi_report",
+    }
+    eager = list(
+        hAMRonization.parse("data/raw_outputs/rgi/rgi.txt", dict(metadata), "rgi")
+    )
+    lazy = list(
+        hAMRonization.parse(
+            "data/raw_outputs/rgi/rgi.txt", dict(metadata), "rgi", lazy=True
+        )
+    )
+    assert len(lazy) == len(eager)
+
+    result = lazy[0]
+    assert result.gene_symbol == eager[0].gene_symbol
+    assert result.sequence_identity == eager[0].sequence_identity
+    assert isinstance(result.sequence_identity, float)
+    assert set(result._cache) == {"gene_symbol", "sequence_identity"}
+
+    for lazy_result, eager_result in zip(lazy, eager):
+        lazy_result.validate()
+        assert [lazy_result._cache[f.name] for f in dataclasses.fields(eager_result)] \
+            == list(dataclasses.astuple(eager_result))
+
+    # invalid values only raise when they are read
+    result = hAMRonizedLazyResult(
+        {"start": "ten"}, metadata, {"input_gene_start": "start"}
+    )
+    assert result.input_file_name == "rgi_report"
+    with pytest.raises(ValueError):
+        result.input_gene_start
+
+
+def test_shared_metadata_results():
+    """
+    Results with shared metadata blocks should read the same as the default
+    results and reports with the same metadata should share one block
+    """
+    metadata = {
+        "analysis_software_version": "5.2.0",
+        "reference_database_version": "3.2.5",
+        "input_file_name": "rgi_report",
+    }
+    eager = list(
+        hAMRonization.parse("data/raw_outputs/rgi/rgi.txt", dict(metadata), "rgi")
+    )
+    shared = list(
+        hAMRonization.parse(
+            "data/raw_outputs/rgi/rgi.txt", dict(metadata), "rgi",
+            shared_metadata=True,
+        )
+    )
+    shared_again = list(
+        hAMRonization.parse(
+            "data/raw_outputs/rgi/rgi.txt", dict(metadata), "rgi",
+            shared_metadata=True,
+        )
+    )
+    for shared_result, eager_result in zip(shared, eager):
+        for field in dataclasses.fields(eager_result):
+            assert getattr(shared_result, field.name) == getattr(
+                eager_result, field.name
+            )
+
+    block = shared[0]._block
+    assert all(result._block is block for result in shared + shared_again)
+    assert block.fixed["analysis_software_name"] == "rgi"
+    with pytest.raises(AttributeError):
+        block.fixed = {}
+
+    batch = hAMRonizedResultBatch.from_results(shared)
+    assert batch.column("reference_database_version") == ["3.2.5"] * len(shared)
+    assert batch.column("gene_symbol") == [result.gene_symbol for result in eager]
+
+
+def test_shared_metadata_results_copy_and_pickle():
+    """
+    Results with shared metadata blocks can be copied and pickled, their
+    copies pointing at the interned block and keeping every field as is
+    """
+    import copy
+    import pickle
+
+    metadata = {
+        "analysis_software_version": "5.2.0",
+        "reference_database_version": "3.2.5",
+        "input_file_name": "rgi_report.fasta.fa",
+    }
+    shared = list(
+        hAMRonization.parse(
+            "data/raw_outputs/rgi/rgi.txt", dict(metadata), "rgi",
+            shared_metadata=True,
+        )
+    )
+    assert shared[0].input_file_name == "rgi_report.fasta"
+    with pytest.raises(AttributeError):
+        shared[0].__setstate__
+
+    for copied in (
+        [copy.copy(result) for result in shared],
+        copy.deepcopy(shared),
+        pickle.loads(pickle.dumps(shared)),
+    ):
+        assert all(result._block is shared[0]._block for result in copied)
+        assert [repr(result) for result in copied] == [
+            repr(result) for result in shared
+        ]
+
+
+def test_json_multiple_reports():
+    """
+    Appending several reports (including empty ones) should always give one
+    valid json list and typed json should keep numbers and missing values
+    """
+    metadata = {
+        "analysis_software_version": "5.2.0",
+        "reference_database_version": "3.2.5",
+        "input_file_name": "rgi_report",
+    }
+    reports = [
+        ("data/raw_outputs/amrfinderplus/empty_report_with_header.tsv",
+         "amrfinderplus"),
+        ("data/raw_outputs/rgi/rgi.txt", "rgi"),
+        ("data/raw_outputs/amrfinderplus/empty_report_with_header.tsv",
+         "amrfinderplus"),
+    ]
+    expected = list(hAMRonization.parse(reports[1][0], dict(metadata), "rgi"))
+
+    for typed_json in (False, True):
+        for report_number, (path, tool) in enumerate(reports):
+            parsed_report = hAMRonization.parse(path, dict(metadata), tool)
+            parsed_report.write(
+                report_number=report_number,
+                total_report_count=len(reports),
+                output_location="multiple_reports.json",
+                output_format="json",
+                typed_json=typed_json,
+            )
+        with open("multiple_reports.json") as fh:
+            data = json.load(fh)
+        os.remove("multiple_reports.json")
+
+        assert len(data) == len(expected)
+        for entry, result in zip(data, expected):
+            assert entry["gene_symbol"] == result.gene_symbol
+            if typed_json:
+                assert entry["coverage_percentage"] == result.coverage_percentage
+                assert entry["sequence_identity"] == result.sequence_identity
+                # empty numeric values are missing
+                assert entry["input_gene_start"] == (result.input_gene_start or None)
+                assert entry["coverage_depth"] is None
+            else:
+                assert entry["coverage_percentage"] == str(
+                    result.coverage_percentage
+                )
+                assert entry["coverage_depth"] == ""
+
+
+@pytest.mark.parametrize("output_name", ["reports.json", "reports.json.gz", "reports.tsv"])
+def test_write_multiple_reports(tmp_path, capsys, output_name):
+    """
+    Reports written one write() call at a time continue the output the
+    earlier ones left, read back from the output rather than kept between
+    calls, also when an earlier sequence of calls was never finished
+    """
+    metadata = {
+        "analysis_software_version": "5.2.0",
+        "reference_database_version": "3.2.5",
+        "input_file_name": "rgi_report",
+    }
+    reports = [
+        ("data/raw_outputs/amrfinderplus/empty_report_with_header.tsv",
+         "amrfinderplus"),
+        ("data/raw_outputs/rgi/rgi.txt", "rgi"),
+        ("data/raw_outputs/rgi/rgi.txt", "rgi"),
+    ]
+    output_format = output_name.split(".")[1]
+    output = str(tmp_path / output_name)
+    # an unfinished sequence of calls to another output
+    hAMRonization.parse(reports[1][0], dict(metadata), "rgi").write(
+        report_number=0, total_report_count=2,
+        output_location=str(tmp_path / output_name.replace("reports", "other")),
+        output_format=output_format,
+    )
+    for report_number, (path, tool) in enumerate(reports):
+        hAMRonization.parse(path, dict(metadata), tool).write(
+            report_number=report_number,
+            total_report_count=len(reports),
+            output_location=output,
+            output_format=output_format,
+        )
+
+    # the same reports to stdout through a writer of the caller's
+    writer = hAMRonization.Interfaces.hAMRonizedResultWriter(None, output_format)
+    for path, tool in reports:
+        hAMRonization.parse(path, dict(metadata), tool).write(writer=writer)
+    writer.close()
+
+    with open_source(output) as fh:
+        text = fh.read()
+    assert text == capsys.readouterr().out
+    if output_format == "json":
+        assert len(json.loads(text)) == 20
+    else:
+        assert text.startswith("input_file_name\t")
+        assert len(text.splitlines()) == 21
+
+
+def test_ndjson_reports(monkeypatch, capsys):
+    """
+    ndjson reports have one record per line and are summarized in chunks to
+    the same summary as the equivalent json report, only keeping the unique
+    records of the chunks read
+    """
+    metadata = {
+        "analysis_software_version": "5.2.0",
+        "reference_database_version": "3.2.5",
+        "input_file_name": "rgi_report",
+    }
+    for output_format in ("ndjson", "json", "tsv"):
+        for report_number in range(2):
+            parsed_report = hAMRonization.parse(
+                "data/raw_outputs/rgi/rgi.txt", dict(metadata), "rgi"
+            )
+            parsed_report.write(
+                report_number=report_number,
+                total_report_count=2,
+                output_location=f"rgi_report.{output_format}",
+                output_format=output_format,
+            )
+
+    with open("rgi_report.ndjson") as fh:
+        records = [json.loads(line) for line in fh]
+    with open("rgi_report.json") as fh:
+        assert records == json.load(fh)
+    assert hAMRonization.summarize.check_report_type("rgi_report.ndjson") == "ndjson"
+    assert hAMRonization.summarize.check_report_type("rgi_report.json") == "json"
+
+    # make sure the report spans several chunks
+    monkeypatch.setattr(hAMRonization.summarize, "NDJSON_CHUNK_SIZE", 3)
+    with open("rgi_report.ndjson") as fh:
+        unique_records, record_count = hAMRonization.summarize._read_ndjson_report(fh)
+    # the report was written twice
+    assert (len(unique_records), record_count) == (10, 20)
+
+    capsys.readouterr()
+    summarize_reports(["rgi_report.ndjson"], "tsv", "summarize_ndjson.tsv")
+    ndjson_messages = capsys.readouterr().err
+    summarize_reports(["rgi_report.tsv"], "tsv", "summarize.tsv")
+    assert "10 duplicate records removed" in ndjson_messages
+    assert capsys.readouterr().err == ndjson_messages.replace(
+        "summarize_ndjson.tsv", "summarize.tsv"
+    )
+    with open("summarize_ndjson.tsv") as fh, open("summarize.tsv") as tsv_fh:
+        summary = fh.read()
+        assert summary == tsv_fh.read()
+    assert len(summary.splitlines()) == 11
+
+    summarize_reports(["rgi_report.ndjson"], "ndjson", "summarize.ndjson")
+    with open("summarize.ndjson") as fh:
+        assert len([json.loads(line) for line in fh]) == 10
+
+    for path in ("rgi_report.ndjson", "rgi_report.json", "rgi_report.tsv",
+                 "summarize_ndjson.tsv", "summarize.tsv", "summarize.ndjson"):
+        os.remove(path)
+
+
+@pytest.mark.parametrize("compress", [gzip.compress, bz2.compress, lzma.compress])
+def test_compressed_reports(tmp_path, compress):
+    """
+    Compressed reports (detected from their leading bytes, whatever their
+    name) should parse and summarize the same as the uncompressed report
+    """
+    metadata = {
+        "analysis_software_version": "1.0.1",
+        "reference_database_version": "2",
+        "input_file_name": "compressed",
+    }
+    reports = [
+        ("data/raw_outputs/rgi/rgi.txt", "rgi"),
+        ("data/raw_outputs/rgibwt/Kp11_bwtoutput.gene_mapping_data.txt", "rgi"),
+        ("data/raw_outputs/deeparg/output.mapping.potential.ARG", "deeparg"),
+        ("data/raw_outputs/resfams/resfams.tblout", "resfams"),
+    ]
+    for path, tool in reports:
+        compressed_path = tmp_path / os.path.basename(path)
+        with open(path, "rb") as fh:
+            compressed_path.write_bytes(compress(fh.read()))
+
+        expected = list(hAMRonization.parse(path, dict(metadata), tool))
+        parsed = list(hAMRonization.parse(str(compressed_path), dict(metadata), tool))
+        assert parsed == expected
+
+    # and so should a compressed hAMRonized report
+    report = str(tmp_path / "report.json")
+    hAMRonization.parse(reports[0][0], dict(metadata), reports[0][1]).write(
+        output_location=report, output_format="json"
+    )
+    summarize_reports([report], "tsv", str(tmp_path / "summary.tsv"))
+    with open(report, "rb") as fh:
+        compressed_report = compress(fh.read())
+    with open(report, "wb") as fh:
+        fh.write(compressed_report)
+    assert hAMRonization.summarize.check_report_type(report) == "json"
+    summarize_reports([report], "tsv", str(tmp_path / "compressed_summary.tsv"))
+    assert (tmp_path / "summary.tsv").read_text() == (
+        tmp_path / "compressed_summary.tsv"
+    ).read_text()
+
+
+@pytest.mark.parametrize("suffix,decompress", [
+    (".gz", gzip.decompress), (".bz2", bz2.decompress), (".xz", lzma.decompress),
+])
+def test_compressed_output(tmp_path, suffix, decompress):
+    """
+    Outputs ending in a compression suffix (or with compression set) are
+    written compressed, also when several reports are appended
+    """
+    metadata = {
+        "analysis_software_version": "5.2.0",
+        "reference_database_version": "3.2.5",
+        "input_file_name": "rgi_report",
+    }
+    output = str(tmp_path / f"report.json{suffix}")
+    for report_number in range(2):
+        hAMRonization.parse(
+            "data/raw_outputs/rgi/rgi.txt", dict(metadata), "rgi"
+        ).write(
+            report_number=report_number,
+            total_report_count=2,
+            output_location=output,
+            output_format="json",
+            compression_level=1,
+        )
+    with open(output, "rb") as fh:
+        assert len(json.loads(decompress(fh.read()))) == 20
+
+    summary = str(tmp_path / "summary")
+    compression = {".gz": "gzip", ".bz2": "bzip2", ".xz": "xz"}[suffix]
+    summarize_reports([output], "tsv", summary, compression=compression)
+    with open(summary, "rb") as fh:
+        assert len(decompress(fh.read()).splitlines()) == 11
+
+
+def test_file_like_sources(monkeypatch):
+    """
+    Open text and binary handles, in-memory buffers (compressed or not) and
+    "-" for stdin parse the same as the path, and are left open
+    """
+    metadata = {
+        "analysis_software_version": "5.2.0",
+        "reference_database_version": "3.2.5",
+        "input_file_name": "rgi_report",
+    }
+    for path, tool in [
+        ("data/raw_outputs/rgi/rgi.txt", "rgi"),
+        ("data/raw_outputs/rgibwt/Kp11_bwtoutput.gene_mapping_data.txt", "rgi"),
+        ("data/dummy/rgi/rgi_orf.txt", "rgi"),
+        ("data/raw_outputs/tbprofiler/tbprofiler.json", "tbprofiler"),
+    ]:
+        expected = list(hAMRonization.parse(path, dict(metadata), tool))
+        with open(path, "rb") as fh:
+            report = fh.read()
+
+        with open(path) as fh:
+            assert list(hAMRonization.parse(fh, dict(metadata), tool)) == expected
+            assert not fh.closed
+        for buffer in [io.BytesIO(report), io.BytesIO(gzip.compress(report))]:
+            parsed = list(hAMRonization.parse(buffer, dict(metadata), tool))
+            assert not buffer.closed
+            if tool == "tbprofiler":
+                # the report name is taken from the source
+                assert {result.input_file_name for result in parsed} == {"<stream>"}
+                parsed = [
+                    dataclasses.replace(result, input_file_name=path)
+                    for result in parsed
+                ]
+            assert parsed == expected
+
+        stdin = io.TextIOWrapper(io.BufferedReader(io.BytesIO(report)))
+        monkeypatch.setattr("sys.stdin", stdin)
+        parsed = list(hAMRonization.parse("-", dict(metadata), tool))
+        assert len(parsed) == len(expected)
+        assert not stdin.closed
+
+
+def test_replay_stream():
+    """
+    A ReplayStream reads as the stream its leading lines were read from
+    """
+    from hAMRonization.streams import ReplayStream, read_leading_lines
+
+    text = "header\nrow 1\nrow 2\nrow 3\n"
+
+    def replay():
+        stream = io.StringIO(text)
+        return ReplayStream(read_leading_lines(stream, 2), stream)
+
+    assert read_leading_lines(io.StringIO("a\n"), 2) == ["a\n"]
+    assert list(replay()) == text.splitlines(keepends=True)
+    assert replay().read() == text
+    stream = replay()
+    assert stream.read(3) + stream.read(8) + stream.read() == text
+    stream = replay()
+    chunks = iter(lambda: stream.readlines(4), [])
+    assert "".join(line for chunk in chunks for line in chunk) == text
+    stream = replay()
+    assert stream.readline() == "header\n" and stream.read() == text[7:]
+
+
+def test_parallel_reports(tmp_path):
+    """
+    Reports parsed in worker processes are written in input order to one
+    output, as if written one at a time
+    """
+    metadata = {
+        "analysis_software_version": "5.2.0",
+        "reference_database_version": "3.2.5",
+        "input_file_name": "rgi_report",
+    }
+    reports = [
+        "data/raw_outputs/rgi/rgi.txt",
+        "data/raw_outputs/amrfinderplus/empty_report_with_header.tsv",
+        "data/raw_outputs/rgibwt/Kp11_bwtoutput.gene_mapping_data.txt",
+        "data/raw_outputs/rgi/rgi.txt",
+    ]
+    assert hAMRonization.parallel.available_cpu_count() >= 1
+
+    for output_format in ("tsv", "json", "ndjson"):
+        output = str(tmp_path / f"report.{output_format}")
+        for report_number, report in enumerate(reports):
+            hAMRonization.parse(report, dict(metadata), "rgi").write(
+                report_number=report_number,
+                total_report_count=len(reports),
+                output_location=output,
+                output_format=output_format,
+            )
+
+        parallel_output = str(tmp_path / f"parallel_report.{output_format}")
+        writer = hAMRonization.Interfaces.hAMRonizedResultWriter(
+            parallel_output, output_format
+        )
+        for rendered_batches in hAMRonization.parallel.render_reports(
+            reports, metadata, "rgi", output_format, jobs=2
+        ):
+            writer.write_rendered(rendered_batches)
+        writer.close()
+
+        with open(output) as fh, open(parallel_output) as parallel_fh:
+            assert fh.read() == parallel_fh.read()
+
+
+@pytest.mark.parametrize("output_name", ["batch.json", "batch.tsv.gz"])
+def test_batch_manifest(tmp_path, output_name):
+    """
+    A batch run writes all reports of a manifest to one output as if written
+    one at a time, and an interrupted run resumes from its journal
+    """
+    manifest = tmp_path / "manifest.tsv"
+    rows = [
+        ("rgi", "data/raw_outputs/rgi/rgi.txt"),
+        ("abricate", "data/raw_outputs/abricate/report.tsv"),
+        ("amrfinderplus",
+         "data/raw_outputs/amrfinderplus/empty_report_with_header.tsv"),
+        ("rgi", "data/raw_outputs/rgibwt/Kp11_bwtoutput.gene_mapping_data.txt"),
+        ("resfinder", "data/raw_outputs/resfinder/data_resfinder.json"),
+    ]
+    fields = [
+        "tool", "report", "analysis_software_version",
+        "reference_database_version", "input_file_name",
+    ]
+    with open(manifest, "w") as fh:
+        fh.write("\t".join(fields) + "\n")
+        for tool, report in rows:
+            fh.write(f"{tool}\t{report}\t1.0\tdb_1.0\tsample\n")
+
+    output_format = output_name.split(".")[1]
+    output = str(tmp_path / output_name)
+    hAMRonization.batch.run_batch(
+        str(manifest), output, output_format, jobs=2,
+        journal_path=str(tmp_path / "journal"),
+    )
+    with open_source(output) as fh:
+        batch_output = fh.read()
+
+    expected_output = str(tmp_path / f"expected.{output_format}")
+    for report_number, (tool, report) in enumerate(rows):
+        metadata = {
+            "analysis_software_version": "1.0",
+            "reference_database_version": "db_1.0",
+            "input_file_name": "sample",
+        }
+        hAMRonization.parse(report, metadata, tool).write(
+            report_number=report_number,
+            total_report_count=len(rows),
+            output_location=expected_output,
+            output_format=output_format,
+        )
+    with open(expected_output) as fh:
+        assert batch_output == fh.read()
+
+    # interrupt the run after the third report, part way through the fourth
+    journal = tmp_path / "journal"
+    with open(journal) as fh:
+        journal_lines = fh.readlines()
+    # the output settings, then a line per report
+    assert len(journal_lines) == len(rows) + 1
+    offset = json.loads(journal_lines[3])["offset"]
+
+    def interrupt():
+        os.truncate(output, offset)
+        with open(output, "ab") as fh:
+            fh.write(b"partially written report")
+        with open(journal, "w") as fh:
+            fh.writelines(journal_lines[:4])
+            fh.write('{"has_entries": true, "index": 3, "metadata": {"anal')
+
+    # resuming with other output settings would mix formats in one output
+    interrupt()
+    with pytest.raises(ValueError, match="other output settings"):
+        hAMRonization.batch.run_batch(
+            str(manifest), output, output_format, typed_json=True,
+            journal_path=str(journal),
+        )
+    if output_format == "tsv":
+        with pytest.raises(ValueError, match="other output settings"):
+            hAMRonization.batch.run_batch(
+                str(manifest), output, output_format, compression="bzip2",
+                journal_path=str(journal),
+            )
+
+    interrupt()
+    assert hAMRonization.batch.run_batch(
+        str(manifest), output, output_format, journal_path=str(journal)
+    ) == len(rows)
+    with open_source(output) as fh:
+        assert fh.read() == batch_output
+
+    with open(manifest, "a") as fh:
+        fh.write("unknown_tool\treport\t1.0\tdb_1.0\tsample\n")
+    with pytest.raises(ValueError, match="Unknown tool unknown_tool on line 7"):
+        hAMRonization.batch.read_manifest(str(manifest))
+
+
+def test_completion_journal(tmp_path):
+    """
+    A journal keeps reports whose paths have tabs or newlines and drops a
+    partial last line, and isn't resumed with other output settings
+    """
+    journal_path = str(tmp_path / "journal")
+    settings = {"output": "out.tsv", "format": "tsv", "compression": None,
+                "typed_json": False}
+    task = ("reports/a\tb\nc.txt", {"input_file_name": "sample"}, "abricate")
+    journal = hAMRonization.batch.CompletionJournal(journal_path, settings)
+    journal.record(task, 120, True)
+    journal.close()
+    with open(journal_path, "a") as fh:
+        fh.write('{"index": 1, "report": "rep')
+
+    journal = hAMRonization.batch.CompletionJournal(journal_path, settings)
+    journal.close()
+    assert journal.completed == [(task, 120, True)]
+    with pytest.raises(ValueError, match="other output settings"):
+        hAMRonization.batch.CompletionJournal(
+            journal_path, dict(settings, format="json")
+        )
+
+
+def test_batch_resume_after_empty_report(tmp_path):
+    """
+    A tsv batch run resumed after reports without results still writes the
+    header (with its first results), and a journal isn't resumed for a
+    manifest whose tools or metadata changed
+    """
+    manifest = tmp_path / "manifest.tsv"
+    rows = [
+        ("amrfinderplus", "data/raw_outputs/amrfinderplus/empty_report_with_header.tsv"),
+        ("abricate", "data/raw_outputs/abricate/report.tsv"),
+    ]
+
+    def write_manifest(database_version):
+        with open(manifest, "w") as fh:
+            fh.write("tool\treport\tanalysis_software_version\t"
+                     "reference_database_version\tinput_file_name\n")
+            for tool, report in rows:
+                fh.write(f"{tool}\t{report}\t1.0\t{database_version}\tsample\n")
+
+    write_manifest("db_1.0")
+    expected = str(tmp_path / "expected.tsv")
+    hAMRonization.batch.run_batch(str(manifest), expected)
+
+    # interrupted after the empty first report
+    output = str(tmp_path / "batch.tsv")
+    journal = str(tmp_path / "journal")
+    hAMRonization.batch.run_batch(str(manifest), output, journal_path=journal)
+    with open(journal) as fh:
+        journal_lines = fh.readlines()[:2]
+    with open(journal, "w") as fh:
+        fh.writelines(journal_lines)
+    os.truncate(output, json.loads(journal_lines[1])["offset"])
+
+    assert hAMRonization.batch.run_batch(
+        str(manifest), output, journal_path=journal
+    ) == 2
+    with open(output) as fh, open(expected) as expected_fh:
+        output_text = fh.read()
+        assert output_text == expected_fh.read()
+    assert output_text.startswith("input_file_name\t")
+
+    write_manifest("db_2.0")
+    with pytest.raises(ValueError, match="doesn't match manifest"):
+        hAMRonization.batch.run_batch(str(manifest), output, journal_path=journal)
+
+
+def test_result_cache_store_error(tmp_path, monkeypatch, caplog):
+    """
+    An entry that can't be written raises the original error and leaves no
+    temporary file behind, while a report is still converted when its
+    entry can't be written, or is pruned as it is read
+    """
+    cache = hAMRonization.cache.ResultCache(str(tmp_path / "cache"))
+    report = "data/raw_outputs/rgi/rgi.txt"
+    metadata = {
+        "analysis_software_version": "1.0",
+        "reference_database_version": "db_1.0",
+        "input_file_name": "sample",
+    }
+    parsed = hAMRonization.parse(report, dict(metadata), "rgi").iter_batches()
+    parsed_rows = [list(batch.rows()) for batch in parsed]
+
+    with monkeypatch.context() as patch:
+
+        def failing_open(path, mode):
+            raise PermissionError(f"can't write {path}")
+
+        patch.setattr(hAMRonization.cache.gzip, "open", failing_open)
+        with pytest.raises(PermissionError):
+            cache.store("ab" * 32, [])
+        assert not list((tmp_path / "cache").rglob("*.tmp"))
+
+        with caplog.at_level(logging.WARNING):
+            batches = list(cache.batches(report, metadata, "rgi"))
+        assert [list(batch.rows()) for batch in batches] == parsed_rows
+        assert "Couldn't cache" in caplog.text
+        assert cache.stats() == (0, 0)
+
+    list(cache.batches(report, metadata, "rgi"))
+    key = cache.key(report, metadata, "rgi")
+    assert cache.load(key) is not None
+
+    def pruned(path):
+        raise FileNotFoundError(path)
+
+    monkeypatch.setattr(hAMRonization.cache.os, "utime", pruned)
+    assert cache.load(key) is None
+
+
+def test_result_cache(tmp_path, monkeypatch):
+    """
+    A cached report gives the same batches as parsing it, without parsing it
+    again, until its metadata changes or it is pruned
+    """
+    metadata = {
+        "analysis_software_version": "1.0",
+        "reference_database_version": "db_1.0",
+        "input_file_name": "sample",
+    }
+    report = "data/raw_outputs/rgi/rgi.txt"
+    cache = hAMRonization.cache.ResultCache(str(tmp_path / "cache"))
+
+    def rows(batches):
+        return [list(batch.rows()) for batch in batches]
+
+    parsed = hAMRonization.parse(report, dict(metadata), "rgi").iter_batches()
+    parsed_rows = rows(parsed)
+    assert rows(cache.batches(report, metadata, "rgi")) == parsed_rows
+    assert cache.stats()[0] == 1
+
+    def parse(*args, **kwargs):
+        raise AssertionError("cached report parsed again")
+
+    with monkeypatch.context() as patch:
+        patch.setattr(hAMRonization, "parse", parse)
+        assert rows(cache.batches(report, metadata, "rgi")) == parsed_rows
+
+    list(cache.batches(report, dict(metadata, input_file_name="other"), "rgi"))
+    assert cache.stats()[0] == 2
+    assert cache.prune(0)[0] == 2
+    assert cache.stats() == (0, 0)
+
+    assert hAMRonization.cache.parse_size("1.5K") == 1536
+    with pytest.raises(ValueError, match="Invalid size"):
+        hAMRonization.cache.parse_size("1X")
+
+
+def test_conversion_server(tmp_path):
+    """
+    A conversion server writes the same output as hamronize <tool> and
+    rejects requests it can't convert
+    """
+    import threading
+    from hAMRonization import server
+
+    metadata = {
+        "analysis_software_version": "1.0",
+        "reference_database_version": "db_1.0",
+        "input_file_name": "sample",
+    }
+    reports = [
+        "data/raw_outputs/rgi/rgi.txt",
+        "data/raw_outputs/rgibwt/Kp11_bwtoutput.gene_mapping_data.txt",
+    ]
+    socket_path = str(tmp_path / "hamronize.sock")
+    conversion_server = server.create_server(socket_path)
+    threading.Thread(target=conversion_server.serve_forever, daemon=True).start()
+    try:
+        assert os.stat(socket_path).st_mode & 0o777 == 0o600
+        for output_format in ("tsv", "json", "ndjson"):
+            expected = io.StringIO()
+            writer = hAMRonization.Interfaces.hAMRonizedResultWriter(
+                expected, output_format
+            )
+            for report in reports:
+                writer.write_report(hAMRonization.parse(report, dict(metadata), "rgi"))
+            writer.close()
+            assert server.request_conversion(
+                socket_path, "rgi", reports, metadata, output_format
+            ) == expected.getvalue()
+
+        with pytest.raises(server.ConversionError, match="File not found"):
+            server.request_conversion(socket_path, "rgi", ["missing.txt"], metadata)
+        with pytest.raises(server.ConversionError, match="requires"):
+            server.request_conversion(socket_path, "rgi", reports, {})
+
+        # the client doesn't take the server's settings
+        client = subprocess.run(
+            [sys.executable, "-m", "hAMRonization.hamronize", "rgi", reports[0],
+             "--analysis_software_version", "1.0",
+             "--reference_database_version", "db_1.0",
+             "--input_file_name", "sample",
+             "--server", socket_path, "--jobs", "2"],
+            capture_output=True, text=True,
+        )
+        assert client.returncode != 0
+        assert "can't be used with --server" in client.stderr
+    finally:
+        conversion_server.shutdown()
+        conversion_server.close()
+    assert not os.path.exists(socket_path)
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 1024 * 1024])
+def test_load_selected_json(chunk_size):
+    """
+    load_selected gives the selected members as json.load would, whatever
+    the chunks the document is read in, and rejects invalid json
+    """
+    from hAMRonization.jsonstream import load_selected
+
+    with open("data/raw_outputs/tbprofiler/tbprofiler.json") as fh:
+        text = fh.read()
+    data = json.loads(text)
+    selection = {"dr_variants": True, "qc": {"pct_reads_mapped": True}}
+    assert load_selected(io.StringIO(text), selection, chunk_size) == {
+        "dr_variants": data["dr_variants"],
+        "qc": {"pct_reads_mapped": data["qc"]["pct_reads_mapped"]},
+    }
+    assert load_selected(io.StringIO(text), {"*": True}, chunk_size) == data
+
+    for invalid in ('{"a": [1 2], "b": 1}', '{"b": 1', '{"b": 1} x'):
+        with pytest.raises(json.JSONDecodeError):
+            load_selected(io.StringIO(invalid), {"b": True}, chunk_size)
+
+
+def test_iter_selected_members():
+    """
+    iter_selected_members gives the selected members of a document one at a
+    time, as load_selected would give them all
+    """
+    from hAMRonization.jsonstream import iter_selected_members, load_selected
+
+    text = '{"a": {"x": 1, "y": [2]}, "b": 3, "c": {"x": 4}}'
+    selection = {"*": {"x": True}, "b": None}
+    assert list(iter_selected_members(io.StringIO(text), selection, 5)) == list(
+        load_selected(io.StringIO(text), selection).items()
+    )
+    assert list(iter_selected_members(io.StringIO("{}"), {"*": True})) == []
+    with pytest.raises(json.JSONDecodeError):
+        list(iter_selected_members(io.StringIO("[1]"), {"*": True}))
+
+
+def test_mykrobe_multiple_samples(tmp_path):
+    """
+    The records of each sample of a multi-sample Mykrobe report come in the
+    order of the report, named after their sample unless the
+    input_file_names option names them after the report
+    """
+    metadata = {}
+    single = list(hAMRonization.parse(
+        "data/dummy/mykrobe/mykrobe.json", metadata, "mykrobe"
+    ))
+    assert single and {result.input_file_name for result in single} == {"mykrobe.json"}
+
+    plate = "data/dummy/mykrobe/plate.json"
+    results = list(hAMRonization.parse(plate, metadata, "mykrobe"))
+    assert [result.input_file_name for result in results] == [
+        name for name in ("SRR6916544", "SRR6916545") for _ in single
+    ]
+    assert results == list(hAMRonization.parse(
+        plate, metadata, "mykrobe", input_file_names="sample"
+    ))
+    assert list(hAMRonization.parse(
+        "data/dummy/mykrobe/mykrobe.json", metadata, "mykrobe",
+        input_file_names="sample",
+    ))[0].input_file_name == "SRR6916544"
+
+    results = list(hAMRonization.parse(
+        plate, metadata, "mykrobe", input_file_names="report"
+    ))
+    assert {result.input_file_name for result in results} == {"plate.json"}
+    for result in results:
+        result.input_file_name = "mykrobe.json"
+    assert results == single * 2
+
+    with open(plate) as fh:
+        samples = json.load(fh)
+    report = tmp_path / "plate.json"
+    report.write_text(json.dumps({**samples, "B01": samples["SRR6916544"]}))
+    results = list(hAMRonization.parse(str(report), metadata, "mykrobe"))
+    assert [result.input_file_name for result in results][-len(single):] == [
+        "B01" for _ in single
+    ]
+
+
+def test_tbprofiler_records_and_directories(tmp_path, caplog):
+    """
+    TB-Profiler reports one result per variant or per variant and drug, and
+    reads a directory of *.results.json reports (compressed or not) in name
+    order as one source
+    """
+    report = "data/raw_outputs/tbprofiler/tbprofiler.json"
+    metadata = {}
+    variants = list(hAMRonization.parse(report, metadata, "tbprofiler"))
+    drugs = list(hAMRonization.parse(report, metadata, "tbprofiler", records="drug"))
+    with open(report) as fh:
+        dr_variants = json.load(fh)["dr_variants"]
+    assert len(variants) == len(dr_variants)
+    assert [result.drug_class for result in drugs] == [
+        drug["drug"] for variant in dr_variants for drug in variant["drugs"]
+    ]
+    lazy_drugs = list(hAMRonization.parse(
+        report, metadata, "tbprofiler", records="drug", lazy=True
+    ))
+    assert [result.drug_class for result in lazy_drugs] == [
+        result.drug_class for result in drugs
+    ]
+    with pytest.raises(ValueError, match="records"):
+        hAMRonization.parse(report, metadata, "tbprofiler", records="sample")
+
+    # a variant without drugs has no result, whatever the records
+    with open(report) as fh:
+        data = json.load(fh)
+    data["dr_variants"][0]["drugs"] = []
+    no_drugs = io.StringIO(json.dumps(data))
+    assert [
+        (result.gene_symbol, result.drug_class)
+        for result in hAMRonization.parse(no_drugs, metadata, "tbprofiler")
+    ] == [(result.gene_symbol, result.drug_class) for result in variants[1:]]
+    no_drugs.seek(0)
+    assert [result.drug_class for result in hAMRonization.parse(
+        no_drugs, metadata, "tbprofiler", records="drug"
+    )] == [
+        drug["drug"] for variant in dr_variants[1:] for drug in variant["drugs"]
+    ]
+
+    with open(report, "rb") as fh:
+        text = fh.read()
+    (tmp_path / "b.results.json").write_bytes(text)
+    with gzip.open(tmp_path / "a.results.json.gz", "wb") as fh:
+        fh.write(text)
+    with bz2.open(tmp_path / "c.results.json.bz2", "wb") as fh:
+        fh.write(text)
+    (tmp_path / "d.json").write_bytes(text)
+    results = list(hAMRonization.parse(str(tmp_path), metadata, "tbprofiler"))
+    assert [result.input_file_name for result in results] == [
+        f"{name}.results.json" for name in ("a", "b", "c") for _ in variants
+    ]
+    for result in results:
+        result.input_file_name = "tbprofiler.json"
+    assert results == variants * 3
+
+    (tmp_path / "empty").mkdir()
+    with caplog.at_level(logging.WARNING):
+        assert list(hAMRonization.parse(
+            str(tmp_path / "empty"), metadata, "tbprofiler"
+        )) == []
+    assert "No *.results.json reports found" in caplog.text
+
+
+def test_tabular_reader():
+    """
+    TabularReader reads the selected columns of each row as csv.DictReader
+    does, including quoted fields, short rows, blank lines and duplicated
+    columns
+    """
+    from hAMRonization.tabular import TabularReader
+
+    text = (
+        "a\tb\tc\tb\r\n"
+        "1\t2\t3\t4\r\n"
+        "\n"
+        '"x\ty"\t"multi\nline"\t5\t6\n'
+        "7\t8\n"
+    )
+    columns = ["b", "c", "missing"]
+    expected = [
+        {column: row[column] for column in columns if column in row}
+        for row in csv.DictReader(io.StringIO(text, newline=""), delimiter="\t")
+    ]
+    reader = TabularReader(io.StringIO(text, newline=""), columns=columns)
+    assert reader.fieldnames == ["a", "b", "c", "b"]
+    assert list(reader) == expected
+    assert expected[2] == {"b": None, "c": None}
+
+    reader = TabularReader(io.StringIO("1\t2\n"), fieldnames=[0, 1, 2])
+    assert list(reader) == [{0: "1", 1: "2", 2: None}]
+
+
+def test_hmmer_table_thresholds():
+    """
+    The HMMER table reader keeps the description of targets intact, types
+    E-values and scores and filters hits on the parser option thresholds
+    """
+    from hAMRonization.hmmer import HmmerTableReader
+
+    report = "data/raw_outputs/resfams/resfams.tblout"
+    metadata = {
+        "analysis_software_version": "1.2",
+        "reference_database_version": "1.2",
+        "input_file_name": "sample1",
+    }
+    with open(report) as fh:
+        hits = list(HmmerTableReader(fh, [str(column) for column in range(19)]))
+    assert hits[0]["4"] == 1.3e-22 and hits[0]["5"] == 79.0
+    assert hits[0]["18"].startswith("# 210302 # 210820 # 1 # ID=5_204;")
+
+    all_results = list(hAMRonization.parse(report, dict(metadata), "resfams"))
+    results = list(hAMRonization.parse(
+        report, dict(metadata), "resfams", max_evalue=1e-30, min_score=100
+    ))
+    expected = [
+        hit for hit in hits if hit["4"] <= 1e-30 and hit["5"] >= 100
+    ]
+    assert 0 < len(results) == len(expected) < len(all_results)
+
+    with pytest.raises(ValueError):
+        hAMRonization.parse(report, dict(metadata), "resfams", max_score=1)
+    with pytest.raises(ValueError):
+        hAMRonization.parse(report, dict(metadata), "abricate", max_evalue=1)
+
+
+def test_deeparg_gene_aggregation():
+    """
+    With aggregate="gene" DeepARG reads are collapsed into one result per
+    gene, counting each read once per gene
+    """
+    report = "data/raw_outputs/deeparg/output.mapping.potential.ARG"
+    metadata = {
+        "analysis_software_version": "1.0.1",
+        "reference_database_version": "2",
+        "input_file_name": "sample1",
+    }
+    with open(report) as fh:
+        rows = list(csv.DictReader(fh, delimiter="\t"))
+    gene_reads = {}
+    for row in rows:
+        gene_reads.setdefault((row["#ARG"], row["best-hit"]), {})[row["read_id"]] = row
+
+    results = list(hAMRonization.parse(report, metadata, "deeparg", aggregate="gene"))
+    assert [(result.gene_symbol, result.gene_name) for result in results] == list(gene_reads)
+    for result in results:
+        reads = gene_reads[(result.gene_symbol, result.gene_name)]
+        assert result.coverage_depth == len(reads)
+        mean_identity = sum(float(row["identity"]) for row in reads.values()) / len(reads)
+        assert result.sequence_identity == pytest.approx(mean_identity, abs=0.01)
+        assert result.input_sequence_id is None
+
+    with pytest.raises(ValueError):
+        hAMRonization.parse(report, metadata, "deeparg", aggregate="sample")
+
+
+def test_reference_name_cache(caplog):
+    """
+    Fields derived from reference names are memoised per tool and name, and
+    the hit rate is logged in debug mode
+    """
+    from hAMRonization import references
+
+    metadata = {
+        "analysis_software_version": "3.0",
+        "reference_database_version": "2.0",
+        "input_file_name": "sample1",
+    }
+    report = "data/raw_outputs/amrplusplus/gene.tsv"
+    references.decompose.cache_clear()
+    with caplog.at_level(logging.DEBUG, logger="hAMRonization.references"):
+        first = list(hAMRonization.parse(report, dict(metadata), "amrplusplus"))
+        second = list(hAMRonization.parse(report, dict(metadata), "amrplusplus"))
+    assert first == second
+    info = references.decompose.cache_info()
+    assert info.hits >= len(first) and info.currsize == info.misses
+    assert "Reference name cache" in caplog.text
+
+    assert references.decompose(
+        "amrplusplus", "MEG_1490|Drugs|Cationic_antimicrobial_peptides|"
+        "Cationic_peptide-resistant_16S_ribosomal_subunit_protein|CAP16S|"
+        "RequiresSNPConfirmation"
+    ) == {
+        "_reference_accession": "MEG_1490",
+        "_drug_class": "Cationic_antimicrobial_peptides",
+        "_gene_symbol": "CAP16S",
+        "_gene_name": "Cationic_peptide-resistant_16S_ribosomal_subunit_protein",
+    }
+
+
+def test_mutation_notation():
+    """
+    The shared HGVS conversions of substitutions, SNP lists and Mykrobe
+    variants
+    """
+    from hAMRonization import mutations
+
+    assert mutations.protein_substitution("C84R") == "p.C84R"
+    assert mutations.nucleotide_substitution("A2058T", "c.") == "c.2058A>T"
+    assert mutations.nucleotide_substitution("C-11T", "c.") == "c.-11C>T"
+    assert mutations.nucleotide_substitution("T-14TGT", "c.") == "c.-14T>TGT"
+    assert mutations.protein_mutations("S83L,D87N") == "p.S83L,p.D87N"
+    assert mutations.nucleotide_mutations("A1401G,G1484T") == "n.1401A>G,n.1484G>T"
+    assert mutations.mykrobe_variant("gyrA_D94G-GAC7570GGC") == (
+        "gyrA", "GAC7570GGC", "p.Asp94Gly"
+    )
+    assert mutations.mykrobe_variant("rrs_A1401X-A1401G") == ("rrs", "A1401G", None)
+    assert mutations.mykrobe_variant("not a variant") is None
+    with pytest.raises(ValueError):
+        mutations.protein_substitution("2058")
+
+
+@pytest.mark.parametrize("argv, subcommand", [
+    (["--debug", "rgi", "--format", "json", "report.txt"], "rgi"),
+    (["summarize", "--help"], "summarize"),
+    (["--help"], None),
+    (["unknown_tool", "report.txt"], None),
+])
+def test_selected_subcommand(monkeypatch, argv, subcommand):
+    """
+    The subcommand is found from the parsed command line, whatever comes
+    before or after it
+    """
+    monkeypatch.setattr(sys, "argv", ["hamronize", *argv])
+    assert hAMRonization.Interfaces._selected_subcommand() == subcommand
+
+
+@pytest.mark.parametrize("argv, report_count, jobs", [
+    ([], 10, 4),
+    ([], 2, 2),
+    (["--jobs", "0"], None, 4),
+    (["--jobs", "3"], None, 3),
+    (["--jobs", "8"], 2, 2),
+])
+def test_job_count(monkeypatch, argv, report_count, jobs):
+    """
+    Reports are parsed with all CPUs available by default (or with --jobs 0),
+    with at most one worker process per report
+    """
+    import argparse
+
+    monkeypatch.setattr(hAMRonization.parallel, "available_cpu_count", lambda: 4)
+    parser = argparse.ArgumentParser()
+    hAMRonization.Interfaces.add_output_arguments(parser)
+    assert hAMRonization.Interfaces._job_count(
+        parser, parser.parse_args(argv), report_count
+    ) == jobs
+
+
+def test_lazy_imports():
+    """
+    Parsing a report only imports the parser module of its tool (and not
+    pandas), the other modules are imported when first used
+    """
+    code = "\n".join([
+        "import sys",
+        "import hAMRonization",
+        "metadata = {'analysis_software_version': '1.0',",
+        "            'reference_database_version': '1.0'}",
+        "list(hAMRonization.parse('data/raw_outputs/abricate/report.tsv',",
+        "                         metadata, 'abricate'))",
+        "assert 'hAMRonization.AbricateIO' in sys.modules",
+        "assert 'hAMRonization.RgiIO' not in sys.modules",
+        "assert 'pandas' not in sys.modules",
+        "assert hAMRonization.RgiIO.required_metadata",
+        "assert hAMRonization._FormatToIterator['rgi'] is "
+        "hAMRonization.RgiIO.RgiIterator",
+    ])
+    subprocess.run([sys.executable, "-c", code], check=True)
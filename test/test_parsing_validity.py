@@ -1042,3 +1042,28 @@ def test_extract_first_numeric():
     assert _extract_first_numeric("42", int) == 42
     assert _extract_first_numeric("99.5", float) == 99.5
     assert _extract_first_numeric("100; 200", int) == 100
+
+
+def test_result_type_coercion():
+    """Check the precompiled per-field coercion of hAMRonizedResult."""
+    from hAMRonization.hAMRonizedResult import hAMRonizedResult
+
+    result = hAMRonizedResult(
+        "path/to/Dummy.fasta.gz", "oqxA", "oqxA", "db", "1.0", "acc", "tool",
+        "1.0", "gene_presence_detected",
+        input_gene_start="10", sequence_identity="92.82 - 100.0",
+        coverage_percentage=0,
+    )
+    assert result.input_file_name == "Dummy"
+    assert result.input_gene_start == 10
+    assert result.sequence_identity == 92.82
+    # falsy values are left untouched
+    assert result.coverage_percentage == 0
+    # slotted records have no per-instance __dict__
+    assert not hasattr(result, "__dict__")
+
+    with pytest.raises(ValueError):
+        hAMRonizedResult(
+            "Dummy", "oqxA", "oqxA", "db", "1.0", "acc", "tool", "1.0",
+            "gene_presence_detected", input_gene_start="ten",
+        )